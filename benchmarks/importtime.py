@@ -0,0 +1,78 @@
+"""
+Cold start cost of the package: import time of typical entry points
+and creation of the first report, every run in a fresh interpreter.
+
+Run from the repository root:
+
+    python -m benchmarks.importtime --runs 10 --top 10
+
+Exits with non-zero code if median time of any statement is higher than --max-ms.
+"""
+import sys
+import argparse
+import statistics
+import subprocess
+
+from typing import List, Tuple
+
+STATEMENTS = (
+    'import pyappsflyer',
+    'from pyappsflyer.sinks import DBSink',
+    'from pyappsflyer import RawDataReport',
+    'from pyappsflyer import RawDataReport; RawDataReport("app", api_key="key")',
+)
+
+TIMER = 'import time; started = time.perf_counter(); {statement}; print(time.perf_counter() - started)'
+
+
+def measure(statement: str, runs: int) -> List[float]:
+    return [
+        float(subprocess.run([sys.executable, '-c', TIMER.format(statement=statement)],
+                             check=True, capture_output=True, text=True).stdout) * 1000
+        for _ in range(runs)
+    ]
+
+
+def slowest_imports(statement: str, top: int) -> List[Tuple[int, str]]:
+    """
+    Function returns modules with the highest cumulative import time in microseconds.
+    """
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                            check=True, capture_output=True, text=True).stderr
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Only modules imported directly by the statement or by the package
+        if name.startswith('  ') and not name.strip().startswith('pyappsflyer'):
+            continue
+        modules.append((int(cumulative), name.strip()))
+    return sorted(modules, reverse=True)[:top]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--top', type=int, default=0, help='show slowest imports of the last statement')
+    parser.add_argument('--max-ms', type=float, default=None)
+    args = parser.parse_args()
+
+    baseline = statistics.median(measure('pass', args.runs))
+    print(f'{"statement":<76} {"median ms":>10} {"min ms":>8}')
+    slow = False
+    for statement in STATEMENTS:
+        times = [value - baseline for value in measure(statement, args.runs)]
+        median = statistics.median(times)
+        slow = slow or (args.max_ms is not None and median > args.max_ms)
+        print(f'{statement:<76} {median:>10.1f} {min(times):>8.1f}')
+
+    if args.top:
+        print(f'\nSlowest imports of: {STATEMENTS[-1]}')
+        for cumulative, name in slowest_imports(STATEMENTS[-1], args.top):
+            print(f'{cumulative / 1000:>8.1f} ms  {name}')
+    return 1 if slow else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""
+Throughput of CSV ingest path: raw HTTP chunks -> decoded lines -> records.
+
+Run from the repository root:
+
+    python -m benchmarks.ingest --rows 100000 --columns 90
+
+Exits with non-zero code if throughput of compact records is lower than the target.
+"""
+import io
+import csv
+import sys
+import time
+import argparse
+import requests
+
+from codecs import iterdecode
+
+from pyappsflyer.ingest import iter_csv_lines
+from pyappsflyer.records import RecordReader
+from pyappsflyer.settings import INGEST_CHUNK_SIZE
+
+# Single core parse speed, which must be higher than a 200 Mbit/s link
+THROUGHPUT_TARGET_MBPS = 30
+
+
+def make_csv(rows: int, columns: int) -> bytes:
+    header = ','.join(f'Column {number}' for number in range(columns))
+    row = ','.join(['2020-01-01 10:00:00', 'facebook', '"Mozilla/5.0 (Linux; ""Android"" 10)"', '12.5']
+                   + ['value'] * (columns - 4))
+    return ('﻿' + header + '\r\n' + (row + '\r\n') * rows).encode('utf-8')
+
+
+def make_response(content: bytes) -> requests.Response:
+    response = requests.Response()
+    response.raw = io.BytesIO(content)
+    response.status_code = 200
+    return response
+
+
+def lines_path(content: bytes):
+    return csv.DictReader(iterdecode(make_response(content).iter_lines(), 'utf-8-sig'))
+
+
+def chunks_path(content: bytes, row_format: str = 'dict'):
+    chunks = make_response(content).iter_content(chunk_size=INGEST_CHUNK_SIZE)
+    return RecordReader(csv.DictReader(iter_csv_lines(chunks, 'utf-8-sig')), row_format)
+
+
+def measure(name: str, content: bytes, make_records) -> float:
+    started = time.perf_counter()
+    rows = sum(1 for _ in make_records(content))
+    elapsed = time.perf_counter() - started
+    throughput = len(content) / elapsed / 10 ** 6
+    print(f'{name:<24} {rows:>10} rows {rows / elapsed:>12.0f} rows/s {throughput:>8.1f} MB/s')
+    return throughput
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--columns', type=int, default=90)
+    args = parser.parse_args()
+
+    content = make_csv(args.rows, args.columns)
+    print(f'{len(content) / 10 ** 6:.1f} MB, target {THROUGHPUT_TARGET_MBPS} MB/s')
+
+    measure('iter_lines + iterdecode', content, lines_path)
+    measure('chunks, dict', content, chunks_path)
+    throughput = measure('chunks, record', content, lambda data: chunks_path(data, 'record'))
+
+    return 0 if throughput >= THROUGHPUT_TARGET_MBPS else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,295 @@
+"""
+Local stand-in for AppsFlyer export endpoints /export/<app>/<report>/v5.
+
+Answers with synthetic performance or raw data CSV of configurable size and
+number of columns, in chunked or plain transfer, optionally gzipped, with
+limited bandwidth, latency before headers, failed statuses and HTML error pages
+like the ones AppsFlyer returns with status 200.
+
+Run it alone from the repository root:
+
+    python -m benchmarks.server --port 8000 --rows 200000 --columns 90
+"""
+import sys
+import time
+import zlib
+import argparse
+import threading
+
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from itertools import cycle
+from typing import Optional, List, Iterator
+from urllib.parse import urlsplit, parse_qs
+
+from pyappsflyer.typed import PERFORMANCE_SCHEMA, RAW_DATA_SCHEMA, REPORT_SCHEMAS
+
+# Number of distinct rows, which are repeated in answers
+BLOCK_ROWS = 1024
+
+HTML_ERROR_PAGE = (b'<!DOCTYPE html>\n<html><head><title>Error</title></head>'
+                   b'<body>Your API calls limit has been reached for report type</body></html>\n')
+
+CATEGORIES = ('facebook', 'googleadwords_int', 'unityads_int', 'Organic', 'tiktok_int', 'applovin_int')
+
+
+class StandInConfig:
+    """
+    Params of answers, they could be changed while the server runs.
+    """
+
+    def __init__(self,
+                 rows: int = 100000,
+                 columns: Optional[int] = None,
+                 chunk_size: int = 64 * 1024,
+                 chunked: bool = True,
+                 gzip: bool = False,
+                 bandwidth: Optional[int] = None,
+                 latency: float = 0.0,
+                 fail_statuses: Optional[List[int]] = None,
+                 error_every: int = 0):
+        """
+        :param rows: number of rows in every report
+        :param columns: number of columns, all schema columns if not passed
+        :param chunk_size: size of written pieces in bytes
+        :param chunked: use chunked transfer encoding, Content-Length otherwise
+        :param gzip: compress answers for clients which accept gzip
+        :param bandwidth: max speed of an answer in bytes per second, not limited if not passed
+        :param latency: seconds before headers are sent
+        :param fail_statuses: statuses of the first requests, like [503, 429]
+        :param error_every: every n-th request gets an HTML error page, never if 0
+        """
+        self.rows = rows
+        self.columns = columns
+        self.chunk_size = chunk_size
+        self.chunked = chunked
+        self.gzip = gzip
+        self.bandwidth = bandwidth
+        self.latency = latency
+        self.fail_statuses = list(fail_statuses or ())
+        self.error_every = error_every
+
+
+def make_value(column: str, column_type: str, number: int) -> str:
+    if column == 'AppsFlyer ID':
+        return f'{1600000000000 + number}-{number * 7919 % 10 ** 19:019d}'
+    if column == 'Event Value':
+        # Quoted JSON with a quoted newline, the hardest case for line splitting
+        return f'"{{""af_revenue"":""{number % 100}.99"",""af_content_id"":""{number}""\n}}"'
+    if column == 'User Agent':
+        return '"Mozilla/5.0 (Linux; Android 10; SM-G960F) AppleWebKit/537.36, ""Chrome"""'
+    if column_type == 'timestamp':
+        return f'2020-01-01 {number // 3600 % 24:02d}:{number // 60 % 60:02d}:{number % 60:02d}'
+    if column_type == 'category':
+        return CATEGORIES[number % len(CATEGORIES)]
+    if column_type == 'int':
+        return str(number % 1000)
+    if column_type == 'float':
+        return f'{number % 1000 / 10:.2f}'
+    if column_type == 'bool':
+        return 'true' if number % 2 else 'false'
+    return f'value-{number}'
+
+
+def make_header(report_name: str, columns: Optional[int] = None) -> List[str]:
+    """
+    Function returns header of a report, padded with custom columns or cut to columns number.
+    """
+    schema = REPORT_SCHEMAS.get(report_name, RAW_DATA_SCHEMA)
+    header = list(schema)
+    if schema is RAW_DATA_SCHEMA:
+        header[2:2] = ['AppsFlyer ID', 'Event Value', 'User Agent']
+    elif schema is PERFORMANCE_SCHEMA:
+        header += ['af_purchase (Unique users)', 'af_purchase (Event counter)', 'af_purchase (Sales in USD)']
+
+    if columns is None:
+        return header
+    return (header + [f'Custom Field {number}' for number in range(len(header), columns)])[:columns]
+
+
+class SyntheticReport:
+    """
+    CSV body of a report, made of repeated block of distinct rows.
+    """
+
+    def __init__(self, report_name: str, rows: int, columns: Optional[int] = None):
+        schema = REPORT_SCHEMAS.get(report_name, RAW_DATA_SCHEMA)
+        self.header = make_header(report_name, columns)
+        self.rows = rows
+
+        types = [schema.get(column) or self._get_suffix_type(column) for column in self.header]
+        self.head = ('﻿' + ','.join(self.header) + '\r\n').encode('utf-8')
+        self.block = [
+            (','.join(make_value(column, column_type, number)
+                      for column, column_type in zip(self.header, types)) + '\r\n').encode('utf-8')
+            for number in range(min(rows, BLOCK_ROWS))
+        ]
+
+    @staticmethod
+    def _get_suffix_type(column: str) -> str:
+        if column.endswith(')'):
+            return 'float' if 'Sales' in column else 'int'
+        return 'string'
+
+    @property
+    def size(self) -> int:
+        if not self.block:
+            return len(self.head)
+        repeats, rest = divmod(self.rows, len(self.block))
+        return len(self.head) + repeats * sum(map(len, self.block)) + sum(map(len, self.block[:rest]))
+
+    def iter_chunks(self, chunk_size: int) -> Iterator[bytes]:
+        buffer = [self.head]
+        buffered = len(self.head)
+        rows = cycle(self.block)
+        for _ in range(self.rows):
+            row = next(rows)
+            buffer.append(row)
+            buffered += len(row)
+            if buffered >= chunk_size:
+                yield b''.join(buffer)
+                buffer, buffered = [], 0
+        if buffer:
+            yield b''.join(buffer)
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server: StandInServer = self.server
+        config = server.config
+        parts = urlsplit(self.path).path.strip('/').split('/')
+        if len(parts) != 4 or parts[0] != 'export' or parts[3] != 'v5':
+            return self._send_body(404, b'Not found', 'text/plain')
+        if not parse_qs(urlsplit(self.path).query).get('api_token'):
+            return self._send_body(401, b'Token is missing', 'text/plain')
+
+        number = server.count_request()
+        if config.latency:
+            time.sleep(config.latency)
+        if number <= len(config.fail_statuses):
+            headers = {'Retry-After': '0'} if config.fail_statuses[number - 1] == 429 else {}
+            return self._send_body(config.fail_statuses[number - 1], b'Try later', 'text/plain', headers)
+        if config.error_every and number % config.error_every == 0:
+            return self._send_body(200, HTML_ERROR_PAGE, 'text/html')
+
+        report = server.get_report(parts[2])
+        compress = config.gzip and 'gzip' in self.headers.get('Accept-Encoding', '')
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/csv')
+        if compress:
+            self.send_header('Content-Encoding', 'gzip')
+        if config.chunked or compress:
+            self.send_header('Transfer-Encoding', 'chunked')
+        else:
+            self.send_header('Content-Length', str(report.size))
+        self.end_headers()
+
+        chunks = report.iter_chunks(config.chunk_size)
+        if compress:
+            chunks = self._compress(chunks)
+        started = time.monotonic()
+        sent = 0
+        for chunk in chunks:
+            if config.chunked or compress:
+                self.wfile.write(f'{len(chunk):x}\r\n'.encode() + chunk + b'\r\n')
+            else:
+                self.wfile.write(chunk)
+            sent += len(chunk)
+            if config.bandwidth:
+                ahead = sent / config.bandwidth - (time.monotonic() - started)
+                if ahead > 0:
+                    time.sleep(ahead)
+        if config.chunked or compress:
+            self.wfile.write(b'0\r\n\r\n')
+
+    @staticmethod
+    def _compress(chunks: Iterator[bytes]) -> Iterator[bytes]:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            compressed = compressor.compress(chunk)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+
+    def _send_body(self, status: int, body: bytes, content_type: str, headers: Optional[dict] = None) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StandInServer(ThreadingHTTPServer):
+    """
+    HTTP server answering like AppsFlyer export API. Use it as a context manager
+    to run it in a background thread.
+    """
+    daemon_threads = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, config: Optional[StandInConfig] = None):
+        super().__init__((host, port), StandInHandler)
+        self.config = config or StandInConfig()
+        self.requests_number = 0
+        self._lock = threading.Lock()
+        self._reports = {}
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def count_request(self) -> int:
+        with self._lock:
+            self.requests_number += 1
+            return self.requests_number
+
+    def get_report(self, report_name: str) -> SyntheticReport:
+        key = (report_name, self.config.rows, self.config.columns)
+        with self._lock:
+            if key not in self._reports:
+                self._reports[key] = SyntheticReport(report_name, self.config.rows, self.config.columns)
+            return self._reports[key]
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.serve_forever, name='stand-in-server', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+        self._thread.join()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--columns', type=int, default=None)
+    parser.add_argument('--gzip', action='store_true')
+    parser.add_argument('--bandwidth', type=int, default=None, help='bytes per second')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds before headers')
+    parser.add_argument('--error-every', type=int, default=0, help='every n-th answer is an HTML error page')
+    args = parser.parse_args()
+
+    config = StandInConfig(rows=args.rows, columns=args.columns, gzip=args.gzip, bandwidth=args.bandwidth,
+                           latency=args.latency, error_every=args.error_every)
+    with StandInServer(port=args.port, config=config) as server:
+        print(f'Serving on {server.url}, set APP_FLYER_HOST={server.url}/ or pass api_url')
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
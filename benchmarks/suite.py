@@ -0,0 +1,214 @@
+"""
+End-to-end benchmarks of report ingest against the local stand-in server.
+
+Every mode runs in a fresh process, so peak RSS belongs to that mode only.
+Run from the repository root:
+
+    python -m benchmarks.suite --rows 200000 --columns 90 --repeat 5
+    python -m benchmarks.suite --gzip --bandwidth 25000000 --modes iter_record pipeline
+    python -m benchmarks.suite --json results.json
+
+Results could be compared between commits to find regressions of the hot path.
+"""
+import sys
+import json
+import time
+import argparse
+import resource
+import multiprocessing
+
+from queue import Empty
+from typing import Optional, List
+
+from benchmarks.server import StandInServer, StandInConfig, SyntheticReport
+
+RAW_REPORT = 'in_app_events_report'
+
+
+def run_get_dict(report) -> int:
+    return len(report.get_report(api_report_name=RAW_REPORT))
+
+
+def run_get_record(report) -> int:
+    return len(report.get_report(api_report_name=RAW_REPORT, row_format='record'))
+
+
+def run_iter_record(report, on_first=None) -> int:
+    rows = 0
+    for _ in report.iter_report(api_report_name=RAW_REPORT, row_format='record'):
+        if not rows and on_first:
+            on_first()
+        rows += 1
+    return rows
+
+
+def run_pipeline(report) -> int:
+    from pyappsflyer.pipeline import CallbackSink
+    return report.run_report_pipeline(api_report_name=RAW_REPORT, row_format='record',
+                                      sinks=[CallbackSink(lambda batch: None)])
+
+
+def run_parallel(report) -> int:
+    return sum(1 for _ in report.iter_parallel_report(api_report_name=RAW_REPORT, row_format='record',
+                                                      chunk_size=8 * 1024 ** 2))
+
+
+def run_typed_arrow(report) -> int:
+    return report.get_typed_report(api_report_name=RAW_REPORT, output='arrow').num_rows
+
+
+def run_get_reports(report) -> int:
+    return sum(len(records) for result in report.get_reports(exclude_retargeting_reports=RAW_REPORTS_ALL)
+               for records in result.values())
+
+
+# All retargeting twins are excluded, so get_reports receives every raw report once
+RAW_REPORTS_ALL = ('installs_report', 'in_app_events_report', 'organic_installs_report',
+                   'organic_in_app_events_report', 'uninstall_events_report')
+
+MODES = {
+    'get_dict': run_get_dict,
+    'get_record': run_get_record,
+    'iter_record': run_iter_record,
+    'pipeline': run_pipeline,
+    'parallel': run_parallel,
+    'typed_arrow': run_typed_arrow,
+    'get_reports': run_get_reports,
+}
+
+
+def percentile(values: List[float], percent: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def run_mode(mode: str, api_url: str, repeat: int, body_size: int, report_rows: int, results) -> None:
+    """
+    Runs one mode in a child process and puts its metrics into the queue.
+    """
+    from pyappsflyer import RawDataReport
+    from pyappsflyer.retry import RetryPolicy
+
+    report = RawDataReport('benchmark.app', api_key='benchmark_api_key', api_url=api_url,
+                           retry=RetryPolicy(max_attempts=1))
+    durations, first_records, errors = [], [], 0
+    rows = 0
+
+    for _ in range(repeat):
+        started = time.perf_counter()
+        marks = []
+        try:
+            if mode == 'iter_record':
+                rows = run_iter_record(report, on_first=lambda: marks.append(time.perf_counter()))
+            else:
+                rows = MODES[mode](report)
+        except Exception:
+            errors += 1
+            continue
+        durations.append(time.perf_counter() - started)
+        if marks:
+            first_records.append(marks[0] - started)
+
+    results.put({
+        'mode': mode,
+        'rows': rows,
+        'runs': len(durations),
+        'errors': errors,
+        'rows_per_second': rows / percentile(durations, 50) if durations else None,
+        # get_reports receives several reports, so size is taken by rows
+        'mb_per_second': body_size * rows / report_rows / percentile(durations, 50) / 10 ** 6
+        if durations else None,
+        'p50': percentile(durations, 50),
+        'p95': percentile(durations, 95),
+        'p99': percentile(durations, 99),
+        'first_record_p50': percentile(first_records, 50),
+        # Linux reports kilobytes
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    })
+
+
+def receive_result(process, results, timeout: float) -> Optional[dict]:
+    """
+    Waits for metrics of a mode, None if its process died or did not finish in time.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            return results.get(timeout=1)
+        except Empty:
+            if not process.is_alive():
+                # Metrics could still be in the pipe when the process exits
+                try:
+                    return results.get(timeout=1)
+                except Empty:
+                    return None
+    return None
+
+
+def format_value(value, width: int, precision: int = 2) -> str:
+    if value is None:
+        return '-'.rjust(width)
+    if isinstance(value, float):
+        return f'{value:>{width}.{precision}f}'
+    return f'{value:>{width}}'
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--columns', type=int, default=None)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES))
+    parser.add_argument('--gzip', action='store_true')
+    parser.add_argument('--plain', action='store_true', help='Content-Length instead of chunked transfer')
+    parser.add_argument('--bandwidth', type=int, default=None, help='bytes per second')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds before headers')
+    parser.add_argument('--error-every', type=int, default=0, help='every n-th answer is an HTML error page')
+    parser.add_argument('--timeout', type=float, default=600, help='seconds for all runs of a mode')
+    parser.add_argument('--json', default=None, help='file for results')
+    args = parser.parse_args()
+
+    config = StandInConfig(rows=args.rows, columns=args.columns, chunked=not args.plain, gzip=args.gzip,
+                           bandwidth=args.bandwidth, latency=args.latency, error_every=args.error_every)
+    body_size = SyntheticReport(RAW_REPORT, args.rows, args.columns).size
+    print(f'{args.rows} rows, {body_size / 10 ** 6:.1f} MB per report, {args.repeat} runs per mode')
+
+    context = multiprocessing.get_context('spawn')
+    results = []
+    failed = []
+    with StandInServer(config=config) as server:
+        print(f'{"mode":<12} {"rows/s":>10} {"MB/s":>8} {"p50 s":>8} {"p95 s":>8} {"p99 s":>8} '
+              f'{"first s":>8} {"RSS MB":>8} {"errors":>6}')
+        for mode in args.modes:
+            queue = context.Queue()
+            process = context.Process(target=run_mode,
+                                      args=(mode, server.url, args.repeat, body_size, args.rows, queue))
+            process.start()
+            result = receive_result(process, queue, args.timeout)
+            timed_out = result is None and process.is_alive()
+            if timed_out:
+                process.terminate()
+            process.join()
+            if result is None or process.exitcode != 0:
+                reason = 'timed out' if timed_out else f'exit code {process.exitcode}'
+                print(f'{mode:<12} failed, {reason}')
+                failed.append({'mode': mode, 'exitcode': process.exitcode})
+                continue
+            results.append(result)
+            print(f'{mode:<12} {format_value(result["rows_per_second"], 10, 0)} '
+                  f'{format_value(result["mb_per_second"], 8, 1)} {format_value(result["p50"], 8)} '
+                  f'{format_value(result["p95"], 8)} {format_value(result["p99"], 8)} '
+                  f'{format_value(result["first_record_p50"], 8, 3)} '
+                  f'{format_value(result["peak_rss_mb"], 8, 0)} {format_value(result["errors"], 6)}')
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({'params': vars(args), 'body_size': body_size, 'results': results, 'failed': failed},
+                      file, indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
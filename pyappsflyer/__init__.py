@@ -1,6 +1,46 @@
-from .api import PerformanceReport, RawDataReport, TargetingValidationRulesReport
-from .base import BaseAppsFlyer, get_random_filename
-from .settings import LOGGING
-from logging.config import dictConfig
+from importlib import import_module
 
-dictConfig(LOGGING)
+# Names are imported on first use, so importing a submodule does not import the whole package
+_EXPORTS = {
+    'PerformanceReport': 'api',
+    'RawDataReport': 'api',
+    'TargetingValidationRulesReport': 'api',
+    'BaseAppsFlyer': 'base',
+    'get_random_filename': 'base',
+    'ReportCache': 'cache',
+    'WatermarkStore': 'sync',
+    'SingleFlight': 'singleflight',
+    'Deduplicator': 'dedup',
+    'MemoryDedupIndex': 'dedup',
+    'SQLiteDedupIndex': 'dedup',
+    'Aggregation': 'aggregate',
+    'Count': 'aggregate',
+    'Sum': 'aggregate',
+    'CountDistinct': 'aggregate',
+    'Day': 'aggregate',
+    'DayNumber': 'aggregate',
+    'HyperLogLog': 'aggregate',
+    'StreamingJoin': 'join',
+    'make_cohort_aggregation': 'join',
+    'Instrumentation': 'metrics',
+    'MetricsRegistry': 'metrics',
+    'create_session': 'session',
+    'get_default_session': 'session',
+    'set_default_session': 'session',
+    'LOGGING': 'settings',
+    'configure_logging': 'settings',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(f'.{_EXPORTS[name]}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,422 @@
+import math
+
+from datetime import date
+from hashlib import blake2b
+from operator import itemgetter
+from typing import Optional, Callable, Dict, Iterable, List, Sequence, Tuple, Union
+
+from .settings import HLL_PRECISION
+from .records import Record, select_positions, make_row_picker
+from .exceptions import PyAFValidationError
+
+
+def hash_value(value: str) -> int:
+    """
+    Function returns 64-bit hash of a value, the same in every process.
+    """
+    return int.from_bytes(blake2b(value.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class HyperLogLog:
+    """
+    Estimates number of distinct values in fixed memory. Sketches of
+    the same precision could be merged, the result estimates their union.
+    Registers are kept sparse, until they would take more memory than dense ones.
+    """
+
+    __slots__ = ('precision', '_registers', '_sparse')
+
+    def __init__(self, precision: int = HLL_PRECISION):
+        """
+        :param precision: log2 of number of registers, from 4 to 16,
+                          standard error is 1.04 / sqrt(2^precision)
+        """
+        if not 4 <= precision <= 16:
+            raise PyAFValidationError(f'HyperLogLog precision must be from 4 to 16, not {precision}')
+        self.precision = precision
+        self._registers: Optional[bytearray] = None
+        self._sparse: Dict[int, int] = {}
+
+    def add(self, value: str) -> None:
+        self.add_hash(hash_value(value))
+
+    def add_hash(self, hashed: int) -> None:
+        """
+        :param hashed: 64-bit hash of a value
+        """
+        index = hashed >> (64 - self.precision)
+        rest_bits = 64 - self.precision
+        rank = rest_bits - (hashed & ((1 << rest_bits) - 1)).bit_length() + 1
+        if self._registers is not None:
+            if rank > self._registers[index]:
+                self._registers[index] = rank
+            return
+        if rank > self._sparse.get(index, 0):
+            self._sparse[index] = rank
+            # A dict entry takes tens of bytes, a dense register takes one
+            if len(self._sparse) > (1 << self.precision) // 64:
+                self._to_dense()
+
+    def _to_dense(self) -> None:
+        self._registers = bytearray(1 << self.precision)
+        for index, rank in self._sparse.items():
+            self._registers[index] = rank
+        self._sparse = {}
+
+    def merge(self, other: 'HyperLogLog') -> 'HyperLogLog':
+        """
+        Method adds values of another sketch into this one.
+
+        :param other: sketch of the same precision
+        :return: this sketch
+        """
+        if other.precision != self.precision:
+            raise PyAFValidationError('HyperLogLog sketches of different precision can not be merged')
+        if other._registers is None:
+            for index, rank in other._sparse.items():
+                if self._registers is not None:
+                    self._registers[index] = max(self._registers[index], rank)
+                elif rank > self._sparse.get(index, 0):
+                    self._sparse[index] = rank
+            if self._registers is None and len(self._sparse) > (1 << self.precision) // 64:
+                self._to_dense()
+            return self
+
+        if self._registers is None:
+            self._to_dense()
+        self._registers = bytearray(map(max, self._registers, other._registers))
+        return self
+
+    def count(self) -> int:
+        """
+        Method returns estimated number of distinct values.
+        """
+        registers_number = 1 << self.precision
+        registers = self._registers
+        if registers is None:
+            registers = bytearray(registers_number)
+            for index, rank in self._sparse.items():
+                registers[index] = rank
+
+        alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(registers_number, 0.7213 / (1 + 1.079 / registers_number))
+        estimate = alpha * registers_number ** 2 / sum(2.0 ** -rank for rank in registers)
+        zeros = registers.count(0)
+        # Linear counting is more accurate for small cardinalities
+        if estimate <= 2.5 * registers_number and zeros:
+            estimate = registers_number * math.log(registers_number / zeros)
+        return round(estimate)
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def __getstate__(self):
+        return self.precision, self._registers, self._sparse
+
+    def __setstate__(self, state):
+        self.precision, self._registers, self._sparse = state
+
+    def __repr__(self) -> str:
+        return f'<HyperLogLog ~{self.count()}>'
+
+
+class Aggregate:
+    """
+    Base class for aggregates. State of a group is created by create,
+    changed by add with a column value and combined with another state by merge.
+    States must be picklable, so partial aggregations could be passed between processes.
+    """
+
+    def __init__(self, column: Optional[str] = None):
+        """
+        :param column: column with values, header name or API field name
+        """
+        self.column = column
+
+    def create(self):
+        raise NotImplementedError
+
+    def add(self, state, value):
+        raise NotImplementedError
+
+    def merge(self, state, other):
+        raise NotImplementedError
+
+    def result(self, state):
+        return state
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({self.column!r})'
+
+
+class Count(Aggregate):
+    """
+    Number of rows, or number of not empty values if column is passed.
+    """
+
+    def create(self) -> int:
+        return 0
+
+    def add(self, state: int, value) -> int:
+        if self.column is None or value:
+            return state + 1
+        return state
+
+    def merge(self, state: int, other: int) -> int:
+        return state + other
+
+
+class Sum(Aggregate):
+    """
+    Sum of numeric values, empty values are skipped.
+    """
+
+    def create(self) -> float:
+        return 0.0
+
+    def add(self, state: float, value) -> float:
+        if not value:
+            return state
+        try:
+            return state + float(value)
+        except ValueError:
+            return state
+
+    def merge(self, state: float, other: float) -> float:
+        return state + other
+
+
+class CountDistinct(Aggregate):
+    """
+    Estimated number of distinct not empty values, counted by HyperLogLog.
+    """
+
+    def __init__(self, column: str, precision: int = HLL_PRECISION):
+        """
+        :param column: column with values, header name or API field name
+        :param precision: precision of HyperLogLog sketches
+        """
+        super().__init__(column)
+        self.precision = precision
+
+    def create(self) -> HyperLogLog:
+        return HyperLogLog(self.precision)
+
+    def add(self, state: HyperLogLog, value) -> HyperLogLog:
+        if value:
+            state.add(value)
+        return state
+
+    def merge(self, state: HyperLogLog, other: HyperLogLog) -> HyperLogLog:
+        return state.merge(other)
+
+    def result(self, state: HyperLogLog) -> int:
+        return state.count()
+
+
+class Key:
+    """
+    Group-by key taken from a column, optionally changed by transform.
+    Keys made of several columns pass all their values into transform.
+    """
+
+    def __init__(self, column: str, name: Optional[str] = None):
+        """
+        :param column: column with values, header name or API field name
+        :param name: name of the key in results, column name if not passed
+        """
+        self.column = column
+        self.name = name or column
+
+    @property
+    def columns(self) -> Tuple[str, ...]:
+        return self.column,
+
+    def transform(self, value):
+        return value
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({self.column!r}, {self.name!r})'
+
+
+class Day(Key):
+    """
+    Day of a time column: 2020-01-01 10:00:00 - 2020-01-01.
+    """
+
+    def __init__(self, column: str = 'event_time', name: str = 'date'):
+        super().__init__(column, name)
+
+    def transform(self, value):
+        return value[:10] if value else value
+
+
+class DayNumber(Key):
+    """
+    Number of days between two time columns, day 0 is the day of since column.
+    For cohorts it is the day of an event after install.
+    """
+
+    def __init__(self, column: str = 'event_time', since: str = 'install_time', name: str = 'day'):
+        """
+        :param column: time column
+        :param since: time column days are counted from
+        :param name: name of the key in results
+        """
+        super().__init__(column, name)
+        self.since = since
+
+    @property
+    def columns(self) -> Tuple[str, ...]:
+        return self.column, self.since
+
+    def transform(self, value, since):
+        if not value or not since:
+            return None
+        return (date.fromisoformat(value[:10]) - date.fromisoformat(since[:10])).days
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({self.column!r}, {self.since!r}, {self.name!r})'
+
+
+class Aggregation:
+    """
+    Folds records into groups one by one, memory depends on the number
+    of groups and not on the number of rows. Aggregations of the same
+    groups and aggregates could be merged, so reports could be aggregated
+    by windows, threads or processes and combined. Aggregations are picklable.
+    """
+
+    def __init__(self,
+                 group_by: Sequence[Union[str, Key]],
+                 aggregates: Dict[str, Aggregate]):
+        """
+        :param group_by: columns or keys to group by, for example
+                         (Day('event_time'), 'media_source', 'campaign', 'country_code', 'event_name')
+        :param aggregates: names and aggregates of results, for example
+                           {'events': Count(), 'revenue': Sum('event_revenue_usd'),
+                            'users': CountDistinct('appsflyer_id')}
+        """
+        self.keys = tuple(key if isinstance(key, Key) else Key(key) for key in group_by)
+        self.aggregates = tuple(aggregates.items())
+        self.groups: Dict[tuple, list] = {}
+        self.rows = 0
+
+    @property
+    def columns(self) -> List[str]:
+        """
+        Columns needed for the aggregation, they could be passed into iter_report as columns.
+        """
+        columns = [column for key in self.keys for column in key.columns]
+        columns += [aggregate.column for _, aggregate in self.aggregates if aggregate.column is not None]
+        return list(dict.fromkeys(columns))
+
+    def _make_picker(self, record: Union[dict, Record]) -> Callable[[Union[dict, Record]], tuple]:
+        """
+        Method returns a function which takes values of columns from records shaped like the passed one.
+        """
+        fieldnames = list(record.keys())
+        columns = self.columns
+        positions = select_positions(fieldnames, columns)
+        if isinstance(record, Record):
+            return make_row_picker(positions)
+
+        getter = itemgetter(*[fieldnames[position] for position in positions])
+        if len(columns) == 1:
+            return lambda item: (getter(item),)
+        return getter
+
+    def add(self, records: Iterable[Union[dict, Record]]) -> 'Aggregation':
+        """
+        Method folds records of one report into groups.
+        All records must have the same columns.
+
+        :param records: records of a report
+        :return: this aggregation
+        """
+        columns = self.columns
+        key_positions = [columns.index(key.column) for key in self.keys]
+        if any(type(key).transform is not Key.transform for key in self.keys):
+            transforms = [(itemgetter(*[columns.index(column) for column in key.columns]), len(key.columns) > 1,
+                           key.transform) for key in self.keys]
+
+            def get_key(values: tuple) -> tuple:
+                return tuple([transform(*getter(values)) if several else transform(getter(values))
+                              for getter, several, transform in transforms])
+        elif len(key_positions) > 1:
+            get_key = itemgetter(*key_positions)
+        else:
+            def get_key(values: tuple) -> tuple:
+                return values[key_positions[0]],
+
+        updates = [(number, aggregate.add, None if aggregate.column is None else columns.index(aggregate.column))
+                   for number, (_, aggregate) in enumerate(self.aggregates)]
+        groups = self.groups
+        create = self._create_states
+
+        pick = None
+        rows = 0
+        try:
+            for record in records:
+                if pick is None:
+                    pick = self._make_picker(record)
+                values = pick(record)
+                key = get_key(values)
+
+                states = groups.get(key)
+                if states is None:
+                    states = groups[key] = create()
+                for number, add, position in updates:
+                    states[number] = add(states[number], None if position is None else values[position])
+                rows += 1
+        finally:
+            self.rows += rows
+        return self
+
+    def _create_states(self) -> list:
+        return [aggregate.create() for _, aggregate in self.aggregates]
+
+    def merge(self, other: 'Aggregation') -> 'Aggregation':
+        """
+        Method adds groups of another aggregation into this one.
+        States of the other aggregation are taken, it must not be used after merge.
+
+        :param other: aggregation with the same groups and aggregates
+        :return: this aggregation
+        """
+        if [key.name for key in other.keys] != [key.name for key in self.keys] \
+                or [name for name, _ in other.aggregates] != [name for name, _ in self.aggregates]:
+            raise PyAFValidationError('Aggregations with different groups or aggregates can not be merged')
+
+        for key, other_states in other.groups.items():
+            states = self.groups.get(key)
+            if states is None:
+                self.groups[key] = other_states
+                continue
+            for number, (_, aggregate) in enumerate(self.aggregates):
+                states[number] = aggregate.merge(states[number], other_states[number])
+        self.rows += other.rows
+        other.groups = {}
+        return self
+
+    def results(self) -> List[dict]:
+        """
+        Method returns one dict per group with key values and aggregate results, ordered by keys.
+        """
+        results = []
+        for key, states in sorted(self.groups.items(), key=lambda item: _sort_key(item[0])):
+            result = {key_spec.name: value for key_spec, value in zip(self.keys, key)}
+            for (name, aggregate), state in zip(self.aggregates, states):
+                result[name] = aggregate.result(state)
+            results.append(result)
+        return results
+
+    def __len__(self) -> int:
+        return len(self.groups)
+
+    def __repr__(self) -> str:
+        return f'<Aggregation {len(self.groups)} groups of {self.rows} rows>'
+
+
+def _sort_key(key: tuple) -> Tuple:
+    # Empty values are placed first, so keys with None could be sorted
+    return tuple((False, '') if value is None else (True, value) for value in key)
@@ -0,0 +1,311 @@
+import csv
+import asyncio
+
+from contextlib import closing
+from typing import Optional, Iterable, Tuple, AsyncIterator, Sequence
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+from .api import PerformanceReport, RawDataReport, TargetingValidationRulesReport
+from .dedup import Deduplicator
+from .ingest import CSVChunkFeed
+from .aggregate import Aggregation
+from .settings import DEFAULT_CSV_ENCODING, HTTP_POOL_MAXSIZE, HTTP_KEEP_ALIVE, INGEST_CHUNK_SIZE,\
+    DEFAULT_BATCH_SIZE
+from .exceptions import PyAFProcessingError, PyAFUnknownError, PyAFReportsError, PyAFCommunicationError,\
+    PyAFValidationError
+
+# Params of report classes which have no asyncio counterpart
+UNSUPPORTED_PARAMS = ('session', 'cache', 'single_flight', 'instrumentation')
+
+
+def _sync_only(method_name: str):
+    """
+    Function returns a method of async reports, which raises an error
+    instead of a sync method inherited from report classes.
+    """
+    def method(self, *args, **kwargs):
+        raise PyAFValidationError(f'{method_name} is not supported by async reports, '
+                                  f'use {type(self).__name__[len("Async"):]} instead')
+    method.__name__ = method_name
+    method.__doc__ = 'Not supported by async reports.'
+    return method
+
+
+class AsyncReportMixin:
+    """
+    Asyncio counterparts of report methods.
+    URL building, request arguments and validation are taken from report classes.
+    Reports are received by get_report, iter_report, aggregate_report, get_reports
+    and iter_reports, requests are retried by the retry policy. Other methods
+    of report classes and their cache, single flight and instrumentation
+    are not supported and raise PyAFValidationError.
+    """
+
+    get_typed_report = _sync_only('get_typed_report')
+    run_report_pipeline = _sync_only('run_report_pipeline')
+    iter_parallel_report = _sync_only('iter_parallel_report')
+    get_parallel_table = _sync_only('get_parallel_table')
+    get_windowed_report = _sync_only('get_windowed_report')
+    iter_windowed_report = _sync_only('iter_windowed_report')
+    iter_sync_reports = _sync_only('iter_sync_reports')
+
+    def __init__(self, *args, aio_session: Optional['aiohttp.ClientSession'] = None, **kwargs):
+        if aiohttp is None:
+            raise ImportError('aiohttp is required for async reports, install pyappsflyer[aio]')
+        unsupported = [name for name in UNSUPPORTED_PARAMS if kwargs.get(name) is not None]
+        if unsupported:
+            raise PyAFValidationError(f"Params are not supported by async reports: {', '.join(unsupported)}")
+        super().__init__(*args, **kwargs)
+        self.aio_session = aio_session
+        self._own_aio_session = aio_session is None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self) -> None:
+        """
+        Closes HTTP session, if it was created by the report.
+        """
+        if self._own_aio_session and self.aio_session is not None:
+            await self.aio_session.close()
+            self.aio_session = None
+
+    def _get_aio_session(self) -> 'aiohttp.ClientSession':
+        """
+        Method returns HTTP session, it is created on first use
+        with connection pool params from settings.
+        """
+        if self.aio_session is None:
+            connector = aiohttp.TCPConnector(limit_per_host=HTTP_POOL_MAXSIZE,
+                                             force_close=not HTTP_KEEP_ALIVE)
+            self.aio_session = aiohttp.ClientSession(connector=connector)
+        return self.aio_session
+
+    async def _iter_csv(self,
+                        encoding=DEFAULT_CSV_ENCODING,
+                        copy_to_csv: bool = False,
+                        copy_to_json: bool = False,
+                        copy_compression: Optional[str] = None,
+                        row_format: str = 'dict',
+                        columns: Optional[Sequence[str]] = None,
+                        **kwargs) -> AsyncIterator[dict]:
+        """
+        Method receives CSV file in a stream and yields records as soon as
+        they are parsed. File copies are written at the same time.
+        The request is repeated by the retry policy of the report, failed
+        statuses and connection errors are raised as PyAFCommunicationError.
+
+        :param encoding: CSV encoding
+               default: utf-8-sig
+        :param copy_to_csv: save a .csv file copy
+        :param copy_to_json: save a .ndjson file copy
+        :param copy_compression: compress copies with gzip or zstd
+        :param row_format: dict or record, compact tuple records with column names
+        :param columns: columns to take from rows, all columns if not passed
+        :param kwargs: additional params for adding something in request URL
+        """
+        url = self._prepare_url(**kwargs)
+        self._log_url(url)
+
+        feed = CSVChunkFeed(encoding)
+        records = self._iter_csv_file(csv.DictReader(feed), row_format, columns)
+
+        try:
+            with self._open_copies(copy_to_csv, copy_to_json, copy_compression) as copies:
+                receiver = await self.retry.request_async(self._get_aio_session(), url.url, self.logger)
+                async with receiver:
+                    async for chunk in receiver.content.iter_chunked(INGEST_CHUNK_SIZE):
+                        if not feed.push(chunk):
+                            continue
+                        # Reads records, which are already received
+                        for record in records:
+                            for copy in copies:
+                                copy.write(record)
+                            yield record
+
+                feed.flush()
+                for record in records:
+                    for copy in copies:
+                        copy.write(record)
+                    yield record
+        except PyAFCommunicationError:
+            raise
+        except Exception as err:
+            raise PyAFProcessingError(
+                'Error while processing file'
+            ) from err
+
+    async def _get_csv(self,
+                       encoding=DEFAULT_CSV_ENCODING,
+                       **kwargs) -> list:
+        """
+        Method receives CSV file in a stream and returns all its records.
+        If there is a need to save those files in CSV or JSON it saves them
+        while the stream is read.
+
+        :param encoding: CSV encoding
+               default: utf-8-sig
+        :param kwargs: additional params for adding something in request URL
+                       and params of file copies.
+        """
+        return [record async for record in self._iter_csv(encoding=encoding, **kwargs)]
+
+    async def _get_report(self, *args, dedup: Optional[Deduplicator] = None, **kwargs) -> list:
+        """
+        Method to receive one report, takes the same params as in report classes.
+
+        :param dedup: deduplicator, records with already seen keys are dropped
+        :return: list of records created from CSV file
+        """
+        records = await self._get_csv(**self._prepare_report_call(*args, **kwargs))
+        return records if dedup is None else dedup.filter(records)
+
+    def _iter_report(self, *args, dedup: Optional[Deduplicator] = None, **kwargs) -> AsyncIterator[dict]:
+        """
+        Method to receive one report record by record.
+
+        :param dedup: deduplicator, records with already seen keys are dropped
+        :return: async iterator over records created from CSV stream
+        """
+        records = self._iter_csv(**self._prepare_report_call(*args, **kwargs))
+        return records if dedup is None else self._iter_unique(records, dedup)
+
+    @staticmethod
+    async def _iter_unique(records: AsyncIterator[dict], dedup: Deduplicator) -> AsyncIterator[dict]:
+        """
+        Method passes records through deduplicator by batches of its size,
+        so the index is not called for every record on the event loop.
+        """
+        batch = []
+        async for record in records:
+            batch.append(record)
+            if len(batch) < dedup.batch_size:
+                continue
+            with closing(dedup.iter(batch)) as unique:
+                # Marks of records, which were not read from a stopped stream, are removed on close
+                for unique_record in unique:
+                    yield unique_record
+            batch = []
+
+        with closing(dedup.iter(batch)) as unique:
+            for unique_record in unique:
+                yield unique_record
+
+    async def get_report(self, *args, **kwargs) -> list:
+        """
+        Main method for receiving reports.
+        """
+        try:
+            self._validate_report_kwargs(kwargs)
+        except Exception as err:
+            raise PyAFUnknownError(
+                'Unknown error'
+            ) from err
+        return await self._get_report(*args, **kwargs)
+
+    def iter_report(self, *args, **kwargs) -> AsyncIterator[dict]:
+        """
+        Main method for receiving reports record by record, use it with async for.
+        """
+        try:
+            self._validate_report_kwargs(kwargs)
+            return self._iter_report(*args, **kwargs)
+        except Exception as err:
+            raise PyAFUnknownError(
+                'Unknown error'
+            ) from err
+
+    async def aggregate_report(self, aggregation: Aggregation, *args, **kwargs) -> Aggregation:
+        """
+        Method folds records of a report into aggregation while they are received,
+        batch by batch. If columns are not passed, only columns needed
+        by the aggregation are requested and parsed.
+
+        :param aggregation: aggregation to fold records into
+        :param kwargs: the same params as for iter_report
+        :return: the passed aggregation
+        """
+        kwargs.setdefault('row_format', 'record')
+        kwargs.setdefault('columns', aggregation.columns)
+        batch = []
+        async for record in self.iter_report(*args, **kwargs):
+            batch.append(record)
+            if len(batch) >= DEFAULT_BATCH_SIZE:
+                aggregation.add(batch)
+                batch = []
+        return aggregation.add(batch)
+
+    async def _get_reports(self,
+                           report_calls: Iterable[Tuple[str, dict]],
+                           *args,
+                           max_concurrency: Optional[int] = None,
+                           **kwargs) -> list:
+        """
+        Method receives reports concurrently on the event loop.
+        Results keep the order of report_calls, failed reports are raised together.
+
+        :param report_calls: pairs of result name and params for get_report
+        :param max_concurrency: max number of reports received at the same time
+        :return: list with results
+        """
+        semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+
+        async def get_one(call_kwargs: dict) -> list:
+            if semaphore is None:
+                return await self.get_report(*args, **call_kwargs, **kwargs)
+            async with semaphore:
+                return await self.get_report(*args, **call_kwargs, **kwargs)
+
+        report_calls = list(report_calls)
+        results = await asyncio.gather(*(get_one(call_kwargs) for _, call_kwargs in report_calls),
+                                       return_exceptions=True)
+
+        all_reports = []
+        errors = {}
+        for (name, _), result in zip(report_calls, results):
+            if isinstance(result, Exception):
+                self.logger.error(f"Report {name} was not received: {result!r}")
+                errors[name] = result
+            else:
+                all_reports.append({name: result})
+
+        if errors:
+            raise PyAFReportsError(
+                f"Reports were not received: {', '.join(errors)}",
+                reports=all_reports,
+                errors=errors
+            )
+        return all_reports
+
+    async def _iter_reports(self,
+                            report_calls: Iterable[Tuple[str, dict]],
+                            *args,
+                            **kwargs) -> AsyncIterator[Tuple[str, AsyncIterator[dict]]]:
+        """
+        Method lazily receives reports one after another.
+
+        :param report_calls: pairs of result name and params for iter_report
+        :return: async iterator over pairs of report name and its records
+        """
+        for name, call_kwargs in report_calls:
+            yield name, self.iter_report(*args, **call_kwargs, **kwargs)
+
+
+class AsyncPerformanceReport(AsyncReportMixin, PerformanceReport):
+    pass
+
+
+class AsyncTargetingValidationRulesReport(AsyncReportMixin, TargetingValidationRulesReport):
+    pass
+
+
+class AsyncRawDataReport(AsyncReportMixin, RawDataReport):
+    iter_cohort_events = _sync_only('iter_cohort_events')
+    aggregate_cohorts = _sync_only('aggregate_cohorts')
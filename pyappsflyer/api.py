@@ -1,11 +1,23 @@
-from typing import Optional, List, Tuple
+from datetime import datetime as dt
+from datetime import timedelta as tdl
+from itertools import chain
+from typing import TYPE_CHECKING, Optional, List, Tuple, Iterator
 
 from .base import BaseAppsFlyer
+from .records import Record, select_positions
+from .windows import parse_date
 from .settings import DEFAULT_TIMEZONE
 
+if TYPE_CHECKING:
+    from .sync import WatermarkStore
+    from .join import StreamingJoin
+    from .aggregate import Aggregation
+
 
 class PerformanceReport(BaseAppsFlyer):
 
+    default_report_name = 'partners_report'
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.report_names = (
@@ -13,39 +25,31 @@ class PerformanceReport(BaseAppsFlyer):
             'daily_report', 'geo_report', 'geo_by_date_report'
         )
 
-    def _get_report(self,
-                    from_date: Optional = None,
-                    to_date: Optional = None,
-                    timezone: str = DEFAULT_TIMEZONE,
-                    api_report_name: str = "partners_report",
-                    copy_to_csv: bool = False,
-                    copy_to_json: bool = False):
+    def _get_request_args(self,
+                          from_date: Optional = None,
+                          to_date: Optional = None,
+                          timezone: str = DEFAULT_TIMEZONE) -> dict:
         """
-        Method to receive one performance report.
+        Method to build request arguments for one performance report.
         If dates are not presented default number of days will be used.
 
         :param from_date: from what date to begin, date format - YYYY-MM-DD
         :param to_date: at what date to end, date format - YYYY-MM-DD
         :param timezone: timezone for api request, default - Europe/Moscow
-        :param api_report_name: name of the performance report according to api documentation
-        :param copy_to_csv: save a .csv file copy
-        :param copy_to_json: save a .json file copy
-        :return: Ordered dictionary created from CSV file
+        :return: arguments for request URL
         """
-        self.api_report_name = api_report_name
-
         if not from_date or not to_date:
             from_date, to_date = self.get_default_dates()
 
-        return self._get_csv(request_args={"from": from_date,
-                                           "to": to_date,
-                                           "timezone": timezone},
-                             copy_to_csv=copy_to_csv,
-                             copy_to_json=copy_to_json)
+        return {"from": from_date,
+                "to": to_date,
+                "timezone": timezone}
 
 
 class TargetingValidationRulesReport(BaseAppsFlyer):
 
+    default_report_name = 'invalid_installs_report'
+
     additional_fields = ("rejected_reason", "rejected_reason_value",
                          "contributor1_match_type", "contributor2_match_type",
                          "contributor3_match_type", "match_type,device_category",
@@ -61,42 +65,32 @@ class TargetingValidationRulesReport(BaseAppsFlyer):
             'invalid_in_app_events_report'
         )
 
-    def _get_report(self,
-                    from_date: Optional = None,
-                    to_date: Optional = None,
-                    timezone: str = DEFAULT_TIMEZONE,
-                    api_report_name: str = "invalid_installs_report",
-                    copy_to_csv: bool = False,
-                    copy_to_json: bool = False):
+    def _get_request_args(self,
+                          from_date: Optional = None,
+                          to_date: Optional = None,
+                          timezone: str = DEFAULT_TIMEZONE) -> dict:
         """
-        Method to receive one performance report.
+        Method to build request arguments for one targeting validation rules report.
         If dates are not presented default number of days will be used.
 
         :param from_date: from what date to begin, date format - YYYY-MM-DD
         :param to_date: at what date to end, date format - YYYY-MM-DD
         :param timezone: timezone for api request, default - Europe/Moscow
-        :param api_report_name: name of the performance report according to api documentation
-        :param copy_to_csv: save a .csv file copy
-        :param copy_to_json: save a .json file copy
-        :return: Ordered dictionary created from CSV file
+        :return: arguments for request URL
         """
-        self.api_report_name = api_report_name
-
         if not from_date or not to_date:
             from_date, to_date = self.get_default_dates()
 
-        request_args = {"from": from_date,
-                        "to": to_date,
-                        "timezone": timezone,
-                        "additional_fields": ",".join(self.additional_fields)}
-
-        return self._get_csv(request_args=request_args,
-                             copy_to_csv=copy_to_csv,
-                             copy_to_json=copy_to_json)
+        return {"from": from_date,
+                "to": to_date,
+                "timezone": timezone,
+                "additional_fields": ",".join(self.additional_fields)}
 
 
 class RawDataReport(BaseAppsFlyer):
 
+    default_report_name = 'installs_report'
+
     additional_fields_uninstall_query = (
         "gp_referrer", "gp_click_time",
         "gp_install_begin", "amazon_aid", "keyword_match_type"
@@ -127,32 +121,24 @@ class RawDataReport(BaseAppsFlyer):
             'organic_in_app_events_report',
         ) + self.special_report_names
 
-    def _get_report(self,
-                    from_date: Optional = None,
-                    to_date: Optional = None,
-                    timezone: str = DEFAULT_TIMEZONE,
-                    api_report_name: str = "installs_report",
-                    retargeting: bool = False,
-                    different_additional_fields: bool = False,
-                    copy_to_csv: bool = False,
-                    copy_to_json: bool = False):
-        """
-        Method to receive one performance report.
+    def _get_request_args(self,
+                          from_date: Optional = None,
+                          to_date: Optional = None,
+                          timezone: str = DEFAULT_TIMEZONE,
+                          retargeting: bool = False,
+                          different_additional_fields: bool = False) -> dict:
+        """
+        Method to build request arguments for one raw data report.
         If dates are not presented default number of days will be used.
 
         :param from_date: from what date to begin, date format - YYYY-MM-DD
         :param to_date: at what date to end, date format - YYYY-MM-DD
         :param timezone: timezone for api request, default - Europe/Moscow
-        :param api_report_name: name of the performance report according to api documentation
         :param retargeting: use retargeting params for reports or not
                             default: False
         :param different_additional_fields: fields to add into report, more info in AppsFlyer docs
-        :param copy_to_csv: save a .csv file copy
-        :param copy_to_json: save a .json file copy
-        :return: Ordered dictionary created from CSV file
+        :return: arguments for request URL
         """
-        self.api_report_name = api_report_name
-
         if not from_date or not to_date:
             from_date, to_date = self.get_default_dates()
 
@@ -167,43 +153,167 @@ class RawDataReport(BaseAppsFlyer):
         if retargeting:
             request_args.update({"reattr": "true"})
 
-        return self._get_csv(request_args=request_args,
-                             copy_to_csv=copy_to_csv,
-                             copy_to_json=copy_to_json)
+        return request_args
+
+    def _get_report_calls(self,
+                          exclude_reports: Optional[Tuple[str, ...]] = None,
+                          exclude_retargeting_reports: Optional[Tuple[str, ...]] = None
+                          ) -> Iterator[Tuple[str, dict]]:
+        """
+        Method returns reports which must be received by get_reports.
+        Retargeting reports are placed right after their usual twins.
+
+        :param exclude_reports: an array with names of reports needs to be excluded in string format
+        :param exclude_retargeting_reports:  an array with names of retargeting
+                                             reports needs to be excluded in string format
+        :return: pairs of result name and params for get_report
+        """
+        exclude_retargeting_reports = exclude_retargeting_reports or ()
+
+        for report_name, call_kwargs in super()._get_report_calls(exclude_reports):
+            if report_name in self.special_report_names:
+                call_kwargs["different_additional_fields"] = True
+            yield report_name, call_kwargs
+
+            if report_name in self.report_with_retargeting \
+                    and report_name not in exclude_retargeting_reports:
+                yield f"{report_name}_retargeting", {"api_report_name": report_name,
+                                                     "retargeting": True}
 
     def get_reports(self,
                     exclude_reports: Optional[Tuple[str, ...]] = None,
                     exclude_retargeting_reports: Optional[tuple] = None,
                     *args,
-                    **kwargs):
+                    **kwargs) -> list:
         """
-        Method to receive all reports
+        Method to receive all reports.
+        Pass max_workers or executor to receive reports concurrently.
 
         :param exclude_reports: an array with names of reports needs to be excluded in string format
         :param exclude_retargeting_reports:  an array with names of retargeting
                                              reports needs to be excluded in string format
         :return: list with results
         """
+        return self._get_reports(self._get_report_calls(exclude_reports, exclude_retargeting_reports),
+                                 *args, **kwargs)
+
+    def iter_reports(self,
+                     exclude_reports: Optional[Tuple[str, ...]] = None,
+                     exclude_retargeting_reports: Optional[tuple] = None,
+                     *args,
+                     **kwargs) -> Iterator[Tuple[str, Iterator[dict]]]:
+        """
+        Method to receive all reports record by record.
+        Every report must be read before the next one is requested.
+
+        :param exclude_reports: an array with names of reports needs to be excluded in string format
+        :param exclude_retargeting_reports:  an array with names of retargeting
+                                             reports needs to be excluded in string format
+        :return: iterator over pairs of report name and its records
+        """
+        return self._iter_reports(self._get_report_calls(exclude_reports, exclude_retargeting_reports),
+                                  *args, **kwargs)
+
+    def iter_sync_reports(self,
+                          watermarks: 'WatermarkStore',
+                          exclude_reports: Optional[Tuple[str, ...]] = None,
+                          exclude_retargeting_reports: Optional[tuple] = None,
+                          *args,
+                          **kwargs) -> Iterator[Tuple[str, Iterator[dict]]]:
+        """
+        Method receives only new data of all reports, starting from
+        the date where the previous sync stopped.
+        Every report must be read before the next one is requested.
+
+        :param watermarks: store with dates up to which reports were synced
+        :param exclude_reports: an array with names of reports needs to be excluded in string format
+        :param exclude_retargeting_reports:  an array with names of retargeting
+                                             reports needs to be excluded in string format
+        :return: iterator over pairs of report name and its records
+        """
+        return self._iter_sync_reports(self._get_report_calls(exclude_reports, exclude_retargeting_reports),
+                                       watermarks, *args, **kwargs)
+
+    def iter_cohort_events(self,
+                           join: 'StreamingJoin',
+                           from_date: str,
+                           to_date: str,
+                           days: int = 7,
+                           organic: bool = False,
+                           **kwargs) -> Iterator[Record]:
+        """
+        Method puts installs from from_date to to_date into the join and streams
+        through it events up to days after to_date, but not later than today.
+        Events before install day or more than days after it are dropped,
+        so the join must have install_time and event_time columns.
+        Only the join columns are requested and parsed.
+
+        :param join: join of installs and events, installs are added to its index
+        :param from_date: first day of cohorts, date format - YYYY-MM-DD
+        :param to_date: last day of cohorts, date format - YYYY-MM-DD
+        :param days: number of days after install to receive events for
+        :param organic: join organic installs and events too
+        :param kwargs: other params for iter_report, like timezone
+        :return: iterator over events joined with their installs
+        """
+        time_positions = select_positions(join.record_class.fields, ('install_time', 'event_time'))
+        install_reports = ('installs_report', 'organic_installs_report') if organic else ('installs_report',)
+        event_reports = ('in_app_events_report', 'organic_in_app_events_report') if organic \
+            else ('in_app_events_report',)
+        events_to_date = min(parse_date(to_date) + tdl(days=days), dt.now()).strftime("%Y-%m-%d")
+
+        for report_name in install_reports:
+            join.build(self.iter_report(api_report_name=report_name, from_date=from_date, to_date=to_date,
+                                        row_format='record', columns=(join.key,) + join.build_columns,
+                                        **kwargs))
+        events = chain.from_iterable(
+            join.probe(self.iter_report(api_report_name=report_name, from_date=from_date, to_date=events_to_date,
+                                        row_format='record', columns=(join.key,) + join.probe_columns,
+                                        **kwargs))
+            for report_name in event_reports
+        )
+        return self._iter_cohort_days(events, *time_positions, days)
+
+    @staticmethod
+    def _iter_cohort_days(records: Iterator[Record],
+                          install_position: int,
+                          event_position: int,
+                          days: int) -> Iterator[Record]:
+        """
+        Method yields joined events from install day to days after it.
+        Events of the last cohorts are received for days after to_date,
+        so earlier cohorts get events of later days, which are dropped here.
+        """
+        from .aggregate import DayNumber
+
+        day_number = DayNumber().transform
+        for record in records:
+            day = day_number(record[event_position], record[install_position])
+            if day is not None and 0 <= day <= days:
+                yield record
+
+    def aggregate_cohorts(self,
+                          from_date: str,
+                          to_date: str,
+                          days: int = 7,
+                          aggregation: Optional['Aggregation'] = None,
+                          join: Optional['StreamingJoin'] = None,
+                          **kwargs) -> 'Aggregation':
+        """
+        Method builds day-N cohort aggregates: installs are joined with their events
+        and folded into aggregation, raw records are never kept in memory.
+        Index of installs is spilled to disk, if it is bigger than the join memory limit.
+
+        :param from_date: first day of cohorts, date format - YYYY-MM-DD
+        :param to_date: last day of cohorts, date format - YYYY-MM-DD
+        :param days: number of days after install to receive events for
+        :param aggregation: aggregation of joined records, make_cohort_aggregation if not passed
+        :param join: join of installs and events, a new StreamingJoin if not passed, it is closed at the end
+        :param kwargs: other params for iter_cohort_events
+        :return: aggregation with cohorts
+        """
+        from .join import StreamingJoin, make_cohort_aggregation
 
-        all_reports = []
-
-        if exclude_reports:
-            self.report_names = self.do_reports_exclusion(self.report_names, exclude_reports)
-
-        if exclude_retargeting_reports:
-            self.report_names = self.do_reports_exclusion(self.report_with_retargeting,
-                                                          exclude_retargeting_reports)
-
-        for report_name in self.report_names:
-            if report_name in self.report_with_retargeting:
-                all_reports.append({report_name: self.get_report(api_report_name=report_name, *args, **kwargs)})
-                all_reports.append({f"{report_name}_retargeting": self._get_report(api_report_name=report_name,
-                                                                                   retargeting=True,
-                                                                                   *args, **kwargs)})
-            elif report_name in self.special_report_names:
-                all_reports.append({report_name: self.get_report(api_report_name=report_name,
-                                                                  different_additional_fields=True,
-                                                                  *args, **kwargs)})
-            else:
-                all_reports.append({report_name: self.get_report(api_report_name=report_name, *args, **kwargs)})
-        return all_reports
+        aggregation = aggregation if aggregation is not None else make_cohort_aggregation()
+        with join if join is not None else StreamingJoin() as cohort_join:
+            return aggregation.add(self.iter_cohort_events(cohort_join, from_date, to_date, days, **kwargs))
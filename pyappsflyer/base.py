@@ -1,33 +1,54 @@
 import os
+import time
 import logging
 import csv
 import json
-import requests
 
 
 from abc import abstractmethod
 from datetime import datetime as dt
 from datetime import timedelta as tdl
 from datetime import date
-from typing import Optional, Union, List, Tuple, Generator
+from typing import TYPE_CHECKING, Optional, Union, List, Tuple, Generator, Iterator, Iterable, Sequence
 from uuid import uuid4
-from contextlib import closing
-from codecs import iterdecode
-from furl import furl
+from functools import partial
+from collections import deque
+from contextlib import closing, contextmanager, ExitStack
+from concurrent.futures import Executor, ThreadPoolExecutor
 
 from .settings import DEFAULT_DAYS_NUMBER, DEFAULT_CSV_ENCODING,\
-    APP_FLYER_HOST, APP_FLYER_API_KEY, FILES_DIR, PLATFORM
+    APP_FLYER_HOST, APP_FLYER_API_KEY, FILES_DIR, PLATFORM, DEFAULT_ROWS_LIMIT,\
+    DEFAULT_LOOKBACK_DAYS, DEFAULT_BATCH_SIZE, INGEST_CHUNK_SIZE, PARALLEL_CHUNK_SIZE,\
+    PIPELINE_QUEUE_SIZE, PIPELINE_BATCH_SIZE
 
+from .windows import parse_date, format_window, split_date_range, split_window
+
+from .session import get_default_session
+from .records import Record, RecordReader, normalize_column_name
+from .ingest import iter_csv_lines
 from .exceptions import PyAFValidationError,\
-    PyAFCommunicationError, PyAFUnknownError,\
-    AuthenticationError, PyAFProcessingError
+    PyAFUnknownError,\
+    AuthenticationError, PyAFProcessingError, PyAFReportsError
+
+if TYPE_CHECKING:
+    # Feature modules are imported in methods which use them, so import of reports stays light
+    from furl import furl
+    from .cache import ReportCache
+    from .sync import WatermarkStore
+    from .writers import RecordWriter
+    from .retry import RetryPolicy
+    from .metrics import Instrumentation, RequestStats
+    from .singleflight import SingleFlight
+    from .dedup import Deduplicator
+    from .aggregate import Aggregation
+    from .pipeline import PipelineSink
 
 
 def get_random_filename(filename: str = None,
                         folder: str = None,
                         add_current_date: bool = True,
                         ext: str = 'csv',
-                        possible_ext: Tuple[str] = ('csv', 'json')
+                        possible_ext: Tuple[str] = ('csv', 'json', 'ndjson')
                         ) -> str:
     """
     Function returns full path for saving file.
@@ -78,13 +99,26 @@ class BaseAppsFlyer:
 
     __slots__ = ('logger', 'api_url', 'api_action',
                  'application_name', 'api_report_name',
-                 'api_version', 'api_key', 'report_names')
+                 'api_version', 'api_key', 'report_names',
+                 'session', 'cache', 'retry', 'single_flight',
+                 'instrumentation')
+
+    # Report which is requested when no api_report_name is passed,
+    # must be assigned in child classes.
+    default_report_name = None
 
     def __init__(self,
                  application_name: str,
                  api_key: Optional[str] = None,
                  api_url: Optional[str] = None,
+                 session: Optional['requests.Session'] = None,
+                 cache: Optional['ReportCache'] = None,
+                 retry: Optional['RetryPolicy'] = None,
+                 single_flight: Optional['SingleFlight'] = None,
+                 instrumentation: Optional['Instrumentation'] = None,
                  ):
+        from .retry import RetryPolicy
+
         self.logger = logging.getLogger(application_name)
         self.api_url = api_url or APP_FLYER_HOST
         self.api_action = 'export'
@@ -93,19 +127,31 @@ class BaseAppsFlyer:
         self.api_version = 'v5'
         self.api_key = api_key or APP_FLYER_API_KEY
         self.report_names = None
+        # Pooled session, shared between all instances if not passed
+        self.session = session or get_default_session()
+        # Cache for received reports, they are always requested if not passed
+        self.cache = cache
+        # Retries, timeouts and hedging of requests
+        self.retry = retry or RetryPolicy()
+        # Joins identical downloads made at the same time, they are not joined if not passed
+        self.single_flight = single_flight
+        # Hooks called with measurements of every request, like MetricsRegistry
+        self.instrumentation = instrumentation
 
-    def _prepare_url(self, **kwargs) -> furl:
+    def _prepare_url(self, **kwargs) -> 'furl':
         """
         Creates an url for ExpertSender using params provided in kwargs variable.
         :param kwargs: parameters to put as additional arguments into URL.
         :return: furl instance with prepared URL
         """
+        from furl import furl
+
         if not self.api_key:
             raise AuthenticationError('API KEY not provided.')
         url = furl(self.api_url)
         url.path /= self.api_action
         url.path /= self.application_name
-        url.path /= self.api_report_name
+        url.path /= kwargs.get('api_report_name') or self.api_report_name
         url.path /= self.api_version
         url.args = {
             'api_token': self.api_key
@@ -116,6 +162,22 @@ class BaseAppsFlyer:
 
         return url
 
+    def _iter_csv_file(self,
+                       reader: csv.DictReader,
+                       row_format: str = 'dict',
+                       columns: Optional[Sequence[str]] = None) -> RecordReader:
+        """
+        Method reads CSV file record by record, checks if something present
+        in request answer and yields parsed data.
+
+        :param reader: file reader
+        :param row_format: dict or record, compact tuple records with column names
+                           shared by all records of the report
+        :param columns: columns to take from rows, all columns if not passed
+        :return: iterator over records
+        """
+        return RecordReader(reader, row_format, self.validate_csv_request_answer, columns)
+
     def _read_csv_file(self,
                        reader: Union[csv.reader, csv.DictReader],
                        result: list) -> list:
@@ -127,12 +189,7 @@ class BaseAppsFlyer:
         :param result: result for elements in file
         :return: list of records
         """
-
-        for num, record in enumerate(reader):
-            if num == 0:
-                # Checks the first row if there no problem in request answer
-                # because AppsFlyer could answer with 200 OK and without any CSV data.
-                self.validate_csv_request_answer(record)
+        for record in self._iter_csv_file(reader):
             result.append(record)
         return result
 
@@ -144,13 +201,202 @@ class BaseAppsFlyer:
         :return: result in JSON format
         """
         url = self._prepare_url(**kwargs)
-        self.logger.debug(url)
-        result = requests.request('GET', url.url)
-
-        if result.status_code == 200:
+        self._log_url(url)
+        with closing(self.retry.request(self.session, url.url, self.logger)) as result:
             return result.json()
-        self.logger.error(f"URL {url} |----| {result.content}")
-        raise PyAFCommunicationError("Data was not received")
+
+    @contextmanager
+    def _open_csv_stream(self,
+                         encoding=DEFAULT_CSV_ENCODING,
+                         stats: Optional['RequestStats'] = None,
+                         **kwargs) -> Iterator[csv.DictReader]:
+        """
+        Method opens a stream from AppsFlyer API or cache and returns CSV reader over it.
+        Connection is closed on exit from the context.
+
+        :param encoding: CSV encoding
+        :param stats: measurements of the request
+        :param kwargs: additional params for adding something in request URL
+        """
+        url = self._prepare_url(**kwargs)
+        self._log_url(url)
+
+        with self._open_chunks(url, kwargs.get('request_args'), stats) as chunks:
+            yield csv.DictReader(iter_csv_lines(chunks, encoding=encoding))
+
+    def _log_url(self, url: 'furl') -> None:
+        """
+        Method logs request URL without API token. The URL is formatted
+        only if debug logging is on, as it is done for every request.
+
+        :param url: prepared report URL
+        """
+        if self.logger.isEnabledFor(logging.DEBUG):
+            from .metrics import hide_api_token
+            self.logger.debug(hide_api_token(url))
+
+    def _create_stats(self, url: 'furl') -> Optional['RequestStats']:
+        """
+        Method returns measurements for a request, None if there is no instrumentation.
+
+        :param url: prepared report URL
+        """
+        if self.instrumentation is None:
+            return None
+        from .metrics import RequestStats
+        return RequestStats(self.application_name, url.path.segments[-2])
+
+    @contextmanager
+    def _open_chunks(self,
+                     url: 'furl',
+                     request_args: Optional[dict] = None,
+                     stats: Optional['RequestStats'] = None) -> Iterator[Iterable[bytes]]:
+        """
+        Method returns raw chunks of a report from cache if they are there,
+        otherwise from AppsFlyer API. Received report is put into cache
+        when all its chunks are read. With instrumentation the request is measured.
+
+        :param url: prepared report URL
+        :param request_args: report arguments, they define how long the report is cached
+        :param stats: measurements of the request, created if not passed
+        """
+        stats = stats or self._create_stats(url)
+        if stats is None:
+            with self._open_raw_chunks(url, request_args) as chunks:
+                yield chunks
+            return
+
+        self.instrumentation.on_request_start(stats)
+        try:
+            with self._open_raw_chunks(url, request_args, stats) as chunks:
+                yield stats.meter_chunks(chunks)
+        except BaseException as err:
+            stats.error = err
+            raise
+        finally:
+            stats.finished = time.perf_counter()
+            self.instrumentation.on_request_end(stats)
+
+    @contextmanager
+    def _open_raw_chunks(self,
+                         url: 'furl',
+                         request_args: Optional[dict] = None,
+                         stats: Optional['RequestStats'] = None) -> Iterator[Iterable[bytes]]:
+        """
+        Method returns raw chunks of a report from cache or AppsFlyer API.
+
+        :param url: prepared report URL
+        :param request_args: report arguments, they define how long the report is cached
+        :param stats: measurements of the request
+        """
+        on_retry = None
+        if stats is not None:
+            def on_retry(attempt: int, reason: str, delay: float) -> None:
+                stats.retries += 1
+                self.instrumentation.on_retry(stats, attempt, reason, delay)
+
+        if self.cache is None:
+            with closing(self.retry.request(self.session, url.url, self.logger, on_retry)) as receiver:
+                yield receiver.iter_content(chunk_size=INGEST_CHUNK_SIZE)
+            return
+
+        key = self.cache.make_key(url)
+        cached = self.cache.open(key)
+        if cached is not None:
+            self.logger.debug(f'Report {key} is taken from cache')
+            if stats is not None:
+                stats.cache = 'hit'
+            with cached:
+                yield iter(lambda: cached.read(INGEST_CHUNK_SIZE), b'')
+            return
+
+        if stats is not None:
+            stats.cache = 'miss'
+        ttl = self.cache.get_ttl(request_args)
+        with closing(self.retry.request(self.session, url.url, self.logger, on_retry)) as receiver:
+            chunks = receiver.iter_content(chunk_size=INGEST_CHUNK_SIZE)
+            if not ttl:
+                yield chunks
+                return
+            with self.cache.store(key, ttl) as writer:
+                yield writer.tee(chunks)
+
+    @contextmanager
+    def _open_copies(self,
+                     copy_to_csv: bool = False,
+                     copy_to_json: bool = False,
+                     copy_compression: Optional[str] = None) -> Iterator[List['RecordWriter']]:
+        """
+        Method opens writers for report copies. Copies are saved only
+        if all records were written, otherwise they are removed.
+
+        :param copy_to_csv: save a .csv file copy
+        :param copy_to_json: save a .ndjson file copy, one JSON record per line
+        :param copy_compression: compress copies with gzip or zstd
+        """
+        with ExitStack() as stack:
+            yield [stack.enter_context(copy)
+                   for copy in self._create_copies(copy_to_csv, copy_to_json, copy_compression)]
+
+    @staticmethod
+    def _create_copies(copy_to_csv: bool = False,
+                       copy_to_json: bool = False,
+                       copy_compression: Optional[str] = None) -> List['RecordWriter']:
+        """
+        Method creates writers for report copies, files of one report share a random name.
+
+        :param copy_to_csv: save a .csv file copy
+        :param copy_to_json: save a .ndjson file copy, one JSON record per line
+        :param copy_compression: compress copies with gzip or zstd
+        """
+        from .writers import open_record_writer
+
+        filename = get_random_filename(folder='received_files')
+
+        copies = []
+        if copy_to_csv:
+            copies.append(open_record_writer(filename, 'csv', copy_compression))
+        if copy_to_json:
+            copies.append(open_record_writer(f'{os.path.splitext(filename)[0]}.ndjson', 'ndjson', copy_compression))
+        return copies
+
+    def _iter_csv(self,
+                  encoding=DEFAULT_CSV_ENCODING,
+                  copy_to_csv: bool = False,
+                  copy_to_json: bool = False,
+                  copy_compression: Optional[str] = None,
+                  row_format: str = 'dict',
+                  columns: Optional[Sequence[str]] = None,
+                  **kwargs) -> Iterator[Union[dict, Record]]:
+        """
+        Method receives CSV file in a stream and yields records as soon as
+        they are parsed, so the whole report is never kept in memory.
+        File copies are written at the same time.
+
+        :param encoding: CSV encoding
+               default: utf-8-sig
+        :param copy_to_csv: save a .csv file copy
+        :param copy_to_json: save a .ndjson file copy
+        :param copy_compression: compress copies with gzip or zstd
+        :param row_format: dict or record, compact tuple records with column names
+        :param columns: columns to take from rows, all columns if not passed
+        :param kwargs: additional params for adding something in request URL
+        """
+        stats = self._create_stats(self._prepare_url(**kwargs)) if self.instrumentation else None
+        try:
+            with self._open_csv_stream(encoding=encoding, stats=stats, **kwargs) as reader,\
+                    self._open_copies(copy_to_csv, copy_to_json, copy_compression) as copies:
+                records = self._iter_csv_file(reader, row_format, columns)
+                if stats is not None:
+                    records = stats.meter_records(records)
+                for record in records:
+                    for copy in copies:
+                        copy.write(record)
+                    yield record
+        except Exception as err:
+            raise PyAFProcessingError(
+                'Error while processing file'
+            ) from err
 
     def _get_csv(self,
                  encoding=DEFAULT_CSV_ENCODING,
@@ -158,88 +404,715 @@ class BaseAppsFlyer:
         """
         Method receives CSV file in a stream parses it and passes further.
         If there is a need to save those files in CSV or JSON it saves them
+        while the stream is read.
+        Identical reports requested at the same time are received once,
+        if single flight is set, every caller gets its own list of records.
+        Dict records are copied for every caller, so they could be changed,
+        compact records are immutable and shared.
+
         :param encoding: CSV encoding
                default: utf-8-sig
         :param kwargs: additional params for adding something in request URL
-                       or if CSV must return reader as a dict and not as row by row.
+                       and params of file copies.
+        """
+        if self.single_flight is None:
+            return self._receive_csv(encoding=encoding, **kwargs)
+
+        from .singleflight import make_flight_key
+
+        options = tuple(sorted((key, repr(value)) for key, value in kwargs.items() if key in self.stream_options))
+        key = make_flight_key(self._prepare_url(**kwargs), encoding, *options)
+        records = self.single_flight.do(key, partial(self._receive_csv, encoding=encoding, **kwargs))
+        if records and isinstance(records[0], Record):
+            return list(records)
+        return [dict(record) for record in records]
+
+    def _receive_csv(self,
+                     encoding=DEFAULT_CSV_ENCODING,
+                     **kwargs) -> list:
+        """
+        Method receives all records of a report.
+        Report is received again if the connection breaks, failures are raised.
+
+        :param encoding: CSV encoding
+        :param kwargs: params for _iter_csv
+        """
+        from .retry import is_retryable_error
+        from .metrics import hide_api_token
+
+        for attempt in range(1, self.retry.max_attempts + 1):
+            try:
+                # Reads all stream from AppsFlyer API and converts received CSV into list
+                return list(self._iter_csv(encoding=encoding, **kwargs))
+            except PyAFProcessingError as err:
+                if attempt == self.retry.max_attempts or not is_retryable_error(err):
+                    raise
+                delay = self.retry.get_delay(attempt)
+                self.logger.warning(f'Stream was broken: {hide_api_token(repr(err.__cause__))}, '
+                                    f'next attempt in {delay:.1f}s')
+                if self.instrumentation is not None:
+                    stats = self._create_stats(self._prepare_url(**kwargs))
+                    self.instrumentation.on_retry(stats, attempt, 'broken stream', delay)
+                self.retry.sleep(delay)
+
+    def get_report(self, *args, **kwargs):
+        """
+        Main method for receiving reports.
+        """
+        try:
+            self._validate_report_kwargs(kwargs)
+            return self._get_report(*args, **kwargs)
+        except Exception as err:
+            raise PyAFUnknownError(
+                'Unknown error'
+            ) from err
+
+    def iter_report(self, *args, **kwargs) -> Iterator[dict]:
+        """
+        Main method for receiving reports record by record.
+        Takes the same params as get_report, but returns an iterator
+        which reads records from the stream lazily.
+        """
+        try:
+            self._validate_report_kwargs(kwargs)
+            return self._iter_report(*args, **kwargs)
+        except Exception as err:
+            raise PyAFUnknownError(
+                'Unknown error'
+            ) from err
+
+    def aggregate_report(self, aggregation: 'Aggregation', *args, **kwargs) -> 'Aggregation':
+        """
+        Method folds records of a report into aggregation while they are received,
+        so raw rows are never kept in memory. If columns are not passed,
+        only columns needed by the aggregation are requested and parsed.
+
+        :param aggregation: aggregation to fold records into, results of
+                            several reports or windows are added up in it
+        :param kwargs: the same params as for iter_report
+        :return: the passed aggregation
         """
+        kwargs.setdefault('row_format', 'record')
+        kwargs.setdefault('columns', aggregation.columns)
+        return aggregation.add(self.iter_report(*args, **kwargs))
+
+    def get_typed_report(self,
+                         *args,
+                         output: str = 'arrow',
+                         batch_size: int = DEFAULT_BATCH_SIZE,
+                         **kwargs):
+        """
+        Method receives a report and decodes its columns into typed arrays,
+        numbers, timestamps and categories, according to the report schema.
+        Takes the same params as get_report.
+
+        :param output: arrow for Arrow table or numpy for dict of NumPy arrays
+        :param batch_size: number of records decoded at once
+        :return: Arrow table or TypedColumns
+        """
+        from .typed import decode_records, get_report_schema
+
+        records = self.iter_report(*args, row_format='record', **kwargs)
+        schema = get_report_schema(kwargs.get('api_report_name', self.default_report_name))
+        return decode_records(records, schema, output, batch_size)
+
+    def run_report_pipeline(self,
+                            *args,
+                            sinks: Sequence['PipelineSink'] = (),
+                            queue_size: int = PIPELINE_QUEUE_SIZE,
+                            batch_size: int = PIPELINE_BATCH_SIZE,
+                            **kwargs) -> int:
+        """
+        Method receives a report in a pipeline: reading of the stream, parsing and
+        every sink run in separate threads connected with bounded queues.
+        File copies are written by sinks of their own.
+        Takes the same params as get_report.
+
+        :param sinks: sinks receiving batches of records
+        :param queue_size: max number of chunks or batches waiting between stages
+        :param batch_size: number of records in a batch
+        :return: number of received records
+        """
+        try:
+            self._validate_report_kwargs(kwargs)
+        except Exception as err:
+            raise PyAFUnknownError(
+                'Unknown error'
+            ) from err
+
+        return self._run_pipeline(sinks, queue_size, batch_size, **self._prepare_report_call(*args, **kwargs))
+
+    def _run_pipeline(self,
+                      sinks: Sequence['PipelineSink'],
+                      queue_size: int,
+                      batch_size: int,
+                      encoding=DEFAULT_CSV_ENCODING,
+                      copy_to_csv: bool = False,
+                      copy_to_json: bool = False,
+                      copy_compression: Optional[str] = None,
+                      row_format: str = 'dict',
+                      columns: Optional[Sequence[str]] = None,
+                      **kwargs) -> int:
+        """
+        Method opens a report stream and runs the pipeline over it.
+
+        :param kwargs: additional params for adding something in request URL
+        :return: number of received records
+        """
+        from .pipeline import ReportPipeline, WriterSink
+
         url = self._prepare_url(**kwargs)
-        self.logger.debug(url)
-        filename = get_random_filename(folder='received_files')
-        result = []
+        self._log_url(url)
+
+        def parse(chunks: Iterable[bytes]) -> Iterator[Union[dict, Record]]:
+            reader = csv.DictReader(iter_csv_lines(chunks, encoding=encoding))
+            return self._iter_csv_file(reader, row_format, columns)
+
+        try:
+            stats = self._create_stats(url)
+            with self._open_chunks(url, kwargs.get('request_args'), stats) as chunks:
+                # Copies are opened only for a received stream, the pipeline removes them on errors
+                copies = [WriterSink(copy)
+                          for copy in self._create_copies(copy_to_csv, copy_to_json, copy_compression)]
+                pipeline = ReportPipeline([*sinks, *copies], queue_size, batch_size)
+                records_number = pipeline.run(chunks, parse)
+                if stats is not None:
+                    stats.rows = records_number
+                return records_number
+        except Exception as err:
+            raise PyAFProcessingError(
+                'Error while processing file'
+            ) from err
+
+    def iter_parallel_report(self,
+                             *args,
+                             max_workers: Optional[int] = None,
+                             chunk_size: int = PARALLEL_CHUNK_SIZE,
+                             **kwargs) -> Iterator[Union[dict, Record]]:
+        """
+        Method saves a report into a temporary file first, then splits the file
+        into ranges of complete records and parses them in a process pool.
+        Records are returned in the file order. Suits very large raw data reports.
+        Takes the same params as get_report, except file copies.
+
+        :param max_workers: number of processes, number of CPUs if not passed
+        :param chunk_size: size of a range parsed by one process, in bytes
+        :return: iterator over records
+        """
+        try:
+            self._validate_report_kwargs(kwargs)
+        except Exception as err:
+            raise PyAFUnknownError(
+                'Unknown error'
+            ) from err
+
+        call = self._prepare_report_call(*args, **kwargs)
+        return self._iter_parallel_results(call, max_workers, chunk_size, output='records')
+
+    def get_parallel_table(self,
+                           *args,
+                           max_workers: Optional[int] = None,
+                           chunk_size: int = PARALLEL_CHUNK_SIZE,
+                           batch_size: int = DEFAULT_BATCH_SIZE,
+                           **kwargs):
+        """
+        Method saves a report into a temporary file first, then decodes ranges
+        of the file into typed Arrow tables in a process pool and merges them.
+        Takes the same params as get_report, except file copies.
 
+        :param max_workers: number of processes, number of CPUs if not passed
+        :param chunk_size: size of a range parsed by one process, in bytes
+        :param batch_size: number of records decoded at once
+        :return: Arrow table
+        """
         try:
-            # Reads all stream from AppsFlyer API
-            with closing(requests.get(url.url, stream=True)) as receiver:
-                reader = csv.DictReader(iterdecode(receiver.iter_lines(),
-                                                   encoding=encoding))
-                # Converts received CSV into list
-                result = self._read_csv_file(reader=reader, result=result)
-
-            # Saves file copies in different formats if needed
-            if kwargs['copy_to_csv']:
-                self.write_file(result, filename)
-            if kwargs['copy_to_json']:
-                self.write_file(result, filename, 'json')
+            self._validate_report_kwargs(kwargs)
+        except Exception as err:
+            raise PyAFUnknownError(
+                'Unknown error'
+            ) from err
+
+        from .parallel import read_arrow_table
 
+        call = self._prepare_report_call(*args, **kwargs)
+        return read_arrow_table(self._iter_parallel_results(call, max_workers, chunk_size,
+                                                            output='arrow', batch_size=batch_size))
+
+    def _iter_parallel_results(self,
+                               call: dict,
+                               max_workers: Optional[int],
+                               chunk_size: int,
+                               output: str = 'records',
+                               batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator:
+        """
+        Method spools a report and yields records or Arrow tables of its ranges.
+
+        :param call: params for _iter_csv
+        :param max_workers: number of processes
+        :param chunk_size: size of a range parsed by one process, in bytes
+        :param output: records or arrow
+        :param batch_size: number of records decoded at once
+        :return: iterator over records or tables in Arrow IPC stream format
+        """
+        from .parallel import spool, split_file, parse_range, parse_range_to_arrow, iter_parallel
+
+        url = self._prepare_url(**call)
+        self._log_url(url)
+
+        try:
+            with self._open_chunks(url, call['request_args']) as chunks:
+                path = spool(chunks)
+                # The answer is checked before the stream is closed, so an error page is not cached
+                try:
+                    fieldnames, ranges = split_file(path, chunk_size)
+                    self.validate_csv_request_answer(fieldnames)
+                except BaseException:
+                    os.remove(path)
+                    raise
+
+            try:
+                if not fieldnames:
+                    return
+
+                if output == 'arrow':
+                    task = partial(parse_range_to_arrow, path, fieldnames=fieldnames,
+                                   api_report_name=call['api_report_name'],
+                                   columns=call.get('columns'), batch_size=batch_size)
+                    yield from iter_parallel(task, ranges, max_workers)
+                    return
+
+                task = partial(parse_range, path, fieldnames=fieldnames,
+                               row_format=call.get('row_format', 'dict'), columns=call.get('columns'))
+                for records in iter_parallel(task, ranges, max_workers):
+                    yield from records
+            finally:
+                os.remove(path)
         except Exception as err:
             raise PyAFProcessingError(
                 'Error while processing file'
             ) from err
-        finally:
-            return result
 
-    def get_report(self, *args, **kwargs):
+    def get_windowed_report(self, *args, **kwargs) -> list:
         """
-        Main method for receiving reports.
+        Method receives a report split into date windows.
+        Takes the same params as iter_windowed_report.
+        """
+        return list(self.iter_windowed_report(*args, **kwargs))
+
+    def iter_windowed_report(self,
+                             *args,
+                             window: str = 'day',
+                             max_workers: Optional[int] = None,
+                             rows_limit: Optional[int] = DEFAULT_ROWS_LIMIT,
+                             dedup: Optional['Deduplicator'] = None,
+                             **kwargs) -> Iterator[dict]:
+        """
+        Method receives a report split into day or hour windows and yields
+        records in chronological order. Windows are received concurrently,
+        if max_workers is passed, no more than max_workers windows are kept
+        in memory. A window which reaches rows limit is split in halves
+        and received again, so records are not silently truncated.
+        Suits raw data and by date reports, other reports are not summed up
+        between windows.
+
+        :param window: size of a window, day or hour
+        :param max_workers: number of threads to receive windows with
+        :param rows_limit: number of rows on which AppsFlyer truncates an answer,
+                           pass None if the report has no such limit
+        :param dedup: deduplicator, records with already seen keys are dropped
+        :param kwargs: the same params as for get_report
+        :return: iterator over records
         """
         try:
-            self.validate_dates_and_report_names(kwargs['api_report_name'],
-                                                 self.report_names,
-                                                 kwargs['from_date'],
-                                                 kwargs['to_date'])
-            return self._get_report(*args, **kwargs)
+            self._validate_report_kwargs(kwargs)
+            if not kwargs.get('from_date') or not kwargs.get('to_date'):
+                kwargs['from_date'], kwargs['to_date'] = self.get_default_dates()
+            windows = split_date_range(kwargs.pop('from_date'), kwargs.pop('to_date'), window)
         except Exception as err:
             raise PyAFUnknownError(
                 'Unknown error'
             ) from err
 
+        records = self._iter_windows(windows, rows_limit, max_workers, *args, **kwargs)
+        return records if dedup is None else dedup.iter(records)
+
+    def _iter_windows(self,
+                      windows: List[Tuple[dt, dt]],
+                      rows_limit: Optional[int],
+                      max_workers: Optional[int],
+                      *args,
+                      **kwargs) -> Iterator[dict]:
+        """
+        Method receives windows one after another or concurrently
+        and yields their records in windows order.
+
+        :param windows: beginnings and ends of windows
+        :param rows_limit: number of rows on which AppsFlyer truncates an answer
+        :param max_workers: number of threads to receive windows with
+        :return: iterator over records
+        """
+        if not max_workers:
+            for start, end in windows:
+                yield from self._get_window(start, end, rows_limit, *args, **kwargs)
+            return
+
+        windows = iter(windows)
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=max_workers,
+                                thread_name_prefix=self.application_name) as executor:
+            try:
+                for start, end in windows:
+                    pending.append(executor.submit(self._get_window, start, end, rows_limit, *args, **kwargs))
+                    if len(pending) == max_workers:
+                        break
+
+                while pending:
+                    records = pending.popleft().result()
+                    # Next window is requested before records are passed further
+                    for start, end in windows:
+                        pending.append(executor.submit(self._get_window, start, end, rows_limit, *args, **kwargs))
+                        break
+                    yield from records
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def _get_window(self,
+                    start: dt,
+                    end: dt,
+                    rows_limit: Optional[int],
+                    *args,
+                    **kwargs) -> list:
+        """
+        Method receives all records of one window, if rows limit is reached
+        the window is split in halves, which are received one after another.
+
+        :param start: beginning of the window
+        :param end: end of the window, not included
+        :param rows_limit: number of rows on which AppsFlyer truncates an answer
+        :return: list of records
+        """
+        from_date, to_date = format_window(start, end)
+        records = list(self._iter_report(*args, from_date=from_date, to_date=to_date, **kwargs))
+
+        if not rows_limit or len(records) < rows_limit:
+            return records
+
+        halves = split_window(start, end)
+        if not halves:
+            raise PyAFProcessingError(
+                f'Window {from_date} - {to_date} reached rows limit and can not be split'
+            )
+
+        self.logger.info(f'Window {from_date} - {to_date} reached rows limit {rows_limit}, splitting it')
+        records = []
+        for half_start, half_end in halves:
+            records.extend(self._get_window(half_start, half_end, rows_limit, *args, **kwargs))
+        return records
+
+    def _validate_report_kwargs(self, kwargs: dict) -> None:
+        """
+        Method validates report name and dates passed into report methods.
+
+        :param kwargs: params passed into get_report or iter_report
+        """
+        self.validate_dates_and_report_names(kwargs.get('api_report_name', self.default_report_name),
+                                             self.report_names,
+                                             kwargs.get('from_date'),
+                                             kwargs.get('to_date'))
+
+    # Params of get_report and iter_report, which are passed to
+    # stream processing and not to request arguments of a report
+    stream_options = ('copy_to_csv', 'copy_to_json', 'copy_compression', 'row_format', 'columns')
+
+    def _pop_stream_options(self, kwargs: dict) -> dict:
+        """
+        Method takes stream processing params out of report params.
+
+        :param kwargs: params passed into get_report or iter_report
+        :return: stream processing params
+        """
+        return {option: kwargs.pop(option) for option in self.stream_options if option in kwargs}
+
+    @staticmethod
+    def _select_additional_fields(request_args: dict, columns: Sequence[str]) -> dict:
+        """
+        Method leaves in request only those additional fields, which are in columns.
+        Columns could be passed as header names or as API field names.
+
+        :param request_args: arguments for request URL
+        :param columns: columns which are needed
+        :return: arguments for request URL
+        """
+        if not request_args.get('additional_fields'):
+            return request_args
+
+        selected = {normalize_column_name(column) for column in columns}
+        additional_fields = [field for field in request_args['additional_fields'].split(',')
+                             if normalize_column_name(field) in selected]
+
+        request_args = dict(request_args)
+        if additional_fields:
+            request_args['additional_fields'] = ','.join(additional_fields)
+        else:
+            del request_args['additional_fields']
+        return request_args
+
+    def _prepare_report_call(self,
+                             *args,
+                             api_report_name: Optional[str] = None,
+                             **kwargs) -> Tuple[dict, dict]:
+        """
+        Method splits report params into request arguments and stream processing params.
+
+        :param api_report_name: name of the report according to api documentation
+        :param kwargs: report params and stream processing params
+        :return: params for _get_csv or _iter_csv
+        """
+        self.api_report_name = api_report_name or self.default_report_name
+        stream_kwargs = self._pop_stream_options(kwargs)
+        request_args = self._get_request_args(*args, **kwargs)
+
+        if stream_kwargs.get('columns'):
+            request_args = self._select_additional_fields(request_args, stream_kwargs['columns'])
+
+        return {'api_report_name': self.api_report_name,
+                'request_args': request_args,
+                **stream_kwargs}
+
+    def _get_report(self, *args, dedup: Optional['Deduplicator'] = None, **kwargs) -> list:
+        """
+        Method to receive one report.
+
+        :param api_report_name: name of the report according to api documentation
+        :param copy_to_csv: save a .csv file copy
+        :param copy_to_json: save a .ndjson file copy
+        :param copy_compression: compress copies with gzip or zstd
+        :param row_format: dict or record, compact tuple records which could be
+                           accessed by column names and converted with to_dict
+        :param columns: columns to receive, header names or API field names.
+                        Only needed additional fields are requested and only
+                        these values are taken from rows, under the passed names
+        :param dedup: deduplicator, records with already seen keys are dropped.
+                      Pass the same one into several calls to merge reports without duplicates
+        :param kwargs: report params, look at _get_request_args of the report class
+        :return: list of records created from CSV file
+        """
+        records = self._get_csv(**self._prepare_report_call(*args, **kwargs))
+        return records if dedup is None else dedup.filter(records)
+
+    def _iter_report(self, *args, dedup: Optional['Deduplicator'] = None, **kwargs) -> Iterator[dict]:
+        """
+        Method to receive one report record by record.
+
+        :param dedup: deduplicator, records with already seen keys are dropped
+        :param kwargs: report params, look at _get_request_args of the report class,
+                       and stream processing params, look at _get_report
+        :return: iterator over records created from CSV stream
+        """
+        records = self._iter_csv(**self._prepare_report_call(*args, **kwargs))
+        return records if dedup is None else dedup.iter(records)
+
     @abstractmethod
-    def _get_report(self, *args, **kwargs):
+    def _get_request_args(self, *args, **kwargs) -> dict:
         """
-        Method to receive base report.
+        Method to build request arguments of a report.
         Must be assigned in child classes.
         """
         raise NotImplementedError
 
+    def _get_report_calls(self,
+                          exclude_reports: Optional[Tuple[str, ...]] = None
+                          ) -> Iterator[Tuple[str, dict]]:
+        """
+        Method returns reports which must be received by get_reports.
+
+        :param exclude_reports: an array with names of reports needs to be excluded in string format
+        :return: pairs of result name and params for get_report
+        """
+        report_names = self.report_names
+        if exclude_reports:
+            report_names = self.do_reports_exclusion(report_names, exclude_reports)
+
+        for report_name in report_names:
+            yield report_name, {'api_report_name': report_name}
+
     def get_reports(self,
                     exclude_reports: Optional[Tuple[str, ...]] = None,
                     *args,
                     **kwargs) -> list:
         """
-        Method to receive all reports
+        Method to receive all reports.
+        Pass max_workers or executor to receive reports concurrently.
 
         :param exclude_reports: an array with names of reports needs to be excluded in string format
         :return: list with results
         """
-        all_reports = []
+        return self._get_reports(self._get_report_calls(exclude_reports), *args, **kwargs)
 
-        if exclude_reports:
-            self.report_names = self.do_reports_exclusion(self.report_names, exclude_reports)
+    def iter_reports(self,
+                     exclude_reports: Optional[Tuple[str, ...]] = None,
+                     *args,
+                     **kwargs) -> Iterator[Tuple[str, Iterator[dict]]]:
+        """
+        Method to receive all reports record by record.
+        Every report must be read before the next one is requested.
+
+        :param exclude_reports: an array with names of reports needs to be excluded in string format
+        :return: iterator over pairs of report name and its records
+        """
+        return self._iter_reports(self._get_report_calls(exclude_reports), *args, **kwargs)
 
-        for report_name in self.report_names:
-            all_reports.append({report_name: self.get_report(api_report_name=report_name, *args, **kwargs)})
+    def _get_reports(self,
+                     report_calls: Iterable[Tuple[str, dict]],
+                     *args,
+                     max_workers: Optional[int] = None,
+                     executor: Optional[Executor] = None,
+                     **kwargs) -> list:
+        """
+        Method receives reports one after another or concurrently,
+        if max_workers or executor is passed.
+
+        :param report_calls: pairs of result name and params for get_report
+        :param max_workers: number of threads to receive reports with
+        :param executor: executor to receive reports with, max_workers is ignored then
+        :return: list with results
+        """
+        if max_workers is None and executor is None:
+            all_reports = []
 
+            for name, call_kwargs in report_calls:
+                all_reports.append({name: self.get_report(*args, **call_kwargs, **kwargs)})
+
+            return all_reports
+
+        if executor is None:
+            with ThreadPoolExecutor(max_workers=max_workers,
+                                    thread_name_prefix=self.application_name) as own_executor:
+                return self._get_reports_concurrently(own_executor, report_calls, *args, **kwargs)
+        return self._get_reports_concurrently(executor, report_calls, *args, **kwargs)
+
+    def _get_reports_concurrently(self,
+                                  executor: Executor,
+                                  report_calls: Iterable[Tuple[str, dict]],
+                                  *args,
+                                  **kwargs) -> list:
+        """
+        Method receives reports in parallel. Results keep the order of report_calls.
+        Failed reports do not stop the others, they are raised together at the end.
+
+        :param executor: executor to receive reports with
+        :param report_calls: pairs of result name and params for get_report
+        :return: list with results
+        """
+        futures = [
+            (name, executor.submit(self.get_report, *args, **call_kwargs, **kwargs))
+            for name, call_kwargs in report_calls
+        ]
+
+        all_reports = []
+        errors = {}
+        for name, future in futures:
+            try:
+                all_reports.append({name: future.result()})
+            except Exception as err:
+                self.logger.error(f"Report {name} was not received: {err!r}")
+                errors[name] = err
+
+        if errors:
+            raise PyAFReportsError(
+                f"Reports were not received: {', '.join(errors)}",
+                reports=all_reports,
+                errors=errors
+            )
         return all_reports
 
+    def _iter_reports(self,
+                      report_calls: Iterable[Tuple[str, dict]],
+                      *args,
+                      **kwargs) -> Iterator[Tuple[str, Iterator[dict]]]:
+        """
+        Method lazily receives reports one after another.
+
+        :param report_calls: pairs of result name and params for iter_report
+        :return: iterator over pairs of report name and its records
+        """
+        for name, call_kwargs in report_calls:
+            yield name, self.iter_report(*args, **call_kwargs, **kwargs)
+
+    def iter_sync_reports(self,
+                          watermarks: 'WatermarkStore',
+                          exclude_reports: Optional[Tuple[str, ...]] = None,
+                          *args,
+                          **kwargs) -> Iterator[Tuple[str, Iterator[dict]]]:
+        """
+        Method receives only new data of all reports, starting from
+        the date where the previous sync stopped.
+        Every report must be read before the next one is requested.
+
+        :param watermarks: store with dates up to which reports were synced
+        :param exclude_reports: an array with names of reports needs to be excluded in string format
+        :return: iterator over pairs of report name and its records
+        """
+        return self._iter_sync_reports(self._get_report_calls(exclude_reports), watermarks, *args, **kwargs)
+
+    def _iter_sync_reports(self,
+                           report_calls: Iterable[Tuple[str, dict]],
+                           watermarks: 'WatermarkStore',
+                           *args,
+                           lookback_days: int = DEFAULT_LOOKBACK_DAYS,
+                           start_date: Optional[str] = None,
+                           **kwargs) -> Iterator[Tuple[str, Iterator[dict]]]:
+        """
+        Method lazily receives reports from their watermarks minus lookback days
+        up to today. Watermark of a report is moved only when all its records are read,
+        so a failed sync starts from the same date next time.
+
+        :param report_calls: pairs of result name and params for iter_report
+        :param watermarks: store with dates up to which reports were synced
+        :param lookback_days: days before watermark to receive again, for late attributed data
+        :param start_date: date to begin with for never synced reports,
+                           default number of days is used if not passed
+        :return: iterator over pairs of report name and its records
+        """
+        default_from_date, to_date = self.get_default_dates()
+
+        for name, call_kwargs in report_calls:
+            api_report_name = call_kwargs['api_report_name']
+            retargeting = call_kwargs.get('retargeting', False)
+
+            watermark = watermarks.get(self.application_name, api_report_name, retargeting)
+            if watermark:
+                from_date = (parse_date(watermark) - tdl(days=lookback_days)).strftime("%Y-%m-%d")
+            else:
+                from_date = start_date or default_from_date
+
+            self.logger.info(f'Syncing {name} from {from_date} to {to_date}')
+            records = self.iter_report(*args, from_date=from_date, to_date=to_date, **call_kwargs, **kwargs)
+            yield name, self._iter_and_move_watermark(records, watermarks, api_report_name,
+                                                      retargeting, to_date)
+
+    def _iter_and_move_watermark(self,
+                                 records: Iterator[dict],
+                                 watermarks: 'WatermarkStore',
+                                 api_report_name: str,
+                                 retargeting: bool,
+                                 value: str) -> Iterator[dict]:
+        """
+        Method passes records further and moves watermark when all of them are read.
+        """
+        yield from records
+        watermarks.set(self.application_name, api_report_name, retargeting, value)
+
     def validate_date_format(self, value: str) -> None:
         """
         Method checks if data format is invalid.
+        Dates could be passed with hours and minutes - YYYY-MM-DD HH:MM.
 
         :param value: date as a string
         """
         try:
-            dt.strptime(value, "%Y-%m-%d")
+            parse_date(value)
         except ValueError as err:
             raise PyAFValidationError(
                 'Date format is invalid'
@@ -314,18 +1187,19 @@ class BaseAppsFlyer:
             raise PyAFValidationError('Error data received. Check API KEY')
 
     @staticmethod
-    def write_file(result: List[str], filename: str, extension: str ='csv') -> None:
+    def write_file(result: List[dict], filename: str, extension: str = 'csv',
+                   compression: Optional[str] = None) -> None:
         """
         Method saves a file in CSV or JSON if needed.
+        JSON is saved as NDJSON, one record per line.
 
         :param result: elements extracted from stream
         :param filename: file name
         :param extension: file's extension
+        :param compression: compress file with gzip or zstd
         """
-        with open(filename, 'w+') as file:
-            if extension == 'json':
-                json.dump(result, file)
-            else:
-                writer = csv.writer(file)
-                for record in result:
-                    writer.writerow(record)
+        from .writers import open_record_writer
+
+        with open_record_writer(filename, extension, compression) as writer:
+            for record in result:
+                writer.write(record)
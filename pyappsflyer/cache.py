@@ -0,0 +1,240 @@
+import os
+import gzip
+import sqlite3
+import hashlib
+import threading
+
+from time import time
+from datetime import datetime as dt
+from datetime import timedelta as tdl
+from contextlib import contextmanager, closing
+from typing import Optional, Iterator, Iterable, IO
+from uuid import uuid4
+from furl import furl
+
+from .settings import CACHE_MAX_SIZE, CACHE_CLOSED_TTL, CACHE_OPEN_TTL
+from .windows import parse_date
+
+# Time after the end of a UTC day until it is over in every timezone. A day ends last
+# in the most western timezone, UTC-12, 14 hours are a conservative upper bound of it
+DAY_CLOSE_MARGIN = tdl(hours=14)
+
+
+class CacheEntryWriter:
+    """
+    Writes received chunks into a cache file while they are passed further.
+    The entry is saved only if the whole stream was read.
+    """
+
+    __slots__ = ('cache', 'key', 'ttl', 'path', 'file', 'size', 'completed')
+
+    def __init__(self, cache: 'ReportCache', key: str, ttl: int):
+        self.cache = cache
+        self.key = key
+        self.ttl = ttl
+        self.path = os.path.join(cache.directory, f'{uuid4()}.tmp')
+        self.file = gzip.open(self.path, 'wb', compresslevel=1)
+        self.size = 0
+        self.completed = False
+
+    def tee(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """
+        Passes chunks further and writes them into the cache file.
+
+        :param chunks: raw chunks of received CSV file
+        :return: the same chunks
+        """
+        for chunk in chunks:
+            self.file.write(chunk)
+            self.size += len(chunk)
+            yield chunk
+        self.completed = True
+
+    def close(self) -> None:
+        """
+        Saves the entry if the stream was read completely, removes it otherwise.
+        """
+        self.file.close()
+        if self.completed:
+            self.cache.add(self.key, self.path, self.ttl)
+        elif os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class ReportCache:
+    """
+    On-disk cache for received reports.
+    Reports for closed days are kept longer, than reports which include today,
+    the least recently used reports are removed when the cache exceeds max size.
+    """
+
+    def __init__(self,
+                 directory: str,
+                 max_size: int = CACHE_MAX_SIZE,
+                 closed_ttl: int = CACHE_CLOSED_TTL,
+                 open_ttl: int = CACHE_OPEN_TTL):
+        """
+        :param directory: folder to keep cached reports in
+        :param max_size: max size of all cached files in bytes
+        :param closed_ttl: seconds to keep reports for closed days
+        :param open_ttl: seconds to keep reports, which include today,
+                         0 means such reports are not cached
+        """
+        self.directory = directory
+        self.max_size = max_size
+        self.closed_ttl = closed_ttl
+        self.open_ttl = open_ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS entries ('
+                               'key TEXT PRIMARY KEY, path TEXT, size INTEGER, '
+                               'expires_at REAL, accessed_at REAL)')
+
+    def _connect(self) -> sqlite3.Connection:
+        return closing(sqlite3.connect(os.path.join(self.directory, 'index.sqlite'),
+                                       timeout=30, isolation_level=None))
+
+    @staticmethod
+    def make_key(url: furl) -> str:
+        """
+        Method returns cache key for report URL, API token is not a part of it.
+
+        :param url: prepared report URL, it contains application and report names
+        :return: key
+        """
+        url = url.copy().remove(args=['api_token'])
+        return str(url)
+
+    def get_ttl(self, request_args: Optional[dict]) -> int:
+        """
+        Method returns how long a report must be kept.
+
+        :param request_args: report arguments with from and to dates
+        :return: seconds
+        """
+        to_date = (request_args or {}).get('to')
+        if to_date:
+            closed_at = parse_date(to_date, is_end=True) + DAY_CLOSE_MARGIN
+            if closed_at <= dt.utcnow():
+                return self.closed_ttl
+        return self.open_ttl
+
+    def open(self, key: str) -> Optional[IO[bytes]]:
+        """
+        Method returns cached report file, if it is present and not expired.
+
+        :param key: cache key
+        :return: file with report or None
+        """
+        now = time()
+        with self._connect() as connection:
+            row = connection.execute('SELECT path, expires_at FROM entries WHERE key = ?', (key,)).fetchone()
+            if row and row[1] > now:
+                try:
+                    cached = gzip.open(row[0], 'rb')
+                except FileNotFoundError:
+                    pass
+                else:
+                    connection.execute('UPDATE entries SET accessed_at = ? WHERE key = ?', (now, key))
+                    self._count('hits')
+                    return cached
+
+        if row:
+            self._remove(key, row[0])
+        self._count('misses')
+        return None
+
+    @contextmanager
+    def store(self, key: str, ttl: int) -> Iterator[CacheEntryWriter]:
+        """
+        Method returns writer for a new cache entry.
+
+        :param key: cache key
+        :param ttl: seconds to keep the entry
+        """
+        writer = CacheEntryWriter(self, key, ttl)
+        try:
+            yield writer
+        except BaseException:
+            writer.completed = False
+            raise
+        finally:
+            writer.close()
+
+    def add(self, key: str, temp_path: str, ttl: int) -> None:
+        """
+        Method puts completely written file into the cache.
+
+        :param key: cache key
+        :param temp_path: path to written file
+        :param ttl: seconds to keep the entry
+        """
+        path = os.path.join(self.directory, f'{hashlib.sha256(key.encode()).hexdigest()}.csv.gz')
+        os.replace(temp_path, path)
+        now = time()
+        with self._connect() as connection:
+            connection.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)',
+                               (key, path, os.path.getsize(path), now + ttl, now))
+        self.evict()
+
+    def evict(self) -> None:
+        """
+        Method removes expired entries and the least recently used ones,
+        until cache size is lower than max size.
+        """
+        with self._connect() as connection:
+            expired = connection.execute('SELECT key, path FROM entries WHERE expires_at <= ?',
+                                         (time(),)).fetchall()
+            total_size = connection.execute('SELECT COALESCE(SUM(size), 0) FROM entries '
+                                            'WHERE expires_at > ?', (time(),)).fetchone()[0]
+            to_remove = list(expired)
+
+            if total_size > self.max_size:
+                for key, path, size in connection.execute('SELECT key, path, size FROM entries '
+                                                          'WHERE expires_at > ? ORDER BY accessed_at',
+                                                          (time(),)):
+                    to_remove.append((key, path))
+                    self._count('evictions')
+                    total_size -= size
+                    if total_size <= self.max_size:
+                        break
+
+        for key, path in to_remove:
+            self._remove(key, path)
+
+    def clear(self) -> None:
+        """
+        Method removes all cached reports.
+        """
+        with self._connect() as connection:
+            entries = connection.execute('SELECT key, path FROM entries').fetchall()
+        for key, path in entries:
+            self._remove(key, path)
+
+    def stats(self) -> dict:
+        """
+        Method returns cache statistics.
+
+        :return: dict with hits, misses, evictions, number of entries and their size
+        """
+        with self._connect() as connection:
+            entries, size = connection.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'entries': entries, 'size': size}
+
+    def _remove(self, key: str, path: str) -> None:
+        with self._connect() as connection:
+            connection.execute('DELETE FROM entries WHERE key = ? AND path = ?', (key, path))
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
@@ -0,0 +1,284 @@
+import os
+import sys
+import sqlite3
+import threading
+
+from array import array
+from bisect import bisect_left
+from hashlib import blake2b
+from heapq import merge
+from itertools import islice
+from operator import itemgetter
+from typing import Optional, Callable, Iterable, Iterator, List, Sequence, Union
+
+from .settings import DEDUP_BATCH_SIZE
+from .records import Record, select_positions, make_row_picker
+
+# Natural key of a raw data event, API field names or header names could be used
+RAW_EVENT_KEY_COLUMNS = ('appsflyer_id', 'event_name', 'event_time', 'is_retargeting')
+
+# Fingerprints are kept in a set until there are this many of them,
+# then they are merged into the sorted array
+MIN_MERGE_SIZE = 65536
+
+_SEPARATOR = '\x1f'
+
+
+def _hash_key(values: Sequence[Optional[str]]) -> bytes:
+    try:
+        key = _SEPARATOR.join(values)
+    except TypeError:
+        key = _SEPARATOR.join('' if value is None else value for value in values)
+    return blake2b(key.encode('utf-8'), digest_size=8).digest()
+
+
+def make_fingerprints(keys: Iterable[Sequence[Optional[str]]]) -> array:
+    """
+    Function returns 64-bit fingerprints of key values. Probability of
+    a collision is about n^2 / 2^65, less than 0.03% for 100 million keys.
+
+    :param keys: key values of records, None is the same as an empty value
+    :return: array of signed 64-bit integers
+    """
+    fingerprints = array('q')
+    # Digests are converted all at once, they are little-endian on every platform
+    fingerprints.frombytes(b''.join(map(_hash_key, keys)))
+    if sys.byteorder == 'big':
+        fingerprints.byteswap()
+    return fingerprints
+
+
+def make_fingerprint(values: Sequence[Optional[str]]) -> int:
+    """
+    Function returns 64-bit fingerprint of key values of one record.
+    """
+    return make_fingerprints([values])[0]
+
+
+class DedupIndex:
+    """
+    Base class for sets of seen fingerprints. Methods are thread safe.
+    """
+
+    def add(self, fingerprints: Sequence[int]) -> List[bool]:
+        """
+        Method marks fingerprints as seen.
+
+        :param fingerprints: fingerprints of a batch of records
+        :return: True for fingerprints which were not seen before,
+                 repeated fingerprints of the batch are False after the first one
+        """
+        raise NotImplementedError
+
+    def discard(self, fingerprints: Iterable[int]) -> None:
+        """
+        Method removes fingerprints, which were added, but their records were not passed further.
+        """
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class MemoryDedupIndex(DedupIndex):
+    """
+    Keeps fingerprints in memory in a sorted array of 64-bit integers,
+    8 bytes per key instead of hundreds for a set of key tuples.
+    New fingerprints are collected in a set and merged into the array,
+    when the set reaches a quarter of the array.
+    """
+
+    def __init__(self):
+        self._sorted = array('q')
+        self._recent = set()
+        self._lock = threading.Lock()
+
+    def add(self, fingerprints: Sequence[int]) -> List[bool]:
+        with self._lock:
+            recent, ordered, size = self._recent, self._sorted, len(self._sorted)
+            added = []
+            for fingerprint in fingerprints:
+                if fingerprint in recent:
+                    added.append(False)
+                    continue
+                if size:
+                    position = bisect_left(ordered, fingerprint)
+                    if position < size and ordered[position] == fingerprint:
+                        added.append(False)
+                        continue
+                recent.add(fingerprint)
+                added.append(True)
+
+            if len(self._recent) >= max(MIN_MERGE_SIZE, len(self._sorted) // 4):
+                # Merged lazily, so only the old and the new arrays are in memory
+                self._sorted = array('q', merge(self._sorted, sorted(self._recent)))
+                self._recent = set()
+            return added
+
+    def discard(self, fingerprints: Iterable[int]) -> None:
+        with self._lock:
+            for fingerprint in fingerprints:
+                if fingerprint in self._recent:
+                    self._recent.discard(fingerprint)
+                    continue
+                position = bisect_left(self._sorted, fingerprint)
+                if position < len(self._sorted) and self._sorted[position] == fingerprint:
+                    del self._sorted[position]
+
+    def __len__(self) -> int:
+        return len(self._sorted) + len(self._recent)
+
+
+class SQLiteDedupIndex(DedupIndex):
+    """
+    Keeps fingerprints in SQLite file, for indexes which do not fit in memory
+    or must be kept between runs. Fingerprints are the integer primary key
+    of the table, so the file holds one B-tree of them.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: path to SQLite file with fingerprints
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.execute('CREATE TABLE IF NOT EXISTS fingerprints (fingerprint INTEGER PRIMARY KEY)')
+        self._connection.commit()
+
+    def add(self, fingerprints: Sequence[int]) -> List[bool]:
+        with self._lock, self._connection:
+            cursor = self._connection.cursor()
+            added = []
+            for fingerprint in fingerprints:
+                cursor.execute('INSERT OR IGNORE INTO fingerprints VALUES (?)', (fingerprint,))
+                added.append(cursor.rowcount == 1)
+            return added
+
+    def discard(self, fingerprints: Iterable[int]) -> None:
+        with self._lock, self._connection:
+            self._connection.executemany('DELETE FROM fingerprints WHERE fingerprint = ?',
+                                         ((fingerprint,) for fingerprint in fingerprints))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute('SELECT COUNT(*) FROM fingerprints').fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+
+class Deduplicator:
+    """
+    Passes records further only once per natural key, for all streams
+    which go through it: a report and its retargeting twin, overlapping
+    windows or repeated syncs. Records are marked as seen by batches,
+    marks of records which were not read from a stopped stream are removed.
+    """
+
+    def __init__(self,
+                 index: Optional[DedupIndex] = None,
+                 key_columns: Sequence[str] = RAW_EVENT_KEY_COLUMNS,
+                 batch_size: int = DEDUP_BATCH_SIZE):
+        """
+        :param index: index of seen keys, MemoryDedupIndex if not passed,
+                      SQLiteDedupIndex for big or persistent indexes
+        :param key_columns: columns of the natural key, header names or API field names
+        :param batch_size: number of records checked in the index at once
+        """
+        self.index = index if index is not None else MemoryDedupIndex()
+        self.key_columns = tuple(key_columns)
+        self.batch_size = batch_size
+        self.passed = 0
+        self.dropped = 0
+        self._counter_lock = threading.Lock()
+
+    def _make_picker(self, record: Union[dict, Record]) -> Callable[[Union[dict, Record]], tuple]:
+        """
+        Method returns a function which takes key values from records shaped like the passed one.
+        """
+        fieldnames = list(record.keys())
+        positions = select_positions(fieldnames, self.key_columns)
+        if isinstance(record, Record):
+            return make_row_picker(positions)
+
+        getter = itemgetter(*[fieldnames[position] for position in positions])
+        if len(positions) == 1:
+            return lambda item: (getter(item),)
+        return getter
+
+    def iter(self, records: Iterable[Union[dict, Record]]) -> Iterator[Union[dict, Record]]:
+        """
+        Method yields records with keys which were not seen before.
+        All records of the stream must have the same columns.
+
+        :param records: records of one report
+        :return: iterator over unique records
+        """
+        records = iter(records)
+        pick = None
+        while True:
+            batch = list(islice(records, self.batch_size))
+            if not batch:
+                return
+            if pick is None:
+                pick = self._make_picker(batch[0])
+
+            fingerprints = make_fingerprints(map(pick, batch))
+            added = self.index.add(fingerprints)
+            new_number = added.count(True)
+            passed = 0
+            try:
+                for record, new in zip(batch, added):
+                    if new:
+                        passed += 1
+                        yield record
+            finally:
+                with self._counter_lock:
+                    self.passed += passed
+                    self.dropped += len(batch) - new_number
+                if passed < new_number:
+                    self.index.discard(self._get_unread(fingerprints, added, passed))
+
+    def merge(self, *streams: Iterable[Union[dict, Record]]) -> Iterator[Union[dict, Record]]:
+        """
+        Method yields unique records of several streams one after another,
+        streams could have different columns.
+
+        :param streams: records of reports
+        :return: iterator over unique records
+        """
+        for records in streams:
+            yield from self.iter(records)
+
+    def filter(self, records: Iterable[Union[dict, Record]]) -> list:
+        """
+        Method returns list of records with keys which were not seen before.
+        """
+        return list(self.iter(records))
+
+    @staticmethod
+    def _get_unread(fingerprints: Sequence[int], added: List[bool], passed: int) -> Iterator[int]:
+        """
+        Method returns new fingerprints of a batch, which come after passed records.
+        """
+        new_fingerprints = (fingerprint for fingerprint, new in zip(fingerprints, added) if new)
+        return islice(new_fingerprints, passed, None)
+
+    def __repr__(self) -> str:
+        return f'<Deduplicator {", ".join(self.key_columns)}>'
@@ -29,4 +29,15 @@ class PyAFProcessingError(PyAFError):
 class PyAFUnknownError(PyAFError):
     """
     Error for different communication errors
-    """
\ No newline at end of file
+    """
+
+
+class PyAFReportsError(PyAFError):
+    """
+    Error for reports which were not received, while other reports were.
+    """
+
+    def __init__(self, message: str, reports: list = None, errors: dict = None):
+        super().__init__(message)
+        self.reports = reports or []
+        self.errors = errors or {}
@@ -0,0 +1,113 @@
+import io
+
+from collections import deque
+from codecs import getincrementaldecoder
+from typing import Iterable, Iterator
+
+from .settings import DEFAULT_CSV_ENCODING
+
+
+def split_lines(text: str) -> Iterator[str]:
+    """
+    Function splits text into lines with line breaks, as CSV reader expects them.
+    Only \\n, \\r\\n and \\r are line breaks.
+
+    :param text: text with complete lines
+    :return: iterator over lines
+    """
+    return io.StringIO(text, newline='')
+
+
+def iter_csv_lines(chunks: Iterable[bytes],
+                   encoding: str = DEFAULT_CSV_ENCODING) -> Iterator[str]:
+    """
+    Function decodes raw byte chunks of CSV file and yields its lines.
+    Decoder is incremental, so multibyte characters and BOM could be split
+    between chunks. Lines keep their line breaks, so CSV reader joins lines
+    of quoted fields with line breaks inside.
+
+    :param chunks: raw chunks of CSV file
+    :param encoding: CSV encoding
+    :return: iterator over lines
+    """
+    decoder = getincrementaldecoder(encoding)()
+    pending = ''
+
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        boundary = text.rfind('\n')
+        if boundary < 0:
+            pending += text
+            continue
+        yield from split_lines(pending + text[:boundary + 1])
+        pending = text[boundary + 1:]
+
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield from split_lines(pending)
+
+
+def find_record_boundary(text: str) -> int:
+    """
+    Function returns position of the last line break, which is not inside
+    a quoted field, so text before it contains only complete records.
+
+    :param text: beginning of CSV file, which starts with a record
+    :return: position of line break or -1
+    """
+    boundary = text.rfind('\n')
+    while boundary >= 0:
+        # Quotes are paired in complete records, escaped quotes are doubled
+        if not text.count('"', 0, boundary) % 2:
+            return boundary
+        boundary = text.rfind('\n', 0, boundary)
+    return boundary
+
+
+class CSVChunkFeed:
+    """
+    Iterator for CSV reader, which is filled with raw chunks while they are received.
+    Only lines of complete records are passed to the reader, so the reader
+    could be read after every chunk without getting a part of a record.
+    """
+
+    __slots__ = ('_decoder', '_lines', '_pending')
+
+    def __init__(self, encoding: str = DEFAULT_CSV_ENCODING):
+        self._decoder = getincrementaldecoder(encoding)()
+        self._lines = deque()
+        self._pending = ''
+
+    def push(self, chunk: bytes) -> bool:
+        """
+        Adds a chunk to the feed.
+
+        :param chunk: raw chunk of CSV file
+        :return: True if there are complete records to read
+        """
+        text = self._pending + self._decoder.decode(chunk)
+        boundary = find_record_boundary(text)
+        if boundary < 0:
+            self._pending = text
+            return False
+
+        self._lines.extend(split_lines(text[:boundary + 1]))
+        self._pending = text[boundary + 1:]
+        return True
+
+    def flush(self) -> None:
+        """
+        Passes the rest of the stream to the reader.
+        """
+        text = self._pending + self._decoder.decode(b'', final=True)
+        self._pending = ''
+        if text:
+            self._lines.extend(split_lines(text))
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if not self._lines:
+            raise StopIteration
+        return self._lines.popleft()
@@ -0,0 +1,290 @@
+import os
+import shutil
+import pickle
+import tempfile
+
+from operator import itemgetter
+from typing import Optional, Callable, Dict, Iterable, Iterator, List, Sequence, Union
+
+from .settings import JOIN_MEMORY_LIMIT, JOIN_PARTITIONS, SPOOL_DIR
+from .records import Record, select_positions, make_row_picker, make_record_class
+from .aggregate import Aggregation, Count, Sum, CountDistinct, Day, DayNumber
+from .exceptions import PyAFValidationError
+
+# Columns of installs and events which are joined by default
+INSTALL_COLUMNS = ('install_time', 'media_source', 'campaign', 'country_code')
+EVENT_COLUMNS = ('event_time', 'event_name', 'event_revenue_usd')
+
+# Approximate memory of an index entry without lengths of values: dict slot, tuple and string objects
+_ENTRY_SIZE = 120
+_VALUE_SIZE = 57
+
+# Number of entries written into a partition file at once
+_SPILL_BATCH_SIZE = 1000
+
+
+class _PartitionFile:
+    """
+    File of pickled batches of entries of one partition.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'wb')
+        self._batch = []
+
+    def add(self, entry: tuple) -> None:
+        self._batch.append(entry)
+        if len(self._batch) >= _SPILL_BATCH_SIZE:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._batch:
+            pickle.dump(self._batch, self._file, pickle.HIGHEST_PROTOCOL)
+            self._batch = []
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._flush()
+            self._file.close()
+
+    def __iter__(self) -> Iterator[tuple]:
+        self.close()
+        with open(self.path, 'rb') as file:
+            while True:
+                try:
+                    yield from pickle.load(file)
+                except EOFError:
+                    return
+
+
+class _Spill:
+    """
+    Partitions of a join on disk. Entries go into partitions by hash of their key,
+    so matching installs and events are always in partitions with the same number.
+    """
+
+    def __init__(self, partitions: int, directory: Optional[str] = SPOOL_DIR):
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.folder = tempfile.mkdtemp(prefix='join-', dir=directory)
+        self.partitions = partitions
+        self.build = self._create_files('build')
+
+    def _create_files(self, side: str) -> List[_PartitionFile]:
+        return [_PartitionFile(os.path.join(self.folder, f'{side}-{number}.pickle'))
+                for number in range(self.partitions)]
+
+    def partition(self, key: str) -> int:
+        # Hash of strings differs between processes, but both sides are split in one process
+        return hash(key) % self.partitions
+
+    def close(self) -> None:
+        for file in self.build:
+            file.close()
+        shutil.rmtree(self.folder, ignore_errors=True)
+
+
+class StreamingJoin:
+    """
+    Inner hash join of installs with events by a key, for cohort and LTV builds.
+    Installs are put into an index which keeps only the needed columns,
+    events are streamed through it. When the index takes more memory than
+    the limit, both sides are split into partitions on disk and joined
+    partition by partition (grace hash join), joined records then come
+    in order of partitions and not in order of events.
+    """
+
+    def __init__(self,
+                 key: str = 'appsflyer_id',
+                 build_columns: Sequence[str] = INSTALL_COLUMNS,
+                 probe_columns: Sequence[str] = EVENT_COLUMNS,
+                 memory_limit: int = JOIN_MEMORY_LIMIT,
+                 partitions: int = JOIN_PARTITIONS,
+                 spool_dir: Optional[str] = SPOOL_DIR):
+        """
+        :param key: column to join by, header name or API field name
+        :param build_columns: columns kept from installs
+        :param probe_columns: columns taken from events
+        :param memory_limit: approximate memory of the index in bytes, after which it is spilled to disk
+        :param partitions: number of partitions on disk, every one must fit in memory
+        :param spool_dir: folder for partitions, system temporary folder if not passed
+        """
+        self.key = key
+        self.build_columns = tuple(build_columns)
+        self.probe_columns = tuple(probe_columns)
+        fields = (key,) + self.build_columns + self.probe_columns
+        if len(set(fields)) != len(fields):
+            raise PyAFValidationError(f"Joined columns must have different names: {', '.join(fields)}")
+        self.record_class = make_record_class(fields, 'JoinedRecord')
+
+        self.memory_limit = memory_limit
+        self.partitions = partitions
+        self.spool_dir = spool_dir
+        self.memory = 0
+        self.built = 0
+        self.matched = 0
+        self.unmatched = 0
+        self._index: Dict[str, tuple] = {}
+        self._spill: Optional[_Spill] = None
+
+    @property
+    def spilled(self) -> bool:
+        return self._spill is not None
+
+    @staticmethod
+    def _make_picker(record: Union[dict, Record], columns: Sequence[str]) -> Callable[[Union[dict, Record]], tuple]:
+        """
+        Method returns a function which takes values of columns from records shaped like the passed one.
+        """
+        fieldnames = list(record.keys())
+        positions = select_positions(fieldnames, columns)
+        if isinstance(record, Record):
+            return make_row_picker(positions)
+
+        getter = itemgetter(*[fieldnames[position] for position in positions])
+        if len(columns) == 1:
+            return lambda item: (getter(item),)
+        return getter
+
+    def _iter_values(self, records: Iterable[Union[dict, Record]], columns: Sequence[str]) -> Iterator[tuple]:
+        """
+        Method yields values of columns of records, the key is the first one.
+        """
+        records = iter(records)
+        first = next(records, None)
+        if first is None:
+            return
+        pick = self._make_picker(first, columns)
+        yield pick(first)
+        yield from map(pick, records)
+
+    def build(self, records: Iterable[Union[dict, Record]]) -> 'StreamingJoin':
+        """
+        Method puts installs into the index, could be called for several reports
+        before the join is probed. Only the first install of a key is kept,
+        records without key are skipped.
+
+        :param records: records of installs
+        :return: this join
+        """
+        index = self._index
+        for values in self._iter_values(records, (self.key,) + self.build_columns):
+            key = values[0]
+            if not key:
+                continue
+            self.built += 1
+            if self._spill is not None:
+                self._spill.build[self._spill.partition(key)].add(values)
+                continue
+            if key in index:
+                continue
+            index[key] = values[1:]
+            self.memory += _ENTRY_SIZE + _VALUE_SIZE * len(values) + sum(len(value) for value in values if value)
+            if self.memory > self.memory_limit:
+                self._spill_index()
+        return self
+
+    def _spill_index(self) -> None:
+        """
+        Method moves the index into partitions on disk.
+        """
+        self._spill = _Spill(self.partitions, self.spool_dir)
+        for key, values in self._index.items():
+            self._spill.build[self._spill.partition(key)].add((key,) + values)
+        self._index = {}
+        self.memory = 0
+
+    def probe(self, records: Iterable[Union[dict, Record]]) -> Iterator[Record]:
+        """
+        Method yields events joined with their installs, events without installs are dropped.
+        The join could be probed several times.
+
+        :param records: records of events
+        :return: iterator over records with key, install columns and event columns
+        """
+        values = self._iter_values(records, (self.key,) + self.probe_columns)
+        if self._spill is None:
+            return self._probe_index(self._index, values)
+        return self._probe_partitions(values)
+
+    def _probe_index(self, index: Dict[str, tuple], probe_values: Iterable[tuple]) -> Iterator[Record]:
+        new_record = tuple.__new__
+        record_class = self.record_class
+        matched = unmatched = 0
+        try:
+            for values in probe_values:
+                build_values = index.get(values[0])
+                if build_values is None:
+                    unmatched += 1
+                    continue
+                matched += 1
+                yield new_record(record_class, values[:1] + build_values + values[1:])
+        finally:
+            self.matched += matched
+            self.unmatched += unmatched
+
+    def _probe_partitions(self, probe_values: Iterable[tuple]) -> Iterator[Record]:
+        """
+        Method splits events into partitions and joins them partition by partition.
+        """
+        spill = self._spill
+        probe_files = spill._create_files('probe')
+        try:
+            for values in probe_values:
+                probe_files[spill.partition(values[0])].add(values)
+
+            for build_file, probe_file in zip(spill.build, probe_files):
+                index = {}
+                for values in build_file:
+                    index.setdefault(values[0], values[1:])
+                yield from self._probe_index(index, probe_file)
+        finally:
+            for file in probe_files:
+                file.close()
+                os.remove(file.path)
+
+    def aggregate(self, records: Iterable[Union[dict, Record]], aggregation: Aggregation) -> Aggregation:
+        """
+        Method folds joined events into aggregation, joined records are not kept.
+
+        :param records: records of events
+        :param aggregation: aggregation of joined records, like make_cohort_aggregation
+        :return: the passed aggregation
+        """
+        return aggregation.add(self.probe(records))
+
+    def close(self) -> None:
+        """
+        Method removes the index and partitions on disk.
+        """
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+        self._index = {}
+        self.memory = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __repr__(self) -> str:
+        return f'<StreamingJoin by {self.key}, {self.built} installs{", spilled" if self.spilled else ""}>'
+
+
+def make_cohort_aggregation(group_by: Sequence[str] = ('media_source',),
+                            revenue_column: str = 'event_revenue_usd') -> Aggregation:
+    """
+    Function returns aggregation of joined events by install day, passed columns
+    and day after install: number of events, revenue and distinct users.
+
+    :param group_by: install columns to split cohorts by
+    :param revenue_column: column with revenue of events
+    :return: aggregation for StreamingJoin.aggregate
+    """
+    return Aggregation([Day('install_time', 'cohort'), *group_by, DayNumber('event_time', 'install_time', 'day')],
+                       {'events': Count(),
+                        'revenue': Sum(revenue_column),
+                        'users': CountDistinct('appsflyer_id')})
@@ -0,0 +1,47 @@
+import sys
+import importlib
+import importlib.util
+import threading
+
+from types import ModuleType
+from typing import Optional
+
+
+class LazyModule:
+    """
+    Module which is imported on the first access to its attributes,
+    so heavy optional dependencies do not slow down import of the package.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module: Optional[ModuleType] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> ModuleType:
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, name: str):
+        return getattr(self._load(), name)
+
+    def __repr__(self) -> str:
+        state = 'loaded' if self._module is not None else 'not loaded'
+        return f'<LazyModule {self._name} {state}>'
+
+
+def lazy_import(name: str) -> Optional[LazyModule]:
+    """
+    Function returns a module which is imported on first use.
+    Only presence of the package is checked now.
+
+    :param name: module name, like pyarrow.compute
+    :return: lazy module or None if the package is not installed
+    """
+    package = name.split('.')[0]
+    if package not in sys.modules and importlib.util.find_spec(package) is None:
+        return None
+    return LazyModule(name)
@@ -0,0 +1,273 @@
+import re
+import time
+import threading
+
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Optional, Dict, Tuple, Iterable, Iterator, Sequence
+
+_API_TOKEN_RE = re.compile(r'(api_token=)[^&\s\'"]+')
+
+# Buckets of duration histograms, in seconds
+DURATION_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def hide_api_token(value) -> str:
+    """
+    Function replaces API token in URLs and error messages, so they could be logged.
+
+    :param value: URL or text
+    :return: text without API token
+    """
+    return _API_TOKEN_RE.sub(r'\1***', str(value))
+
+
+class RequestStats:
+    """
+    Measurements of one report request. Network time is time spent waiting
+    for chunks of the answer, parse time is time spent making records out of them.
+    """
+
+    def __init__(self, application_name: str, report_name: str):
+        self.application_name = application_name
+        self.report_name = report_name
+        self.started = time.perf_counter()
+        self.first_byte: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.bytes_received = 0
+        self.rows = 0
+        self.network_time = 0.0
+        self.parse_time = 0.0
+        # off, hit or miss
+        self.cache = 'off'
+        self.retries = 0
+        self.error: Optional[BaseException] = None
+
+    @property
+    def duration(self) -> Optional[float]:
+        if self.finished is None:
+            return None
+        return self.finished - self.started
+
+    @property
+    def time_to_first_byte(self) -> Optional[float]:
+        if self.first_byte is None:
+            return None
+        return self.first_byte - self.started
+
+    @property
+    def status(self) -> str:
+        return 'ok' if self.error is None else 'error'
+
+    def meter_chunks(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """
+        Method passes chunks further and measures network time and received bytes.
+        """
+        chunks = iter(chunks)
+        while True:
+            started = time.perf_counter()
+            try:
+                chunk = next(chunks)
+            except StopIteration:
+                self.network_time += time.perf_counter() - started
+                return
+            finally:
+                if self.first_byte is None:
+                    self.first_byte = time.perf_counter()
+            self.network_time += time.perf_counter() - started
+            self.bytes_received += len(chunk)
+            yield chunk
+
+    def meter_records(self, records: Iterable) -> Iterator:
+        """
+        Method passes records further and measures parse time, which is time of reading
+        records without time of waiting for the network.
+        """
+        records = iter(records)
+        network_time = self.network_time
+        read_time = 0.0
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    record = next(records)
+                except StopIteration:
+                    return
+                finally:
+                    read_time += time.perf_counter() - started
+                self.rows += 1
+                yield record
+        finally:
+            self.parse_time += max(0.0, read_time - (self.network_time - network_time))
+
+    def __repr__(self) -> str:
+        return f'<RequestStats {self.application_name}/{self.report_name} {self.status}>'
+
+
+class Instrumentation:
+    """
+    Base class for instrumentation hooks of reports. Hooks are called
+    in the thread which receives the report, they must be fast and thread safe.
+    """
+
+    def on_request_start(self, stats: RequestStats) -> None:
+        """
+        Called before a report is requested.
+        """
+
+    def on_retry(self, stats: RequestStats, attempt: int, reason: str, delay: float) -> None:
+        """
+        Called when a failed request is going to be repeated.
+
+        :param attempt: number of the failed attempt
+        :param reason: status or error of the failed attempt
+        :param delay: seconds before the next attempt
+        """
+
+    def on_request_end(self, stats: RequestStats) -> None:
+        """
+        Called when a report is received or failed, stats are final.
+        """
+
+
+class CompositeInstrumentation(Instrumentation):
+    """
+    Passes events into several instrumentations.
+    """
+
+    def __init__(self, *instrumentations: Instrumentation):
+        self.instrumentations = instrumentations
+
+    def on_request_start(self, stats: RequestStats) -> None:
+        for instrumentation in self.instrumentations:
+            instrumentation.on_request_start(stats)
+
+    def on_retry(self, stats: RequestStats, attempt: int, reason: str, delay: float) -> None:
+        for instrumentation in self.instrumentations:
+            instrumentation.on_retry(stats, attempt, reason, delay)
+
+    def on_request_end(self, stats: RequestStats) -> None:
+        for instrumentation in self.instrumentations:
+            instrumentation.on_request_end(stats)
+
+
+class _Histogram:
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+# Name, type and help of exported metrics
+METRICS = (
+    ('appsflyer_requests_total', 'counter', 'Report requests by status and cache use.'),
+    ('appsflyer_retries_total', 'counter', 'Repeated report requests.'),
+    ('appsflyer_received_bytes_total', 'counter', 'Bytes of received reports.'),
+    ('appsflyer_parsed_rows_total', 'counter', 'Parsed report rows.'),
+    ('appsflyer_network_seconds_total', 'counter', 'Time spent waiting for the network.'),
+    ('appsflyer_parse_seconds_total', 'counter', 'Time spent parsing reports.'),
+    ('appsflyer_request_duration_seconds', 'histogram', 'Duration of report requests.'),
+    ('appsflyer_time_to_first_byte_seconds', 'histogram', 'Time from request to the first received byte.'),
+)
+
+
+class MetricsRegistry(Instrumentation):
+    """
+    Keeps metrics of received reports in memory, labeled by application and report.
+    Metrics could be exported in Prometheus text format.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DURATION_BUCKETS):
+        """
+        :param buckets: upper bounds of duration histograms in seconds
+        """
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Tuple, float]] = defaultdict(lambda: defaultdict(float))
+        self._histograms: Dict[str, Dict[Tuple, _Histogram]] = defaultdict(dict)
+
+    def on_retry(self, stats: RequestStats, attempt: int, reason: str, delay: float) -> None:
+        with self._lock:
+            self._counters['appsflyer_retries_total'][self._labels(stats)] += 1
+
+    def on_request_end(self, stats: RequestStats) -> None:
+        labels = self._labels(stats)
+        with self._lock:
+            self._counters['appsflyer_requests_total'][
+                labels + (('status', stats.status), ('cache', stats.cache))] += 1
+            self._counters['appsflyer_received_bytes_total'][labels] += stats.bytes_received
+            self._counters['appsflyer_parsed_rows_total'][labels] += stats.rows
+            self._counters['appsflyer_network_seconds_total'][labels] += stats.network_time
+            self._counters['appsflyer_parse_seconds_total'][labels] += stats.parse_time
+            self._observe('appsflyer_request_duration_seconds', labels, stats.duration)
+            self._observe('appsflyer_time_to_first_byte_seconds', labels, stats.time_to_first_byte)
+
+    @staticmethod
+    def _labels(stats: RequestStats) -> Tuple:
+        return ('app', stats.application_name), ('report', stats.report_name)
+
+    def _observe(self, name: str, labels: Tuple, value: Optional[float]) -> None:
+        if value is None:
+            return
+        histograms = self._histograms[name]
+        if labels not in histograms:
+            histograms[labels] = _Histogram(self.buckets)
+        histograms[labels].observe(value)
+
+    def get(self, name: str, **labels) -> float:
+        """
+        Method returns value of a counter, or number of observations of a histogram,
+        summed over series which have passed labels.
+
+        :param name: metric name
+        :param labels: label values, like app='com.app' or report='installs_report'
+        """
+        def matches(series: Tuple) -> bool:
+            return all(item in series for item in labels.items())
+
+        with self._lock:
+            if name in self._histograms:
+                return sum(histogram.count for series, histogram in self._histograms[name].items()
+                           if matches(series))
+            return sum(value for series, value in self._counters.get(name, {}).items() if matches(series))
+
+    def to_prometheus(self) -> str:
+        """
+        Method returns all metrics in Prometheus text exposition format.
+        """
+        lines = []
+        with self._lock:
+            for name, metric_type, description in METRICS:
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} {metric_type}')
+                if metric_type == 'counter':
+                    for series, value in sorted(self._counters.get(name, {}).items()):
+                        lines.append(f'{name}{_format_labels(series)} {_format_value(value)}')
+                    continue
+
+                for series, histogram in sorted(self._histograms.get(name, {}).items()):
+                    cumulative = 0
+                    for bound, count in zip(self.buckets + (float('inf'),), histogram.counts):
+                        cumulative += count
+                        le = '+Inf' if bound == float('inf') else _format_value(bound)
+                        lines.append(f'{name}_bucket{_format_labels(series + (("le", le),))} {cumulative}')
+                    lines.append(f'{name}_sum{_format_labels(series)} {_format_value(histogram.sum)}')
+                    lines.append(f'{name}_count{_format_labels(series)} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(series: Tuple) -> str:
+    def escape(value: str) -> str:
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{name}="{escape(value)}"' for name, value in series) + '}'
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
@@ -0,0 +1,328 @@
+import time
+import logging
+import threading
+
+from collections import OrderedDict, Counter, deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Optional, Callable, Dict, List, Iterable, Iterator, Sequence, Type
+
+from .base import BaseAppsFlyer
+from .cache import ReportCache
+from .settings import ORCHESTRATOR_MAX_WORKERS, ORCHESTRATOR_APP_CONCURRENCY,\
+    ORCHESTRATOR_ACCOUNT_RATE, ORCHESTRATOR_APP_RATE
+from .exceptions import PyAFReportsError, PyAFValidationError
+
+
+class TokenBucket:
+    """
+    Rate limiter. Tokens are added with a constant rate up to capacity and every
+    request takes one, so short bursts up to capacity are allowed while the
+    long-term rate stays limited.
+    """
+
+    def __init__(self,
+                 rate: float,
+                 capacity: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        :param rate: tokens added per second
+        :param capacity: max number of tokens, one second of rate if not passed
+        :param clock: monotonic clock in seconds
+        """
+        if rate <= 0:
+            raise PyAFValidationError('Rate must be positive')
+
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def get_delay(self, tokens: float = 1.0) -> float:
+        """
+        Method returns seconds until tokens are available, 0 if they are available now.
+
+        :param tokens: number of needed tokens
+        """
+        with self._lock:
+            self._refill()
+            return max(0.0, (tokens - self._tokens) / self.rate)
+
+    def take(self, tokens: float = 1.0) -> None:
+        """
+        Method takes tokens without waiting, the bucket could go into debt.
+
+        :param tokens: number of taken tokens
+        """
+        with self._lock:
+            self._refill()
+            self._tokens -= tokens
+
+    def acquire(self, tokens: float = 1.0) -> None:
+        """
+        Method waits until tokens are available and takes them.
+
+        :param tokens: number of needed tokens
+        """
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                delay = (tokens - self._tokens) / self.rate
+            time.sleep(delay)
+
+
+class FetchTask:
+    """
+    One report of one application received by the orchestrator.
+    """
+
+    def __init__(self, report: BaseAppsFlyer, name: str, call_kwargs: dict):
+        """
+        :param report: report instance bound to the application
+        :param name: result name of the report
+        :param call_kwargs: params for iter_report
+        """
+        self.report = report
+        self.name = name
+        self.call_kwargs = call_kwargs
+        self.status = 'pending'
+        self.result = None
+        self.error = None
+        self.duration = None
+
+    @property
+    def application_name(self) -> str:
+        return self.report.application_name
+
+    @property
+    def key(self) -> str:
+        return f'{self.application_name}/{self.name}'
+
+    def __repr__(self) -> str:
+        return f'<FetchTask {self.key} {self.status}>'
+
+
+def collect_records(task: FetchTask, records: Iterator) -> list:
+    """
+    Default handler of received reports, keeps records in a list.
+    """
+    return list(records)
+
+
+class ReportOrchestrator:
+    """
+    Receives reports of many applications. Reports are scheduled so that
+    there are not more than max_workers downloads at all and app_concurrency
+    downloads of one application, and requests are started not faster than
+    account and application rate limits allow. Applications take turns,
+    so every application moves forward.
+    """
+
+    def __init__(self,
+                 api_key: Optional[str] = None,
+                 max_workers: int = ORCHESTRATOR_MAX_WORKERS,
+                 app_concurrency: int = ORCHESTRATOR_APP_CONCURRENCY,
+                 account_rate: Optional[float] = ORCHESTRATOR_ACCOUNT_RATE,
+                 app_rate: Optional[float] = ORCHESTRATOR_APP_RATE,
+                 session: Optional['requests.Session'] = None,
+                 cache: Optional[ReportCache] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        :param api_key: AppsFlyer API key shared by all applications
+        :param max_workers: max number of downloads at once
+        :param app_concurrency: max number of downloads of one application at once
+        :param account_rate: max number of requests per minute for the account, not limited if 0
+        :param app_rate: max number of requests per minute for one application, not limited if 0
+        :param session: session for all reports, shared default session if not passed
+        :param cache: cache for all reports
+        :param clock: monotonic clock in seconds for rate limits
+        """
+        if max_workers < 1 or app_concurrency < 1:
+            raise PyAFValidationError('Concurrency limits must be positive')
+
+        self.api_key = api_key
+        self.max_workers = max_workers
+        self.app_concurrency = app_concurrency
+        self.app_rate = app_rate
+        self.session = session
+        self.cache = cache
+        self.clock = clock
+        self.logger = logging.getLogger('ReportOrchestrator')
+        self.tasks: List[FetchTask] = []
+
+        self._account_bucket = self._create_bucket(account_rate)
+        self._app_buckets: Dict[str, Optional[TokenBucket]] = {}
+
+    def _create_bucket(self, rate_per_minute: Optional[float]) -> Optional[TokenBucket]:
+        if not rate_per_minute:
+            return None
+        return TokenBucket(rate_per_minute / 60, capacity=max(1.0, rate_per_minute / 60), clock=self.clock)
+
+    def add(self,
+            application_name: str,
+            report_class: Type[BaseAppsFlyer],
+            report_names: Optional[Sequence[str]] = None,
+            exclude_reports: Optional[Sequence[str]] = None,
+            exclude_retargeting_reports: Optional[Sequence[str]] = None,
+            **kwargs) -> List[FetchTask]:
+        """
+        Method adds reports of an application.
+
+        :param application_name: application name
+        :param report_class: report class, for example RawDataReport
+        :param report_names: reports to receive, all reports of the class as get_reports if not passed
+        :param exclude_reports: reports which are not received
+        :param exclude_retargeting_reports: retargeting reports which are not received, for RawDataReport
+        :param kwargs: params for iter_report, like from_date and to_date
+        :return: added tasks
+        """
+        report = report_class(application_name, api_key=self.api_key, session=self.session, cache=self.cache)
+
+        if report_names:
+            report_calls = [(report_name, {'api_report_name': report_name}) for report_name in report_names]
+        elif exclude_retargeting_reports:
+            report_calls = report._get_report_calls(tuple(exclude_reports or ()), tuple(exclude_retargeting_reports))
+        else:
+            report_calls = report._get_report_calls(tuple(exclude_reports or ()))
+
+        tasks = [FetchTask(report, name, {**call_kwargs, **kwargs}) for name, call_kwargs in report_calls]
+        self.tasks.extend(tasks)
+        return tasks
+
+    def add_apps(self,
+                 application_names: Iterable[str],
+                 report_classes: Iterable[Type[BaseAppsFlyer]],
+                 **kwargs) -> List[FetchTask]:
+        """
+        Method adds reports of every class for every application.
+
+        :param application_names: application names
+        :param report_classes: report classes
+        :param kwargs: params for add
+        :return: added tasks
+        """
+        report_classes = list(report_classes)
+        return [task
+                for application_name in application_names
+                for report_class in report_classes
+                for task in self.add(application_name, report_class, **kwargs)]
+
+    def run(self,
+            handler: Callable[[FetchTask, Iterator], object] = collect_records,
+            progress: Optional[Callable[[FetchTask, int, int], None]] = None) -> List[FetchTask]:
+        """
+        Method receives all added reports. Failed reports do not stop the others,
+        they are raised together at the end.
+
+        :param handler: function called in a worker with a task and an iterator over its records,
+                        its result is kept in the task, records are collected in a list by default
+        :param progress: function called with a finished task, number of finished tasks and
+                         number of all tasks
+        :return: finished tasks in order of adding
+        """
+        pending = OrderedDict()
+        for task in self.tasks:
+            if task.status in ('pending', 'failed'):
+                task.status = 'pending'
+                pending.setdefault(task.application_name, deque()).append(task)
+
+        total = sum(len(tasks) for tasks in pending.values())
+        finished = 0
+        running = Counter()
+        futures: Dict[Future, FetchTask] = {}
+        errors = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or futures:
+                delay = self._submit_ready(executor, handler, pending, running, futures)
+
+                if not futures:
+                    time.sleep(delay)
+                    continue
+
+                done, _ = wait(futures, timeout=delay, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = futures.pop(future)
+                    running[task.application_name] -= 1
+                    finished += 1
+
+                    if future.exception() is not None:
+                        task.status = 'failed'
+                        task.error = future.exception()
+                        errors[task.key] = task.error
+                        self.logger.error(f'Report {task.key} was not received: {task.error!r}')
+                    else:
+                        task.status = 'done'
+                        self.logger.info(f'Report {task.key} was received in {task.duration:.1f}s, '
+                                         f'{finished}/{total}')
+                    if progress is not None:
+                        progress(task, finished, total)
+
+        if errors:
+            raise PyAFReportsError(
+                f"Reports were not received: {', '.join(errors)}",
+                reports=[task for task in self.tasks if task.status == 'done'],
+                errors=errors
+            )
+        return self.tasks
+
+    def _submit_ready(self,
+                      executor: ThreadPoolExecutor,
+                      handler: Callable[[FetchTask, Iterator], object],
+                      pending: 'OrderedDict[str, deque]',
+                      running: Counter,
+                      futures: Dict[Future, FetchTask]) -> Optional[float]:
+        """
+        Method starts tasks allowed by concurrency and rate limits.
+
+        :return: seconds until a rate limit allows the next task, None if only
+                 finishing of a running task could allow it
+        """
+        delay = None
+
+        for application_name in list(pending):
+            tasks = pending[application_name]
+            bucket = self._get_app_bucket(application_name)
+
+            while tasks and len(futures) < self.max_workers and running[application_name] < self.app_concurrency:
+                buckets = [bucket for bucket in (self._account_bucket, bucket) if bucket is not None]
+                wait_for = max([bucket.get_delay() for bucket in buckets], default=0.0)
+                if wait_for > 0:
+                    delay = wait_for if delay is None else min(delay, wait_for)
+                    break
+
+                for bucket_to_take in buckets:
+                    bucket_to_take.take()
+                task = tasks.popleft()
+                task.status = 'running'
+                running[application_name] += 1
+                futures[executor.submit(self._run_task, task, handler)] = task
+
+            if not tasks:
+                del pending[application_name]
+
+        # Next time another application is the first one
+        if pending:
+            pending.move_to_end(next(iter(pending)))
+        return delay
+
+    def _get_app_bucket(self, application_name: str) -> Optional[TokenBucket]:
+        if application_name not in self._app_buckets:
+            self._app_buckets[application_name] = self._create_bucket(self.app_rate)
+        return self._app_buckets[application_name]
+
+    def _run_task(self, task: FetchTask, handler: Callable[[FetchTask, Iterator], object]) -> None:
+        started = time.monotonic()
+        try:
+            task.result = handler(task, task.report.iter_report(**task.call_kwargs))
+        finally:
+            task.duration = time.monotonic() - started
@@ -0,0 +1,192 @@
+import os
+import csv
+import mmap
+import tempfile
+
+from collections import deque
+from typing import Optional, Callable, List, Tuple, Iterable, Iterator, Sequence
+
+from .lazy import lazy_import
+from .ingest import split_lines
+from .records import RecordReader
+from .typed import ArrowDecoder, iter_batches, get_report_schema
+from .settings import DEFAULT_CSV_ENCODING, DEFAULT_BATCH_SIZE, PARALLEL_CHUNK_SIZE, SPOOL_DIR
+
+# Optional dependency, it is imported on first use
+pa = lazy_import('pyarrow')
+
+
+def spool(chunks: Iterable[bytes], directory: Optional[str] = SPOOL_DIR) -> str:
+    """
+    Function writes raw chunks of a report into a temporary file.
+    The file must be removed by the caller.
+
+    :param chunks: raw chunks of CSV file
+    :param directory: folder for the file, system temporary folder if not passed
+    :return: path to the file
+    """
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    descriptor, path = tempfile.mkstemp(suffix='.csv', dir=directory)
+    try:
+        with os.fdopen(descriptor, 'wb') as file:
+            for chunk in chunks:
+                file.write(chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+def _find_record_end(data: mmap.mmap, start: int, position: int) -> int:
+    """
+    Function returns position after the first line break from position,
+    which is not inside a quoted field. Record must begin at start.
+    """
+    line_break = data.find(b'\n', position)
+    if line_break < 0:
+        return len(data)
+
+    quotes = data[start:line_break].count(b'"')
+    while quotes % 2:
+        next_line_break = data.find(b'\n', line_break + 1)
+        if next_line_break < 0:
+            return len(data)
+        quotes += data[line_break:next_line_break].count(b'"')
+        line_break = next_line_break
+    return line_break + 1
+
+
+def split_file(path: str,
+               chunk_size: int = PARALLEL_CHUNK_SIZE,
+               encoding: str = DEFAULT_CSV_ENCODING) -> Tuple[List[str], List[Tuple[int, int]]]:
+    """
+    Function reads CSV header and splits the rest of the file into byte ranges
+    of about chunk size, every range contains only complete records.
+
+    :param path: path to CSV file
+    :param chunk_size: size of a range in bytes
+    :param encoding: CSV encoding
+    :return: header and list of ranges beginnings and ends
+    """
+    if not os.path.getsize(path):
+        return [], []
+
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        header_end = _find_record_end(data, 0, 0)
+        header = next(csv.reader(split_lines(data[:header_end].decode(encoding))), [])
+
+        ranges = []
+        start = header_end
+        while start < len(data):
+            end = _find_record_end(data, start, start + chunk_size)
+            ranges.append((start, end))
+            start = end
+
+    return header, ranges
+
+
+def parse_range(path: str,
+                start: int,
+                end: int,
+                fieldnames: Sequence[str],
+                encoding: str = DEFAULT_CSV_ENCODING,
+                row_format: str = 'dict',
+                columns: Optional[Sequence[str]] = None) -> list:
+    """
+    Function parses records of a file range, it is called in worker processes.
+
+    :param path: path to CSV file
+    :param start: beginning of the range
+    :param end: end of the range
+    :param fieldnames: report header
+    :param encoding: CSV encoding
+    :param row_format: dict or record
+    :param columns: columns to take from rows, all columns if not passed
+    :return: list of records
+    """
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        # Ranges begin after the header, so there is no BOM in them
+        text = data[start:end].decode(encoding.replace('-sig', ''))
+
+    reader = csv.DictReader(split_lines(text), fieldnames=fieldnames)
+    return list(RecordReader(reader, row_format, columns=columns))
+
+
+def parse_range_to_arrow(path: str,
+                         start: int,
+                         end: int,
+                         fieldnames: Sequence[str],
+                         api_report_name: str,
+                         encoding: str = DEFAULT_CSV_ENCODING,
+                         columns: Optional[Sequence[str]] = None,
+                         batch_size: int = DEFAULT_BATCH_SIZE) -> bytes:
+    """
+    Function parses records of a file range into typed Arrow table,
+    it is called in worker processes. Schema is looked up by report name
+    in the worker, as lookups of column types rely on schema identity.
+
+    :return: table in Arrow IPC stream format
+    """
+    records = parse_range(path, start, end, fieldnames, encoding, 'record', columns)
+    decoder = ArrowDecoder(get_report_schema(api_report_name))
+    for batch in iter_batches(records, batch_size):
+        decoder.add_batch(batch)
+    table = decoder.finish()
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def iter_parallel(task: Callable[[int, int], object],
+                  ranges: List[Tuple[int, int]],
+                  max_workers: Optional[int] = None) -> Iterator:
+    """
+    Function calls task for every range in a process pool and yields
+    results in ranges order. No more than twice workers results are kept in memory.
+
+    :param task: module level function or partial of it, which takes range beginning and end
+    :param ranges: ranges of a file
+    :param max_workers: number of processes, number of CPUs if not passed
+    :return: iterator over results
+    """
+    # Process pool is imported only when it is needed, it takes time
+    from concurrent.futures import ProcessPoolExecutor
+
+    max_workers = max_workers or os.cpu_count() or 1
+    ranges = iter(ranges)
+    pending = deque()
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            for start, end in ranges:
+                pending.append(executor.submit(task, start, end))
+                if len(pending) == max_workers * 2:
+                    break
+
+            while pending:
+                result = pending.popleft().result()
+                for start, end in ranges:
+                    pending.append(executor.submit(task, start, end))
+                    break
+                yield result
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def read_arrow_table(results: Iterable[bytes]) -> 'pa.Table':
+    """
+    Function merges tables of ranges into one table.
+
+    :param results: tables in Arrow IPC stream format
+    :return: Arrow table
+    """
+    tables = [pa.ipc.open_stream(result).read_all() for result in results]
+    tables = [table for table in tables if table.num_columns]
+    if not tables:
+        return pa.table({})
+    return pa.concat_tables(tables).unify_dictionaries()
@@ -0,0 +1,225 @@
+import queue
+import threading
+
+from typing import Optional, Callable, List, Iterable, Iterator, Sequence
+
+from .writers import RecordWriter
+from .records import Record
+from .settings import PIPELINE_QUEUE_SIZE, PIPELINE_BATCH_SIZE
+
+# Marks the end of a stream in a queue
+_DONE = object()
+# Stages check if the pipeline was stopped with this interval, in seconds
+_POLL_INTERVAL = 0.1
+
+
+class PipelineSink:
+    """
+    Base class for pipeline sinks. Sink receives batches of records in its own thread.
+    It is opened before the first batch and closed with the error of the pipeline,
+    so sinks could save or drop received records.
+    """
+
+    def open(self) -> None:
+        """
+        Prepares the sink, called in the sink thread.
+        """
+
+    def write_batch(self, records: List[Record]) -> None:
+        """
+        Writes one batch of records.
+
+        :param records: records of a report
+        """
+        raise NotImplementedError
+
+    def close(self, error: Optional[BaseException] = None) -> None:
+        """
+        Finishes the sink.
+
+        :param error: error of the pipeline, None if all records were received
+        """
+
+
+class CallbackSink(PipelineSink):
+    """
+    Passes every batch into a function.
+    """
+
+    def __init__(self, callback: Callable[[List[Record]], None]):
+        """
+        :param callback: function called with every batch
+        """
+        self.callback = callback
+
+    def write_batch(self, records: List[Record]) -> None:
+        self.callback(records)
+
+
+class WriterSink(PipelineSink):
+    """
+    Writes records with a record writer. The file gets its name
+    only if all records were received.
+    """
+
+    def __init__(self, writer: RecordWriter):
+        """
+        :param writer: opened record writer
+        """
+        self.writer = writer
+
+    def write_batch(self, records: List[Record]) -> None:
+        for record in records:
+            self.writer.write(record)
+
+    def close(self, error: Optional[BaseException] = None) -> None:
+        if error is None:
+            self.writer.commit()
+        else:
+            self.writer.abort()
+
+
+class ReportPipeline:
+    """
+    Runs receiving of a report in stages connected with bounded queues:
+    reader thread pulls raw chunks, parser thread makes batches of records,
+    every sink writes batches in its own thread. A full queue blocks the stage
+    before it, so memory is bounded by queue sizes and a slow sink slows down
+    reading instead of piling records up. Network reads and parsing overlap,
+    as sockets and file writes release the GIL.
+    """
+
+    def __init__(self,
+                 sinks: Sequence[PipelineSink],
+                 queue_size: int = PIPELINE_QUEUE_SIZE,
+                 batch_size: int = PIPELINE_BATCH_SIZE):
+        """
+        :param sinks: sinks receiving every batch
+        :param queue_size: max number of chunks or batches waiting in a queue
+        :param batch_size: number of records in a batch
+        """
+        self.sinks = list(sinks)
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.records_number = 0
+        self._stopped = threading.Event()
+        self._errors = []
+
+    def run(self,
+            chunks: Iterable[bytes],
+            parse: Callable[[Iterable[bytes]], Iterable[Record]]) -> int:
+        """
+        Runs all stages and waits for them. The first error of any stage stops the pipeline
+        and is raised here.
+
+        :param chunks: raw chunks of a report
+        :param parse: function turning chunks into records
+        :return: number of received records
+        """
+        chunk_queue = queue.Queue(self.queue_size)
+        sink_queues = [queue.Queue(self.queue_size) for _ in self.sinks]
+
+        threads = [
+            threading.Thread(target=self._read, args=(chunks, chunk_queue), name='pipeline-reader'),
+            threading.Thread(target=self._parse, args=(parse, chunk_queue, sink_queues), name='pipeline-parser'),
+        ]
+        threads.extend(
+            threading.Thread(target=self._write, args=(sink, sink_queue), name=f'pipeline-sink-{number}')
+            for number, (sink, sink_queue) in enumerate(zip(self.sinks, sink_queues))
+        )
+
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                thread.join()
+        except BaseException:
+            self._stop(None)
+            raise
+
+        if self._errors:
+            raise self._errors[0]
+        return self.records_number
+
+    def _stop(self, error: Optional[BaseException]) -> None:
+        if error is not None:
+            self._errors.append(error)
+        self._stopped.set()
+
+    def _put(self, items: queue.Queue, item) -> bool:
+        """
+        Puts an item into a queue, waits while it is full.
+
+        :return: False if the pipeline was stopped
+        """
+        while not self._stopped.is_set():
+            try:
+                items.put(item, timeout=_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _iter_queue(self, items: queue.Queue) -> Iterator:
+        """
+        Yields items from a queue until the end of stream or stop of the pipeline.
+        """
+        while not self._stopped.is_set():
+            try:
+                item = items.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            if item is _DONE:
+                return
+            yield item
+
+    def _read(self, chunks: Iterable[bytes], chunk_queue: queue.Queue) -> None:
+        try:
+            for chunk in chunks:
+                if not self._put(chunk_queue, chunk):
+                    return
+            self._put(chunk_queue, _DONE)
+        except BaseException as err:
+            self._stop(err)
+
+    def _parse(self,
+               parse: Callable[[Iterable[bytes]], Iterable[Record]],
+               chunk_queue: queue.Queue,
+               sink_queues: List[queue.Queue]) -> None:
+        try:
+            batch = []
+            for record in parse(self._iter_queue(chunk_queue)):
+                batch.append(record)
+                if len(batch) >= self.batch_size:
+                    if not self._publish(batch, sink_queues):
+                        return
+                    batch = []
+            if self._stopped.is_set():
+                return
+            if batch and not self._publish(batch, sink_queues):
+                return
+            for sink_queue in sink_queues:
+                self._put(sink_queue, _DONE)
+        except BaseException as err:
+            self._stop(err)
+
+    def _publish(self, batch: List[Record], sink_queues: List[queue.Queue]) -> bool:
+        self.records_number += len(batch)
+        return all(self._put(sink_queue, batch) for sink_queue in sink_queues)
+
+    def _write(self, sink: PipelineSink, sink_queue: queue.Queue) -> None:
+        error = None
+        try:
+            sink.open()
+            for batch in self._iter_queue(sink_queue):
+                sink.write_batch(batch)
+        except BaseException as err:
+            error = err
+            self._stop(err)
+        finally:
+            if error is None and self._stopped.is_set():
+                error = self._errors[0] if self._errors else RuntimeError('Pipeline was stopped')
+            try:
+                sink.close(error)
+            except BaseException as err:
+                self._stop(err)
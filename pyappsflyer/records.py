@@ -0,0 +1,221 @@
+import re
+import csv
+
+from functools import lru_cache
+from operator import itemgetter
+from typing import Optional, Callable, Dict, Tuple, Type, Sequence, Iterator, Union, List
+
+from .exceptions import PyAFValidationError
+
+ROW_FORMATS = ('dict', 'record')
+
+
+class Record(tuple):
+    """
+    Compact report record, a tuple with values of one row.
+    Column names are kept once in the record class of the report,
+    values are accessed by column name or by position.
+    """
+
+    __slots__ = ()
+
+    fields: Tuple[str, ...] = ()
+    _positions: Dict[str, int] = {}
+
+    @classmethod
+    def from_row(cls, row: Sequence[str]) -> 'Record':
+        """
+        Creates a record from CSV row. Missing values are filled with None,
+        values without columns are dropped.
+
+        :param row: values of CSV row
+        :return: record instance
+        """
+        width = len(cls.fields)
+        if len(row) != width:
+            row = (list(row) + [None] * width)[:width]
+        return tuple.__new__(cls, row)
+
+    def __getitem__(self, key: Union[str, int, slice]):
+        if isinstance(key, str):
+            return tuple.__getitem__(self, self._positions[key])
+        return tuple.__getitem__(self, key)
+
+    def get(self, key: str, default=None):
+        position = self._positions.get(key)
+        if position is None:
+            return default
+        return tuple.__getitem__(self, position)
+
+    def keys(self) -> Tuple[str, ...]:
+        return self.fields
+
+    def values(self) -> tuple:
+        return tuple(self)
+
+    def items(self) -> Iterator[Tuple[str, str]]:
+        return zip(self.fields, self)
+
+    def to_dict(self) -> dict:
+        return dict(zip(self.fields, self))
+
+    def __reduce__(self):
+        return _rebuild_record, (self.fields, tuple(self))
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({self.to_dict()!r})'
+
+
+@lru_cache(maxsize=256)
+def make_record_class(fields: Tuple[str, ...], name: str = 'Record') -> Type[Record]:
+    """
+    Function returns record class for report columns.
+    Reports with the same columns share the class.
+
+    :param fields: column names
+    :param name: class name
+    :return: record class
+    """
+    return type(name, (Record,), {
+        '__slots__': (),
+        'fields': fields,
+        '_positions': {field: position for position, field in enumerate(fields)},
+    })
+
+
+def normalize_column_name(name: str) -> str:
+    """
+    Function returns column name without case, spaces and punctuation,
+    so API field names match report headers: appsflyer_id - AppsFlyer ID.
+
+    :param name: column name or API field name
+    :return: normalized name
+    """
+    return re.sub(r'[^0-9a-z]', '', name.lower())
+
+
+def select_positions(fieldnames: Sequence[str], columns: Sequence[str]) -> List[int]:
+    """
+    Function returns positions of columns in report header.
+    Columns could be passed as header names or as API field names.
+
+    :param fieldnames: report header
+    :param columns: columns to select
+    :return: list of positions
+    """
+    positions = {}
+    for position, name in enumerate(fieldnames):
+        positions.setdefault(name, position)
+        positions.setdefault(normalize_column_name(name), position)
+
+    missing = [column for column in columns
+               if column not in positions and normalize_column_name(column) not in positions]
+    if missing:
+        raise PyAFValidationError(f"No such columns in report: {', '.join(missing)}")
+
+    return [positions[column] if column in positions else positions[normalize_column_name(column)]
+            for column in columns]
+
+
+def make_row_picker(positions: Sequence[int]) -> Callable[[list], tuple]:
+    """
+    Function returns a function which takes values on positions from CSV row.
+    Missing values are returned as None.
+
+    :param positions: positions of values
+    :return: function to pick values
+    """
+    getter = itemgetter(*positions)
+    width = max(positions) + 1
+
+    if len(positions) == 1:
+        def pick(row: list) -> tuple:
+            if len(row) < width:
+                row = row + [None] * (width - len(row))
+            return getter(row),
+        return pick
+
+    def pick(row: list) -> tuple:
+        if len(row) < width:
+            row = row + [None] * (width - len(row))
+        return getter(row)
+    return pick
+
+
+def _rebuild_record(fields: Tuple[str, ...], values: tuple) -> Record:
+    return tuple.__new__(make_record_class(fields), values)
+
+
+class RecordReader:
+    """
+    Iterator over records of CSV reader in dict or compact record format.
+    If columns are passed, only their values are taken from rows.
+    It could be iterated again, when the underlying stream gets more data.
+    """
+
+    __slots__ = ('reader', 'row_format', 'columns', 'validate', 'make_record', 'validated')
+
+    def __init__(self,
+                 reader: csv.DictReader,
+                 row_format: str = 'dict',
+                 validate: Optional[Callable] = None,
+                 columns: Optional[Sequence[str]] = None):
+        """
+        :param reader: CSV reader
+        :param row_format: dict or record
+        :param validate: function to check the first record
+        :param columns: columns to select, all columns if not passed
+        """
+        if row_format not in ROW_FORMATS:
+            raise ValueError(f'Unknown row format {row_format}')
+        self.reader = reader
+        self.row_format = row_format
+        self.columns = tuple(columns) if columns else None
+        self.validate = validate
+        self.make_record = None
+        self.validated = validate is None
+
+    def __iter__(self):
+        return self
+
+    def _prepare(self) -> None:
+        """
+        Reads report header and prepares a function to make records.
+        """
+        fieldnames = self.reader.fieldnames
+        if fieldnames is None:
+            raise StopIteration
+
+        if not self.validated:
+            self.validate(fieldnames)
+            self.validated = True
+
+        names = tuple(fieldnames)
+        pick = None
+        if self.columns:
+            pick = make_row_picker(select_positions(fieldnames, self.columns))
+            names = self.columns
+
+        if self.row_format == 'record':
+            from_row = make_record_class(names).from_row
+            self.make_record = from_row if pick is None else lambda row: from_row(pick(row))
+        else:
+            self.make_record = lambda row: dict(zip(names, pick(row)))
+
+    def __next__(self) -> Union[dict, Record]:
+        if self.row_format == 'dict' and not self.columns:
+            record = next(self.reader)
+            if not self.validated:
+                # Checks the first row if there no problem in request answer
+                # because AppsFlyer could answer with 200 OK and without any CSV data.
+                self.validate(record)
+                self.validated = True
+            return record
+
+        if self.make_record is None:
+            self._prepare()
+
+        row = next(self.reader.reader)
+        while not row:
+            row = next(self.reader.reader)
+        return self.make_record(row)
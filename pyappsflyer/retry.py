@@ -0,0 +1,282 @@
+import time
+import random
+import threading
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from datetime import datetime, timezone
+from typing import Optional, Callable, Sequence
+
+from .settings import RETRY_MAX_ATTEMPTS, RETRY_BACKOFF, RETRY_MAX_BACKOFF,\
+    HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT, HEDGE_PERCENTILE, HEDGE_DELAY
+from .lazy import lazy_import
+from .metrics import hide_api_token
+from .exceptions import PyAFCommunicationError
+
+requests = lazy_import('requests')
+asyncio = lazy_import('asyncio')
+aiohttp = lazy_import('aiohttp')
+
+# Statuses after which request is repeated
+RETRYABLE_STATUSES = (408, 429, 500, 502, 503, 504)
+# Number of latest latencies, hedging delay is taken from
+LATENCY_WINDOW = 200
+# Hedging by percentile starts after this number of requests
+MIN_LATENCY_SAMPLES = 20
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Function returns seconds to wait from Retry-After header,
+    which could be a number of seconds or an HTTP date.
+
+    :param value: header value
+    :return: seconds or None if header is absent or wrong
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    from email.utils import parsedate_to_datetime
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class LatencyTracker:
+    """
+    Keeps latest latencies of requests to calculate percentiles.
+    """
+
+    def __init__(self, size: int = LATENCY_WINDOW):
+        self._latencies = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds: float) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """
+        :param percent: percentile from 0 to 100
+        :return: latency in seconds, None if there are not enough requests yet
+        """
+        with self._lock:
+            if len(self._latencies) < MIN_LATENCY_SAMPLES:
+                return None
+            latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, int(len(latencies) * percent / 100))]
+
+
+class RetryPolicy:
+    """
+    Sends requests with timeouts and repeats them after connection errors and
+    retryable statuses. Delays grow exponentially with full jitter and
+    Retry-After header is honored. If a request waits for an answer longer
+    than usual, a hedged duplicate is sent and the first answer is taken.
+    """
+
+    def __init__(self,
+                 max_attempts: int = RETRY_MAX_ATTEMPTS,
+                 backoff: float = RETRY_BACKOFF,
+                 max_backoff: float = RETRY_MAX_BACKOFF,
+                 statuses: Sequence[int] = RETRYABLE_STATUSES,
+                 connect_timeout: Optional[float] = HTTP_CONNECT_TIMEOUT,
+                 read_timeout: Optional[float] = HTTP_READ_TIMEOUT,
+                 hedge_percentile: Optional[float] = HEDGE_PERCENTILE,
+                 hedge_delay: Optional[float] = HEDGE_DELAY,
+                 sleep: Callable[[float], None] = time.sleep):
+        """
+        :param max_attempts: max number of attempts, 1 is without retries
+        :param backoff: delay before the second attempt in seconds, it doubles every attempt
+        :param max_backoff: max delay between attempts in seconds
+        :param statuses: HTTP statuses after which request is repeated
+        :param connect_timeout: timeout of connection in seconds
+        :param read_timeout: max time between bytes of an answer in seconds
+        :param hedge_percentile: send a hedged request when an answer takes longer than
+                                 this percentile of latest latencies, no hedging if 0
+        :param hedge_delay: send a hedged request after this number of seconds, it is used
+                            until there are enough latencies and as the lowest delay, no hedging if 0
+        :param sleep: function for waiting between attempts
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statuses = tuple(statuses)
+        self.timeout = (connect_timeout, read_timeout)
+        self.hedge_percentile = hedge_percentile
+        self.hedge_delay = hedge_delay
+        self.sleep = sleep
+        self.latencies = LatencyTracker()
+
+    def get_delay(self, attempt: int, response: Optional['requests.Response'] = None) -> float:
+        """
+        Method returns seconds to wait before the next attempt.
+
+        :param attempt: number of failed attempts
+        :param response: answer of the failed attempt
+        """
+        headers = getattr(response, 'headers', None) or {}
+        retry_after = parse_retry_after(headers.get('Retry-After'))
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+
+    def get_hedge_delay(self) -> Optional[float]:
+        """
+        Method returns seconds after which a hedged request is sent, None if hedging is off.
+        """
+        delay = self.latencies.percentile(self.hedge_percentile) if self.hedge_percentile else None
+        if delay is None:
+            return self.hedge_delay or None
+        return max(delay, self.hedge_delay or 0)
+
+    def request(self,
+                session: 'requests.Session',
+                url: str,
+                logger=None,
+                on_retry: Optional[Callable[[int, str, float], None]] = None) -> 'requests.Response':
+        """
+        Method sends GET request for a stream and repeats it, if it is needed.
+
+        :param session: HTTP session
+        :param url: URL of the request
+        :param logger: logger for attempts
+        :param on_retry: function called with number of failed attempt, its reason and delay
+        :return: successful answer, its body is not read yet
+        """
+        for attempt in range(1, self.max_attempts + 1):
+            response = None
+            try:
+                response = self._send(session, url)
+            except (requests.ConnectionError, requests.Timeout) as err:
+                if attempt == self.max_attempts:
+                    raise PyAFCommunicationError(f'Data was not received after {attempt} attempts') from err
+                error = hide_api_token(repr(err))
+            else:
+                if response.status_code == 200:
+                    return response
+                response.close()
+                if response.status_code not in self.statuses or attempt == self.max_attempts:
+                    raise PyAFCommunicationError(f'Data was not received, status {response.status_code}')
+                error = f'status {response.status_code}'
+
+            delay = self.get_delay(attempt, response)
+            if logger is not None:
+                logger.warning(f'Attempt {attempt} failed with {error}, next one in {delay:.1f}s')
+            if on_retry is not None:
+                on_retry(attempt, error, delay)
+            self.sleep(delay)
+
+    async def request_async(self,
+                            session: 'aiohttp.ClientSession',
+                            url: str,
+                            logger=None,
+                            on_retry: Optional[Callable[[int, str, float], None]] = None
+                            ) -> 'aiohttp.ClientResponse':
+        """
+        Asyncio counterpart of request for aiohttp sessions, with the same
+        attempts, delays and timeouts. Hedged requests are not sent.
+
+        :param session: aiohttp session
+        :param url: URL of the request
+        :param logger: logger for attempts
+        :param on_retry: function called with number of failed attempt, its reason and delay
+        :return: successful answer, its body is not read yet
+        """
+        connect_timeout, read_timeout = self.timeout
+        timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        for attempt in range(1, self.max_attempts + 1):
+            response = None
+            try:
+                response = await session.get(url, timeout=timeout)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as err:
+                if attempt == self.max_attempts:
+                    raise PyAFCommunicationError(f'Data was not received after {attempt} attempts') from err
+                error = hide_api_token(repr(err))
+            else:
+                if response.status == 200:
+                    return response
+                response.release()
+                if response.status not in self.statuses or attempt == self.max_attempts:
+                    raise PyAFCommunicationError(f'Data was not received, status {response.status}')
+                error = f'status {response.status}'
+
+            delay = self.get_delay(attempt, response)
+            if logger is not None:
+                logger.warning(f'Attempt {attempt} failed with {error}, next one in {delay:.1f}s')
+            if on_retry is not None:
+                on_retry(attempt, error, delay)
+            await asyncio.sleep(delay)
+
+    def _send(self, session: 'requests.Session', url: str) -> 'requests.Response':
+        """
+        Method sends a request and a hedged duplicate, if the answer is late.
+        """
+        hedge_delay = self.get_hedge_delay()
+        if hedge_delay is None:
+            return self._timed_get(session, url)
+
+        executor = ThreadPoolExecutor(max_workers=2)
+        try:
+            futures = [executor.submit(self._timed_get, session, url)]
+            done, _ = wait(futures, timeout=hedge_delay)
+            if not done:
+                futures.append(executor.submit(self._timed_get, session, url))
+            return self._take_first(futures)
+        finally:
+            executor.shutdown(wait=False)
+
+    @staticmethod
+    def _take_first(futures: Sequence[Future]) -> 'requests.Response':
+        """
+        Method returns the first successful answer and closes the others when they come.
+        """
+        pending = set(futures)
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                for other in pending:
+                    other.add_done_callback(_close_response)
+                return future.result()
+        raise error
+
+    def _timed_get(self, session: 'requests.Session', url: str) -> 'requests.Response':
+        started = time.monotonic()
+        response = session.get(url, stream=True, timeout=self.timeout)
+        if response.status_code == 200:
+            self.latencies.add(time.monotonic() - started)
+        return response
+
+
+def _close_response(future: Future) -> None:
+    if future.exception() is None:
+        future.result().close()
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """
+    Function checks if an error, or an error which caused it,
+    is a broken connection, so the report could be received again.
+    Requests which were already repeated by RetryPolicy are not retryable.
+
+    :param error: raised error
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        if isinstance(error, PyAFCommunicationError):
+            return False
+        if isinstance(error, (requests.ConnectionError, requests.Timeout,
+                              requests.exceptions.ChunkedEncodingError, ConnectionError)):
+            return True
+        seen.add(id(error))
+        error = error.__cause__ or error.__context__
+    return False
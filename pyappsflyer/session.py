@@ -0,0 +1,74 @@
+import threading
+
+from typing import Optional
+
+from .lazy import lazy_import
+from .settings import HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE,\
+    HTTP_POOL_BLOCK, HTTP_KEEP_ALIVE
+
+# Imported when the first session is created
+requests = lazy_import('requests')
+
+_default_session = None
+_default_session_lock = threading.Lock()
+
+
+def create_session(pool_connections: int = HTTP_POOL_CONNECTIONS,
+                   pool_maxsize: int = HTTP_POOL_MAXSIZE,
+                   pool_block: bool = HTTP_POOL_BLOCK,
+                   keep_alive: bool = HTTP_KEEP_ALIVE) -> 'requests.Session':
+    """
+    Function creates HTTP session with a connection pool,
+    so connections to AppsFlyer are reused between requests.
+
+    :param pool_connections: number of hosts to keep connection pools for
+    :param pool_maxsize: max number of kept connections per host
+    :param pool_block: wait for a free connection instead of opening
+           an extra one, when all connections of a host are busy
+    :param keep_alive: keep connections open between requests
+    :return: session instance
+    """
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections,
+                          pool_maxsize=pool_maxsize,
+                          pool_block=pool_block)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    if not keep_alive:
+        session.headers['Connection'] = 'close'
+
+    return session
+
+
+def get_default_session() -> 'requests.Session':
+    """
+    Function returns session shared by all report instances.
+    It is created on the first call with params from settings.
+    Session is used only for plain GET requests without cookies,
+    so it can be shared between threads.
+
+    :return: session instance
+    """
+    global _default_session
+
+    if _default_session is None:
+        with _default_session_lock:
+            if _default_session is None:
+                _default_session = create_session()
+    return _default_session
+
+
+def set_default_session(session: Optional['requests.Session']) -> None:
+    """
+    Function replaces session shared by all report instances.
+    If None is passed, a new one will be created on next use.
+
+    :param session: session instance or None
+    """
+    global _default_session
+
+    with _default_session_lock:
+        _default_session = session
@@ -1,28 +1,135 @@
+from __future__ import annotations
+
 import os
-import environs
 
 from platform import system
+from typing import Optional
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 FILES_DIR = os.path.abspath(f'{BASE_DIR}/../')
 PLATFORM = system()
 
+TRUE_VALUES = ('1', 'true', 't', 'yes', 'y', 'on')
+
+
+def find_env_file(path: str) -> Optional[str]:
+    """
+    Function looks for .env file in the folder and its parents.
+
+    :param path: path to .env file in the first folder
+    :return: path to the found file or None
+    """
+    folder, name = os.path.split(os.path.abspath(path))
+    while True:
+        candidate = os.path.join(folder, name)
+        if os.path.isfile(candidate):
+            return candidate
+        parent = os.path.dirname(folder)
+        if parent == folder:
+            return None
+        folder = parent
+
+
+class Env:
+    """
+    Reads typed values of environment variables. Values from .env file are
+    put into environment first, environs is imported only if the file exists.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        env_file = find_env_file(path) if path else None
+        if env_file:
+            import environs
+            environs.Env.read_env(env_file, recurse=False)
+
+    @staticmethod
+    def str(name: str, default: Optional[str] = None) -> Optional[str]:
+        return os.environ.get(name, default)
+
+    @staticmethod
+    def int(name: str, default: Optional[int] = None) -> Optional[int]:
+        value = os.environ.get(name)
+        return default if value is None else int(value)
+
+    @staticmethod
+    def float(name: str, default: Optional[float] = None) -> Optional[float]:
+        value = os.environ.get(name)
+        return default if value is None else float(value)
+
+    @staticmethod
+    def bool(name: str, default: Optional[bool] = None) -> Optional[bool]:
+        value = os.environ.get(name)
+        return default if value is None else value.strip().lower() in TRUE_VALUES
+
+
 # Environment variables, partly taken from .env
-env = environs.Env()
-try:
-    environs.Env.read_env(BASE_DIR + '/../.env')
-except IOError:
-    pass
+env = Env(BASE_DIR + '/../.env')
 
 # AppsFlyer params
 APP_FLYER_HOST = env.str('APP_FLYER_HOST', 'https://hq.appsflyer.com')
 APP_FLYER_API_KEY = env.str('APP_FLYER_API_KEY', '')
 
 DEFAULT_DAYS_NUMBER = env.int('DEFAULT_DAYS_NUMBER', 1)
+# Days synced again on every incremental sync, for late attributed data
+DEFAULT_LOOKBACK_DAYS = env.int('DEFAULT_LOOKBACK_DAYS', 2)
 DEFAULT_TIMEZONE = env.str('DEFAULT_TIMEZONE', 'Europe/Moscow')
 DEFAULT_CSV_DELIMETER = env.str('DEFAULT_CSV_DELIMETER', ',')
 DEFAULT_CSV_QUOTECHAR = env.str('DEFAULT_CSV_QUOTECHAR', '"')
 DEFAULT_CSV_ENCODING = env.str('DEFAULT_CSV_ENCODING', "utf-8-sig")
+# Size of raw chunks read from HTTP stream, in bytes
+INGEST_CHUNK_SIZE = env.int('INGEST_CHUNK_SIZE', 1024 ** 2)
+# Spooled reports are parsed in processes by ranges of this size, in bytes
+PARALLEL_CHUNK_SIZE = env.int('PARALLEL_CHUNK_SIZE', 64 * 1024 ** 2)
+# Folder for spooled reports, system temporary folder if not set
+SPOOL_DIR = env.str('SPOOL_DIR', None)
+# Max number of chunks or batches waiting between pipeline stages
+PIPELINE_QUEUE_SIZE = env.int('PIPELINE_QUEUE_SIZE', 8)
+# Number of records passed between pipeline stages at once
+PIPELINE_BATCH_SIZE = env.int('PIPELINE_BATCH_SIZE', 1000)
+# Max number of rows AppsFlyer returns in one raw data report
+DEFAULT_ROWS_LIMIT = env.int('DEFAULT_ROWS_LIMIT', 200000)
+
+# Number of records decoded into typed columns at once
+DEFAULT_BATCH_SIZE = env.int('DEFAULT_BATCH_SIZE', 65536)
+# Number of records checked in a dedup index at once
+DEDUP_BATCH_SIZE = env.int('DEDUP_BATCH_SIZE', 10000)
+# Approximate memory of a join index in bytes, after which it is split into partitions on disk
+JOIN_MEMORY_LIMIT = env.int('JOIN_MEMORY_LIMIT', 512 * 1024 ** 2)
+# Number of partitions of a join on disk
+JOIN_PARTITIONS = env.int('JOIN_PARTITIONS', 64)
+# Precision of HyperLogLog sketches, 2^12 registers give about 1.6% standard error in 4 KB
+HLL_PRECISION = env.int('HLL_PRECISION', 12)
+
+# Write buffer for report copies, in bytes
+COPY_BUFFER_SIZE = env.int('COPY_BUFFER_SIZE', 1024 ** 2)
+
+# Report cache params, sizes in bytes, ttl in seconds
+CACHE_MAX_SIZE = env.int('CACHE_MAX_SIZE', 1024 ** 3)
+CACHE_CLOSED_TTL = env.int('CACHE_CLOSED_TTL', 30 * 24 * 60 * 60)
+CACHE_OPEN_TTL = env.int('CACHE_OPEN_TTL', 0)
+
+# Limits of multi-app orchestrator, rates are requests per minute, 0 is not limited
+ORCHESTRATOR_MAX_WORKERS = env.int('ORCHESTRATOR_MAX_WORKERS', 8)
+ORCHESTRATOR_APP_CONCURRENCY = env.int('ORCHESTRATOR_APP_CONCURRENCY', 2)
+ORCHESTRATOR_ACCOUNT_RATE = env.float('ORCHESTRATOR_ACCOUNT_RATE', 60)
+ORCHESTRATOR_APP_RATE = env.float('ORCHESTRATOR_APP_RATE', 20)
+
+# Retries of failed requests, delays in seconds
+RETRY_MAX_ATTEMPTS = env.int('RETRY_MAX_ATTEMPTS', 4)
+RETRY_BACKOFF = env.float('RETRY_BACKOFF', 1.0)
+RETRY_MAX_BACKOFF = env.float('RETRY_MAX_BACKOFF', 60.0)
+# Request timeouts in seconds, read timeout is max time between bytes of an answer
+HTTP_CONNECT_TIMEOUT = env.float('HTTP_CONNECT_TIMEOUT', 10.0)
+HTTP_READ_TIMEOUT = env.float('HTTP_READ_TIMEOUT', 300.0)
+# Hedged requests, percentile of latencies and lowest delay in seconds, 0 is off
+HEDGE_PERCENTILE = env.float('HEDGE_PERCENTILE', 0)
+HEDGE_DELAY = env.float('HEDGE_DELAY', 0)
+
+# HTTP connection pool params
+HTTP_POOL_CONNECTIONS = env.int('HTTP_POOL_CONNECTIONS', 10)
+HTTP_POOL_MAXSIZE = env.int('HTTP_POOL_MAXSIZE', 10)
+HTTP_POOL_BLOCK = env.bool('HTTP_POOL_BLOCK', False)
+HTTP_KEEP_ALIVE = env.bool('HTTP_KEEP_ALIVE', True)
 
 LOGGING = {
     'version': 1,
@@ -48,3 +155,15 @@ LOGGING = {
         }
     }
 }
+
+
+def configure_logging(config: Optional[dict] = None) -> None:
+    """
+    Function sets up logging with the config, LOGGING by default.
+    The package does not change logging on import, call it in applications
+    which have no logging setup of their own.
+
+    :param config: logging config in dictConfig format
+    """
+    from logging.config import dictConfig
+    dictConfig(config or LOGGING)
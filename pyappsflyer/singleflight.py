@@ -0,0 +1,70 @@
+import hashlib
+import threading
+
+from concurrent.futures import Future
+from typing import Callable, Dict, Hashable, TypeVar
+
+from furl import furl
+
+from .cache import ReportCache
+
+T = TypeVar('T')
+
+
+def make_flight_key(url: furl, *options) -> tuple:
+    """
+    Function returns key of a download. API token is not kept in it,
+    only its hash, so requests with different tokens are never joined.
+
+    :param url: prepared report URL
+    :param options: params of stream processing, which change received records
+    :return: key
+    """
+    token = url.args.get('api_token') or ''
+    return (ReportCache.make_key(url), hashlib.sha256(token.encode()).hexdigest()[:16], *options)
+
+
+class SingleFlight:
+    """
+    Joins identical calls made at the same time: the first call runs,
+    the others wait for it and receive its result or its error.
+    Share one instance between report instances to join their downloads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+
+    def do(self, key: Hashable, func: Callable[[], T]) -> T:
+        """
+        Method calls func or waits for the same call which is already running.
+
+        :param key: key of the call
+        :param func: function to call
+        :return: result of the call
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = Future()
+
+        if not is_leader:
+            return call.result()
+
+        try:
+            call.set_result(func())
+        except BaseException as err:
+            call.set_exception(err)
+        finally:
+            with self._lock:
+                del self._calls[key]
+        return call.result()
+
+    @property
+    def in_flight(self) -> int:
+        """
+        Number of running calls.
+        """
+        with self._lock:
+            return len(self._calls)
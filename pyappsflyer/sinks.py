@@ -0,0 +1,321 @@
+import os
+import re
+import sys
+import sqlite3
+
+from typing import Optional, Dict, List, Iterable, Sequence, Union
+from uuid import uuid4
+
+from .lazy import lazy_import
+from .typed import ArrowDecoder, iter_batches, get_report_schema
+from .windows import split_date_range, format_window
+from .pipeline import PipelineSink
+from .records import Record, normalize_column_name
+from .settings import DEFAULT_BATCH_SIZE, PIPELINE_BATCH_SIZE
+from .exceptions import PyAFValidationError
+
+# Optional dependencies are imported on first use
+pa = lazy_import('pyarrow')
+pq = lazy_import('pyarrow.parquet')
+
+COLUMNAR_FORMATS = {
+    'parquet': 'parquet',
+    'arrow': 'arrow',
+}
+
+# Natural key of raw data events
+RAW_DATA_KEY_COLUMNS = ('appsflyer_id', 'event_time', 'event_name')
+
+PLACEHOLDERS = {
+    'qmark': lambda number: '?',
+    'numeric': lambda number: f':{number}',
+    'format': lambda number: '%s',
+    'pyformat': lambda number: '%s',
+}
+
+
+def get_sql_column_name(name: str) -> str:
+    """
+    Function returns column name for a table: AppsFlyer ID - appsflyer_id.
+
+    :param name: column name as in report header
+    :return: column name in lower case with underscores
+    """
+    return re.sub(r'[^0-9a-z]+', '_', name.lower()).strip('_')
+
+
+class ColumnarSink:
+    """
+    Writes reports into Parquet or Arrow IPC files with typed columns.
+    Files are placed in app=/report=/date= folders, so they could be read
+    as a partitioned dataset, and get names from report dates.
+    Reports are received day by day, so every file has rows of its date only.
+    """
+
+    def __init__(self,
+                 directory: str,
+                 file_format: str = 'parquet',
+                 compression: Optional[str] = 'zstd',
+                 row_group_size: int = DEFAULT_BATCH_SIZE):
+        """
+        :param directory: base folder of the dataset
+        :param file_format: parquet or arrow
+        :param compression: compression codec, for arrow only lz4 and zstd are possible
+        :param row_group_size: number of records in a row group or record batch
+        """
+        if pa is None:
+            raise ImportError('pyarrow is required for columnar files, install pyappsflyer[arrow]')
+        if file_format not in COLUMNAR_FORMATS:
+            raise PyAFValidationError(f'Unknown file format {file_format}')
+
+        self.directory = directory
+        self.file_format = file_format
+        self.compression = compression
+        self.row_group_size = row_group_size
+
+    def get_path(self, application_name: str, report_name: str, from_date: str, to_date: str) -> str:
+        """
+        Method returns path to a report file, the same report and dates
+        always have the same path. The file is placed in the partition of from_date,
+        so from_date and to_date must be in the same day.
+
+        :param application_name: application name
+        :param report_name: report name
+        :param from_date: from what date report begins
+        :param to_date: at what date report ends
+        :return: path to a file
+        """
+        def clean(value: str) -> str:
+            return value.replace(' ', 'T').replace(':', '')
+
+        filename = f'{report_name}_{clean(from_date)}_{clean(to_date)}.{COLUMNAR_FORMATS[self.file_format]}'
+        return os.path.join(self.directory,
+                            f'app={application_name}',
+                            f'report={report_name}',
+                            f'date={from_date[:10]}',
+                            filename)
+
+    def write(self, records: Iterable, path: str, schema: Dict[str, str]) -> int:
+        """
+        Method writes records into a file batch by batch.
+        The file gets its name only when all records are written.
+
+        :param records: records of a report
+        :param path: path to a file
+        :param schema: column types of the report
+        :return: number of written records
+        """
+        decoder = ArrowDecoder(schema)
+        temp_path = f'{path}.{uuid4()}.tmp'
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        writer = None
+        records_number = 0
+        try:
+            for batch in iter_batches(records, self.row_group_size):
+                record_batch = decoder.decode_batch(batch)
+                if writer is None:
+                    writer = self._open_writer(temp_path, record_batch.schema)
+                self._write_batch(writer, record_batch)
+                records_number += record_batch.num_rows
+        except BaseException:
+            if writer is not None:
+                writer.close()
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        if writer is not None:
+            writer.close()
+            os.replace(temp_path, path)
+        return records_number
+
+    def write_report(self, report, *args, **kwargs) -> List[str]:
+        """
+        Method receives a report day by day and writes every day into its date partition.
+        Takes the same params as get_report of the report.
+
+        :param report: report instance
+        :return: paths to the files, there are no files for empty days
+        """
+        if not kwargs.get('from_date') or not kwargs.get('to_date'):
+            kwargs['from_date'], kwargs['to_date'] = report.get_default_dates()
+
+        api_report_name = kwargs.get('api_report_name', report.default_report_name)
+        report_name = f'{api_report_name}_retargeting' if kwargs.get('retargeting') else api_report_name
+        schema = get_report_schema(api_report_name)
+
+        paths = []
+        for start, end in split_date_range(kwargs['from_date'], kwargs['to_date'], 'day'):
+            kwargs['from_date'], kwargs['to_date'] = format_window(start, end)
+            path = self.get_path(report.application_name, report_name, kwargs['from_date'], kwargs['to_date'])
+            records = report.iter_report(*args, row_format='record', **kwargs)
+            if self.write(records, path, schema):
+                paths.append(path)
+        return paths
+
+    def _open_writer(self, path: str, schema: 'pa.Schema'):
+        if self.file_format == 'parquet':
+            return pq.ParquetWriter(path, schema, compression=self.compression or 'none')
+
+        options = pa.ipc.IpcWriteOptions(compression=self.compression, emit_dictionary_deltas=True)
+        return pa.ipc.new_file(path, schema, options=options)
+
+    def _write_batch(self, writer, record_batch: 'pa.RecordBatch') -> None:
+        if self.file_format == 'parquet':
+            writer.write_batch(record_batch, row_group_size=self.row_group_size)
+        else:
+            writer.write_batch(record_batch)
+
+
+class DBSink(PipelineSink):
+    """
+    Writes reports into a database table through DB-API connection.
+    The table is created from the report header, all columns are text.
+    Records are inserted with executemany by batches, the whole report
+    is committed at once or rolled back if not all records were received.
+    With key columns records are upserted, so repeated loads do not make duplicates.
+    Upserts use ON CONFLICT clause, SQLite 3.24+ and PostgreSQL support it.
+    It needs a unique index on key columns, the index is created for new
+    and existing tables.
+    """
+
+    def __init__(self,
+                 connection: Union[str, object],
+                 table: str,
+                 key_columns: Optional[Sequence[str]] = None,
+                 batch_size: int = PIPELINE_BATCH_SIZE,
+                 paramstyle: Optional[str] = None):
+        """
+        :param connection: DB-API connection or path to SQLite database
+        :param table: table name
+        :param key_columns: natural key of records, header names or API field names,
+                            for example RAW_DATA_KEY_COLUMNS
+        :param batch_size: number of records inserted at once
+        :param paramstyle: paramstyle of the driver, taken from the driver module if not passed
+        """
+        if not re.fullmatch(r'[A-Za-z_][A-Za-z0-9_]*', table):
+            raise PyAFValidationError(f'Wrong table name {table}')
+
+        if isinstance(connection, str):
+            # Pipeline writes in its own thread
+            connection = sqlite3.connect(connection, check_same_thread=False)
+
+        self.connection = connection
+        self.table = table
+        self.key_columns = tuple(key_columns or ())
+        self.batch_size = batch_size
+        self.paramstyle = paramstyle or self._get_paramstyle(connection)
+        if self.paramstyle not in PLACEHOLDERS:
+            raise PyAFValidationError(f'Unknown paramstyle {self.paramstyle}')
+
+        self.records_number = 0
+        self._fieldnames = None
+        self._insert = None
+        self._cursor = None
+
+    @staticmethod
+    def _get_paramstyle(connection) -> str:
+        driver = sys.modules.get(type(connection).__module__.split('.')[0])
+        return getattr(driver, 'paramstyle', 'qmark')
+
+    def open(self) -> None:
+        self.records_number = 0
+        self._fieldnames = None
+        self._insert = None
+        self._cursor = self.connection.cursor()
+
+    def write_batch(self, records: List[Union[dict, Record]]) -> None:
+        if not records:
+            return
+        if self._insert is None:
+            self._prepare(records[0])
+
+        if isinstance(records[0], Record):
+            rows = [tuple(record) for record in records]
+        else:
+            rows = [tuple(record.get(name) for name in self._fieldnames) for record in records]
+        self._cursor.executemany(self._insert, rows)
+        self.records_number += len(rows)
+
+    def close(self, error: Optional[BaseException] = None) -> None:
+        if self._cursor is not None:
+            self._cursor.close()
+            self._cursor = None
+        if error is None:
+            self.connection.commit()
+        else:
+            self.connection.rollback()
+
+    def write(self, records: Iterable[Union[dict, Record]]) -> int:
+        """
+        Method writes records by batches and commits them.
+
+        :param records: records of a report
+        :return: number of written records
+        """
+        self.open()
+        try:
+            for batch in iter_batches(records, self.batch_size):
+                self.write_batch(batch)
+        except BaseException as err:
+            self.close(err)
+            raise
+        self.close()
+        return self.records_number
+
+    def write_report(self, report, *args, **kwargs) -> int:
+        """
+        Method receives a report in a stream and writes it into the table.
+        Takes the same params as get_report of the report.
+
+        :param report: report instance
+        :return: number of written records
+        """
+        return self.write(report.iter_report(*args, row_format='record', **kwargs))
+
+    def _prepare(self, record: Union[dict, Record]) -> None:
+        """
+        Method creates the table and the insert statement from the first record.
+        """
+        self._fieldnames = tuple(record.keys())
+        columns = [get_sql_column_name(name) for name in self._fieldnames]
+
+        keys = []
+        for key in self.key_columns:
+            matched = [column for name, column in zip(self._fieldnames, columns)
+                       if normalize_column_name(name) == normalize_column_name(key)]
+            if not matched:
+                raise PyAFValidationError(f'Key column {key} is not in the report')
+            keys.append(matched[0])
+
+        def quote(names: Iterable[str]) -> str:
+            return ', '.join(f'"{name}"' for name in names)
+
+        definitions = ', '.join(f'"{column}" TEXT' for column in columns)
+        self._cursor.execute(f'CREATE TABLE IF NOT EXISTS "{self.table}" ({definitions})')
+        if keys:
+            self._create_key_index(keys)
+
+        placeholder = PLACEHOLDERS[self.paramstyle]
+        values = ', '.join(placeholder(number) for number in range(1, len(columns) + 1))
+        insert = f'INSERT INTO "{self.table}" ({quote(columns)}) VALUES ({values})'
+        if keys:
+            updates = ', '.join(f'"{column}" = excluded."{column}"' for column in columns if column not in keys)
+            insert += f' ON CONFLICT ({quote(keys)}) '
+            insert += f'DO UPDATE SET {updates}' if updates else 'DO NOTHING'
+        self._insert = insert
+
+    def _create_key_index(self, keys: List[str]) -> None:
+        """
+        Method creates unique index on key columns, if the table does not have it yet.
+        The table could be created before without the index or without key columns.
+        """
+        index = f'{self.table}_{"_".join(keys)}_key'
+        columns = ', '.join(f'"{key}"' for key in keys)
+        try:
+            self._cursor.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS "{index}" ON "{self.table}" ({columns})')
+        except Exception as err:
+            raise PyAFValidationError(
+                f'Unique index on key columns of table {self.table} could not be created: {err}'
+            ) from err
@@ -0,0 +1,74 @@
+import os
+import sqlite3
+import threading
+
+from time import time
+from contextlib import closing
+from typing import Optional
+
+
+class WatermarkStore:
+    """
+    Local store for dates up to which reports were synced.
+    Watermarks are kept per application, report and retargeting flag.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: path to SQLite file with watermarks
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS watermarks ('
+                               'application_name TEXT, api_report_name TEXT, retargeting INTEGER, '
+                               'value TEXT, updated_at REAL, '
+                               'PRIMARY KEY (application_name, api_report_name, retargeting))')
+
+    def _connect(self) -> sqlite3.Connection:
+        return closing(sqlite3.connect(self.path, timeout=30, isolation_level=None))
+
+    def get(self, application_name: str, api_report_name: str, retargeting: bool = False) -> Optional[str]:
+        """
+        Method returns date up to which the report was synced.
+
+        :param application_name: application name
+        :param api_report_name: report name
+        :param retargeting: retargeting report or not
+        :return: date in YYYY-MM-DD format or None if report was never synced
+        """
+        with self._connect() as connection:
+            row = connection.execute('SELECT value FROM watermarks WHERE application_name = ? '
+                                     'AND api_report_name = ? AND retargeting = ?',
+                                     (application_name, api_report_name, int(retargeting))).fetchone()
+        return row[0] if row else None
+
+    def set(self, application_name: str, api_report_name: str, retargeting: bool, value: str) -> None:
+        """
+        Method saves date up to which the report was synced.
+
+        :param application_name: application name
+        :param api_report_name: report name
+        :param retargeting: retargeting report or not
+        :param value: date in YYYY-MM-DD format
+        """
+        with self._lock, self._connect() as connection:
+            connection.execute('INSERT OR REPLACE INTO watermarks VALUES (?, ?, ?, ?, ?)',
+                               (application_name, api_report_name, int(retargeting), value, time()))
+
+    def reset(self, application_name: str, api_report_name: Optional[str] = None) -> None:
+        """
+        Method removes watermarks, so reports will be synced from the beginning.
+
+        :param application_name: application name
+        :param api_report_name: report name, all reports of the application if not passed
+        """
+        with self._lock, self._connect() as connection:
+            if api_report_name:
+                connection.execute('DELETE FROM watermarks WHERE application_name = ? AND api_report_name = ?',
+                                   (application_name, api_report_name))
+            else:
+                connection.execute('DELETE FROM watermarks WHERE application_name = ?', (application_name,))
@@ -0,0 +1,401 @@
+from itertools import islice
+from typing import Optional, Dict, Iterable, Iterator
+
+from .lazy import lazy_import
+from .records import Record, normalize_column_name
+from .settings import DEFAULT_BATCH_SIZE
+from .exceptions import PyAFValidationError
+
+# Optional dependencies are imported on first use
+np = lazy_import('numpy')
+pa = lazy_import('pyarrow')
+pc = lazy_import('pyarrow.compute')
+
+COLUMN_TYPES = ('string', 'int', 'float', 'bool', 'timestamp', 'category')
+
+PERFORMANCE_SCHEMA = {
+    'Date': 'timestamp',
+    'Agency/PMD (af_prt)': 'category',
+    'Media Source (pid)': 'category',
+    'Campaign (c)': 'category',
+    'Country': 'category',
+    'Impressions': 'int',
+    'Clicks': 'int',
+    'CTR': 'float',
+    'Installs': 'int',
+    'Conversion Rate': 'float',
+    'Sessions': 'int',
+    'Loyal Users': 'int',
+    'Loyal Users/Installs': 'float',
+    'Total Revenue': 'float',
+    'Total Cost': 'float',
+    'ROI': 'float',
+    'ARPU': 'float',
+    'Average eCPI': 'float',
+}
+
+# Event columns of performance reports, like "af_purchase (Unique users)"
+PERFORMANCE_SUFFIX_TYPES = {
+    '(Unique users)': 'int',
+    '(Event counter)': 'int',
+    '(Sales in USD)': 'float',
+}
+
+RAW_DATA_SCHEMA = {
+    'Attributed Touch Type': 'category',
+    'Attributed Touch Time': 'timestamp',
+    'Install Time': 'timestamp',
+    'Event Time': 'timestamp',
+    'Event Name': 'category',
+    'Event Revenue': 'float',
+    'Event Revenue Currency': 'category',
+    'Event Revenue USD': 'float',
+    'Event Source': 'category',
+    'Is Receipt Validated': 'bool',
+    'Partner': 'category',
+    'Media Source': 'category',
+    'Channel': 'category',
+    'Campaign': 'category',
+    'Campaign ID': 'category',
+    'Adset': 'category',
+    'Adset ID': 'category',
+    'Ad': 'category',
+    'Ad ID': 'category',
+    'Ad Type': 'category',
+    'Site ID': 'category',
+    'Cost Model': 'category',
+    'Cost Value': 'float',
+    'Cost Currency': 'category',
+    'Region': 'category',
+    'Country Code': 'category',
+    'State': 'category',
+    'City': 'category',
+    'WIFI': 'bool',
+    'Operator': 'category',
+    'Carrier': 'category',
+    'Language': 'category',
+    'Platform': 'category',
+    'Device Type': 'category',
+    'Device Category': 'category',
+    'OS Version': 'category',
+    'App Version': 'category',
+    'SDK Version': 'category',
+    'App ID': 'category',
+    'App Name': 'category',
+    'Bundle ID': 'category',
+    'Is Retargeting': 'bool',
+    'Retargeting Conversion Type': 'category',
+    'Is Primary Attribution': 'bool',
+    'Install App Store': 'category',
+    'Match Type': 'category',
+    'Contributor 1 Match Type': 'category',
+    'Contributor 2 Match Type': 'category',
+    'Contributor 3 Match Type': 'category',
+    'Keyword Match Type': 'category',
+    'Rejected Reason': 'category',
+    'Google Play Click Time': 'timestamp',
+    'Google Play Install Begin Time': 'timestamp',
+}
+
+REPORT_SCHEMAS = {
+    'partners_report': PERFORMANCE_SCHEMA,
+    'partners_by_date_report': PERFORMANCE_SCHEMA,
+    'daily_report': PERFORMANCE_SCHEMA,
+    'geo_report': PERFORMANCE_SCHEMA,
+    'geo_by_date_report': PERFORMANCE_SCHEMA,
+    'installs_report': RAW_DATA_SCHEMA,
+    'in_app_events_report': RAW_DATA_SCHEMA,
+    'organic_installs_report': RAW_DATA_SCHEMA,
+    'organic_in_app_events_report': RAW_DATA_SCHEMA,
+    'uninstall_events_report': RAW_DATA_SCHEMA,
+    'invalid_installs_report': RAW_DATA_SCHEMA,
+    'invalid_in_app_events_report': RAW_DATA_SCHEMA,
+}
+
+_NORMALIZED_SCHEMAS = {
+    id(schema): {normalize_column_name(name): column_type for name, column_type in schema.items()}
+    for schema in (PERFORMANCE_SCHEMA, RAW_DATA_SCHEMA)
+}
+
+
+def get_column_type(schema: Dict[str, str], name: str) -> str:
+    """
+    Function returns type of a report column, string if it is not in schema.
+
+    :param schema: column types of the report
+    :param name: column name as in report header or API field name
+    :return: column type
+    """
+    if name in schema:
+        return schema[name]
+
+    normalized = _NORMALIZED_SCHEMAS.get(id(schema))
+    if normalized and normalize_column_name(name) in normalized:
+        return normalized[normalize_column_name(name)]
+
+    if schema is PERFORMANCE_SCHEMA:
+        for suffix, column_type in PERFORMANCE_SUFFIX_TYPES.items():
+            if name.endswith(suffix):
+                return column_type
+    return 'string'
+
+
+def get_report_schema(api_report_name: str) -> Dict[str, str]:
+    """
+    Function returns column types of a report.
+
+    :param api_report_name: report name
+    :return: column types
+    """
+    return REPORT_SCHEMAS.get(api_report_name, {})
+
+
+def iter_batches(records: Iterable, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[list]:
+    """
+    Function groups records into lists of batch size.
+
+    :param records: records of a report
+    :param batch_size: number of records in a batch
+    :return: iterator over batches
+    """
+    records = iter(records)
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def _get_batch_columns(batch: list) -> Dict[str, tuple]:
+    """
+    Function turns batch of records into columns.
+    """
+    first = batch[0]
+    names = first.fields if isinstance(first, Record) else tuple(first)
+    if isinstance(first, Record):
+        return dict(zip(names, zip(*batch)))
+    return {name: tuple(record.get(name) for record in batch) for name in names}
+
+
+class TypedColumns(dict):
+    """
+    Typed report columns as NumPy arrays.
+    Category columns are kept as int32 codes, -1 for missing values,
+    their values are in categories.
+    """
+
+    def __init__(self, *args, categories: Optional[Dict[str, 'np.ndarray']] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.categories = categories or {}
+
+    def decode(self, name: str) -> 'np.ndarray':
+        """
+        Returns values of a category column.
+
+        :param name: column name
+        :return: array of values, None for missing ones
+        """
+        codes = self[name]
+        values = np.append(self.categories[name], None).astype(object)
+        return values[codes]
+
+
+class NumpyDecoder:
+    """
+    Decodes string columns of report batches into NumPy arrays.
+    """
+
+    def __init__(self, schema: Dict[str, str]):
+        if np is None:
+            raise ImportError('numpy is required for numpy output, install pyappsflyer[numpy]')
+        self.schema = schema
+        self.chunks = {}
+        self.categories = {}
+
+    def add_batch(self, batch: list) -> None:
+        for name, values in _get_batch_columns(batch).items():
+            column_type = get_column_type(self.schema, name)
+            self.chunks.setdefault(name, []).append(self._decode(name, column_type, values))
+
+    def _decode(self, name: str, column_type: str, values: tuple):
+        strings = np.array([value or '' for value in values], dtype=str)
+        missing = strings == ''
+
+        if column_type == 'float':
+            return self._to_number(strings, missing, np.float64)
+        if column_type == 'int':
+            numbers = self._to_number(strings, missing, np.float64)
+            # Fractions are truncated, values which are not finite numbers are masked like in ArrowDecoder
+            invalid = ~np.isfinite(numbers)
+            return np.ma.MaskedArray(np.where(invalid, 0, numbers).astype(np.int64), mask=missing | invalid)
+        if column_type == 'bool':
+            return np.ma.MaskedArray(np.char.lower(strings) == 'true', mask=missing)
+        if column_type == 'timestamp':
+            return self._to_timestamps(strings, missing)
+        if column_type == 'category':
+            return self._to_codes(name, strings, missing)
+        return np.array(values, dtype=object)
+
+    @staticmethod
+    def _to_number(strings: 'np.ndarray', missing: 'np.ndarray', dtype) -> 'np.ndarray':
+        strings = np.where(missing, 'nan', strings)
+        try:
+            return strings.astype(dtype)
+        except ValueError:
+            # Some values are not numbers, they are decoded one by one
+            result = np.empty(len(strings), dtype=dtype)
+            for position, value in enumerate(strings):
+                try:
+                    result[position] = float(value)
+                except ValueError:
+                    result[position] = np.nan
+            return result
+
+    @staticmethod
+    def _to_timestamps(strings: 'np.ndarray', missing: 'np.ndarray') -> 'np.ndarray':
+        strings = np.where(missing, 'NaT', strings)
+        try:
+            return strings.astype('datetime64[ms]')
+        except ValueError:
+            # Malformed values become NaT instead of failing the whole batch
+            result = np.empty(len(strings), dtype='datetime64[ms]')
+            for position, value in enumerate(strings):
+                try:
+                    result[position] = np.datetime64(value, 'ms')
+                except ValueError:
+                    result[position] = np.datetime64('NaT')
+            return result
+
+    def _to_codes(self, name: str, strings: 'np.ndarray', missing: 'np.ndarray') -> 'np.ndarray':
+        categories = self.categories.setdefault(name, {})
+        uniques, inverse = np.unique(strings, return_inverse=True)
+        unique_codes = np.array([categories.setdefault(value, len(categories)) if value else -1
+                                 for value in uniques.tolist()], dtype=np.int32)
+        codes = unique_codes[inverse.reshape(-1)]
+        codes[missing] = -1
+        return codes
+
+    def finish(self) -> TypedColumns:
+        columns = {}
+        for name, chunks in self.chunks.items():
+            if isinstance(chunks[0], np.ma.MaskedArray):
+                columns[name] = np.ma.concatenate(chunks)
+            else:
+                columns[name] = np.concatenate(chunks)
+        categories = {name: np.array(list(values), dtype=object) for name, values in self.categories.items()}
+        return TypedColumns(columns, categories=categories)
+
+
+class ArrowDecoder:
+    """
+    Decodes string columns of report batches into Arrow record batches.
+    """
+
+    ARROW_TYPES = {
+        'int': 'int64',
+        'float': 'float64',
+        'bool': 'bool_',
+    }
+
+    # Formats of AppsFlyer times, values in other formats become null
+    TIMESTAMP_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d')
+
+    def __init__(self, schema: Dict[str, str]):
+        if pa is None:
+            raise ImportError('pyarrow is required for arrow output, install pyappsflyer[arrow]')
+        self.schema = schema
+        self.batches = []
+        self.categories = {}
+
+    def decode_batch(self, batch: list) -> 'pa.RecordBatch':
+        """
+        Decodes one batch. Category columns of all batches share one growing dictionary,
+        so batches could be written into one file.
+        """
+        columns = _get_batch_columns(batch)
+        arrays = [self._decode(name, get_column_type(self.schema, name), values)
+                  for name, values in columns.items()]
+        return pa.RecordBatch.from_arrays(arrays, names=list(columns))
+
+    def add_batch(self, batch: list) -> None:
+        self.batches.append(self.decode_batch(batch))
+
+    def _decode(self, name: str, column_type: str, values: tuple) -> 'pa.Array':
+        strings = pa.array(values, pa.string())
+        if column_type == 'string':
+            return strings
+
+        strings = pc.if_else(pc.equal(strings, ''), pa.scalar(None, pa.string()), strings)
+        if column_type == 'category':
+            return self._to_dictionary(name, strings)
+        if column_type == 'timestamp':
+            return self._to_timestamps(strings)
+        if column_type == 'bool':
+            return pc.equal(pc.utf8_lower(strings), 'true')
+
+        try:
+            numbers = pc.cast(strings, pa.float64())
+        except pa.ArrowInvalid:
+            # Some values are not numbers, they are decoded one by one
+            values = []
+            for value in strings.to_pylist():
+                try:
+                    values.append(float(value))
+                except (TypeError, ValueError):
+                    values.append(None)
+            numbers = pa.array(values, pa.float64())
+        if column_type == 'float':
+            return numbers
+
+        # Fractions are truncated like in NumpyDecoder, nan and infinity become null
+        numbers = pc.if_else(pc.is_finite(numbers), numbers, pa.scalar(None, pa.float64()))
+        return pc.cast(numbers, getattr(pa, self.ARROW_TYPES[column_type])(), safe=False)
+
+    def _to_timestamps(self, strings: 'pa.Array') -> 'pa.TimestampArray':
+        try:
+            return pc.cast(strings, pa.timestamp('ms'))
+        except pa.ArrowInvalid:
+            # Malformed values become null instead of failing the whole batch
+            return pc.coalesce(*[pc.strptime(strings, format=time_format, unit='ms', error_is_null=True)
+                                 for time_format in self.TIMESTAMP_FORMATS])
+
+    def _to_dictionary(self, name: str, strings: 'pa.Array') -> 'pa.DictionaryArray':
+        encoded = pc.dictionary_encode(strings)
+        categories = self.categories.setdefault(name, {})
+        codes = pa.array([categories.setdefault(value, len(categories))
+                          for value in encoded.dictionary.to_pylist()], pa.int32())
+        return pa.DictionaryArray.from_arrays(pc.take(codes, encoded.indices),
+                                              pa.array(list(categories), pa.string()))
+
+    def finish(self) -> 'pa.Table':
+        if not self.batches:
+            return pa.table({})
+        return pa.Table.from_batches(self.batches).unify_dictionaries()
+
+
+DECODERS = {
+    'numpy': NumpyDecoder,
+    'arrow': ArrowDecoder,
+}
+
+
+def decode_records(records: Iterable,
+                   schema: Dict[str, str],
+                   output: str = 'arrow',
+                   batch_size: int = DEFAULT_BATCH_SIZE):
+    """
+    Function decodes report records into typed columns batch by batch.
+
+    :param records: records of a report, compact records are decoded faster
+    :param schema: column types of the report
+    :param output: numpy for dict of NumPy arrays or arrow for Arrow table
+    :param batch_size: number of records decoded at once
+    :return: TypedColumns or Arrow table
+    """
+    if output not in DECODERS:
+        raise PyAFValidationError(f'Unknown output {output}')
+
+    decoder = DECODERS[output](schema)
+    for batch in iter_batches(records, batch_size):
+        decoder.add_batch(batch)
+    return decoder.finish()
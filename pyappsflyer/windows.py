@@ -0,0 +1,82 @@
+from datetime import datetime as dt
+from datetime import timedelta as tdl
+from typing import List, Tuple
+
+DATE_FORMAT = "%Y-%m-%d"
+DATETIME_FORMAT = "%Y-%m-%d %H:%M"
+
+# Windows in which a date range could be split
+WINDOW_SIZES = {
+    'day': tdl(days=1),
+    'hour': tdl(hours=1),
+}
+# AppsFlyer API does not accept time more precise than minutes
+MIN_WINDOW_SIZE = tdl(minutes=1)
+
+
+def parse_date(value: str, is_end: bool = False) -> dt:
+    """
+    Function parses date as it is passed to AppsFlyer API.
+    End of the range is included by API, so it is returned as
+    the beginning of the next day or minute.
+
+    :param value: date in YYYY-MM-DD or YYYY-MM-DD HH:MM format
+    :param is_end: date is the end of the range
+    :return: datetime instance
+    """
+    try:
+        result = dt.strptime(value, DATE_FORMAT)
+        step = tdl(days=1)
+    except ValueError:
+        result = dt.strptime(value, DATETIME_FORMAT)
+        step = MIN_WINDOW_SIZE
+    return result + step if is_end else result
+
+
+def format_window(start: dt, end: dt) -> Tuple[str, str]:
+    """
+    Function returns from and to dates for AppsFlyer API.
+    Whole days are passed as dates, other windows with hours and minutes.
+
+    :param start: beginning of the window
+    :param end: end of the window, not included
+    :return: from and to dates in string format
+    """
+    if start.time() == end.time() == dt.min.time():
+        return start.strftime(DATE_FORMAT), (end - tdl(days=1)).strftime(DATE_FORMAT)
+    return start.strftime(DATETIME_FORMAT), (end - MIN_WINDOW_SIZE).strftime(DATETIME_FORMAT)
+
+
+def split_date_range(from_date: str, to_date: str, window: str = 'day') -> List[Tuple[dt, dt]]:
+    """
+    Function splits date range into windows of the same size.
+    The last window could be shorter.
+
+    :param from_date: from what date to begin, date format - YYYY-MM-DD or YYYY-MM-DD HH:MM
+    :param to_date: at what date to end, date format - YYYY-MM-DD or YYYY-MM-DD HH:MM
+    :param window: size of a window, day or hour
+    :return: list of windows beginnings and ends, ends are not included
+    """
+    step = WINDOW_SIZES[window]
+    start, end = parse_date(from_date), parse_date(to_date, is_end=True)
+
+    windows = []
+    while start < end:
+        windows.append((start, min(start + step, end)))
+        start += step
+    return windows
+
+
+def split_window(start: dt, end: dt) -> List[Tuple[dt, dt]]:
+    """
+    Function splits a window in halves, rounded to minutes.
+
+    :param start: beginning of the window
+    :param end: end of the window, not included
+    :return: two windows or an empty list, if the window could not be split
+    """
+    minutes = (end - start) // MIN_WINDOW_SIZE
+    if minutes < 2:
+        return []
+    middle = start + MIN_WINDOW_SIZE * (minutes // 2)
+    return [(start, middle), (middle, end)]
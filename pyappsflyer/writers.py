@@ -0,0 +1,156 @@
+import io
+import os
+import csv
+import gzip
+import json
+
+from typing import Optional, Mapping
+from uuid import uuid4
+
+from .lazy import lazy_import
+from .records import Record
+from .settings import COPY_BUFFER_SIZE
+from .exceptions import PyAFValidationError
+
+# Optional dependency, it is imported on first use
+zstandard = lazy_import('zstandard')
+
+COMPRESSION_EXTENSIONS = {
+    'gzip': 'gz',
+    'zstd': 'zst',
+}
+
+
+class RecordWriter:
+    """
+    Base class for writers of report copies.
+    Records are written into a temporary file while they are received,
+    the file gets its name only when all records are written.
+    """
+
+    def __init__(self,
+                 filename: str,
+                 compression: Optional[str] = None,
+                 buffer_size: int = COPY_BUFFER_SIZE):
+        """
+        :param filename: path to the file, compression extension is added to it
+        :param compression: gzip, zstd or None
+        :param buffer_size: size of write buffer in bytes
+        """
+        if compression:
+            if compression not in COMPRESSION_EXTENSIONS:
+                raise PyAFValidationError(f'Unknown compression {compression}')
+            filename = f'{filename}.{COMPRESSION_EXTENSIONS[compression]}'
+
+        self.filename = filename
+        self.temp_filename = f'{filename}.{uuid4()}.tmp'
+        self.records_number = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+        self._raw = open(self.temp_filename, 'wb', buffering=buffer_size)
+        self.file = io.TextIOWrapper(self._compress(self._raw, compression),
+                                     encoding='utf-8', newline='')
+
+    @staticmethod
+    def _compress(raw: io.BufferedWriter, compression: Optional[str]) -> io.RawIOBase:
+        if compression == 'gzip':
+            return gzip.GzipFile(fileobj=raw, mode='wb')
+        if compression == 'zstd':
+            if zstandard is None:
+                raise ImportError('zstandard is required for zstd compression')
+            return zstandard.ZstdCompressor().stream_writer(raw)
+        return raw
+
+    def write(self, record: Mapping) -> None:
+        """
+        Writes one record.
+
+        :param record: record of a report
+        """
+        raise NotImplementedError
+
+    def commit(self) -> None:
+        """
+        Closes the file and gives it its name.
+        """
+        self._close()
+        os.replace(self.temp_filename, self.filename)
+
+    def abort(self) -> None:
+        """
+        Closes and removes the file, if not all records were received.
+        """
+        self._close()
+        if os.path.exists(self.temp_filename):
+            os.remove(self.temp_filename)
+
+    def _close(self) -> None:
+        self.file.close()
+        self._raw.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+
+
+class CSVRecordWriter(RecordWriter):
+    """
+    Writes records into CSV file with a header taken from the first record.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._writer = None
+
+    def write(self, record: Mapping) -> None:
+        if self._writer is None:
+            if isinstance(record, Record):
+                # Compact records are already ordered as the header
+                self._writer = csv.writer(self.file)
+                self._writer.writerow(record.fields)
+            else:
+                self._writer = csv.DictWriter(self.file, fieldnames=list(record), extrasaction='ignore')
+                self._writer.writeheader()
+        self._writer.writerow(record)
+        self.records_number += 1
+
+
+class NDJSONRecordWriter(RecordWriter):
+    """
+    Writes records as JSON objects, one per line.
+    """
+
+    def write(self, record: Mapping) -> None:
+        if isinstance(record, Record):
+            record = record.to_dict()
+        self.file.write(json.dumps(record, ensure_ascii=False))
+        self.file.write('\n')
+        self.records_number += 1
+
+
+RECORD_WRITERS = {
+    'csv': CSVRecordWriter,
+    'json': NDJSONRecordWriter,
+    'ndjson': NDJSONRecordWriter,
+}
+
+
+def open_record_writer(filename: str,
+                       extension: str = 'csv',
+                       compression: Optional[str] = None,
+                       buffer_size: int = COPY_BUFFER_SIZE) -> RecordWriter:
+    """
+    Function returns writer for the file format.
+
+    :param filename: path to the file
+    :param extension: csv, json or ndjson, JSON is written as NDJSON
+    :param compression: gzip, zstd or None
+    :param buffer_size: size of write buffer in bytes
+    :return: writer instance
+    """
+    return RECORD_WRITERS.get(extension, CSVRecordWriter)(filename, compression, buffer_size)
@@ -20,4 +20,10 @@ setup(name='pyappsflyer',
           'xmltodict==0.12.0',
           'pytest==5.3.5'
       ],
+      extras_require={
+          'aio': ['aiohttp>=3.6'],
+          'zstd': ['zstandard'],
+          'numpy': ['numpy'],
+          'arrow': ['pyarrow'],
+      },
       zip_safe=False)
\ No newline at end of file
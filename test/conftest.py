@@ -41,3 +41,28 @@ def set_base_test_logger():
     }
 
     dictConfig(LOGGING)
+
+
+class FakeResponse:
+    """
+    Stand-in for a streamed requests.Response with CSV body.
+    """
+
+    def __init__(self, content: bytes, status_code: int = 200):
+        self.content = content
+        self.status_code = status_code
+
+    def iter_content(self, chunk_size: int = 1, *args, **kwargs):
+        return (self.content[position:position + chunk_size]
+                for position in range(0, len(self.content), chunk_size))
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def csv_response():
+    return FakeResponse(b'\xef\xbb\xbfcol1,col2,col3\n'
+                        b'1,a,x\n'
+                        b'2,b,y\n'
+                        b'3,c,z\n')
@@ -0,0 +1,82 @@
+import pickle
+import pytest
+
+from conftest import FakeResponse
+from pyappsflyer import RawDataReport, Aggregation, Count, Sum, CountDistinct, Day, HyperLogLog
+from pyappsflyer.exceptions import PyAFValidationError
+
+EVENTS = (b'Event Time,Event Name,Media Source,Event Revenue USD,AppsFlyer ID,Country Code\n'
+          b'2020-01-01 10:00:00,af_purchase,facebook,1.5,1-a,US\n'
+          b'2020-01-01 11:00:00,af_purchase,facebook,2.5,1-a,US\n'
+          b'2020-01-01 12:00:00,af_purchase,facebook,,2-b,US\n'
+          b'2020-01-02 10:00:00,af_purchase,Organic,4,3-c,DE\n')
+
+
+def make_aggregation() -> Aggregation:
+    return Aggregation([Day('event_time'), 'media_source'],
+                       {'events': Count(), 'revenue': Sum('event_revenue_usd'),
+                        'users': CountDistinct('appsflyer_id')})
+
+
+def make_events(number: int, offset: int = 0) -> list:
+    return [{'Event Time': f'2020-01-0{index % 2 + 1} 10:00:00', 'Media Source': 'facebook',
+             'Event Revenue USD': '1', 'AppsFlyer ID': f'user-{index}'}
+            for index in range(offset, offset + number)]
+
+
+class TestHyperLogLog:
+
+    @pytest.mark.parametrize('number', [0, 50, 5000, 50000])
+    def test_count_is_close(self, number):
+        sketch = HyperLogLog()
+        for index in range(number):
+            sketch.add(f'user-{index}')
+            sketch.add(f'user-{index}')
+        assert abs(sketch.count() - number) <= max(2, number * 0.05)
+
+    def test_merge_estimates_union(self):
+        first, second, union = HyperLogLog(), HyperLogLog(), HyperLogLog()
+        for index in range(3000):
+            first.add(f'user-{index}')
+            union.add(f'user-{index}')
+        for index in range(2000, 2010):
+            second.add(f'user-{index}')
+            union.add(f'user-{index}')
+
+        merged = pickle.loads(pickle.dumps(second)).merge(first)
+        assert merged.count() == union.count()
+        assert pickle.loads(pickle.dumps(first)).merge(second).count() == union.count()
+
+    def test_precision_must_match(self):
+        with pytest.raises(PyAFValidationError):
+            HyperLogLog(10).merge(HyperLogLog(12))
+
+
+class TestAggregation:
+
+    def test_report_is_aggregated(self):
+        session = type('Session', (), {'get': lambda self, url, **kwargs: FakeResponse(EVENTS)})()
+        report = RawDataReport('TestAppName', api_key='some_api_key', session=session)
+
+        aggregation = report.aggregate_report(make_aggregation(), api_report_name='in_app_events_report')
+
+        assert aggregation.results() == [
+            {'date': '2020-01-01', 'media_source': 'facebook', 'events': 3, 'revenue': 4.0, 'users': 2},
+            {'date': '2020-01-02', 'media_source': 'Organic', 'events': 1, 'revenue': 4.0, 'users': 1},
+        ]
+        assert aggregation.rows == 4
+
+    def test_partials_are_merged(self):
+        whole = make_aggregation().add(make_events(1000))
+        first = make_aggregation().add(make_events(600))
+        second = pickle.loads(pickle.dumps(make_aggregation().add(make_events(400, offset=600))))
+
+        assert first.merge(second).results() == whole.results()
+        assert first.rows == 1000 and len(first) == 2
+
+    def test_different_aggregations_are_not_merged(self):
+        with pytest.raises(PyAFValidationError):
+            make_aggregation().merge(Aggregation(['media_source'], {'events': Count()}))
+
+    def test_columns(self):
+        assert make_aggregation().columns == ['event_time', 'media_source', 'event_revenue_usd', 'appsflyer_id']
@@ -0,0 +1,137 @@
+import asyncio
+import pytest
+
+aiohttp = pytest.importorskip('aiohttp')
+
+from aiohttp import web
+
+from pyappsflyer.aio import AsyncPerformanceReport, AsyncRawDataReport
+from pyappsflyer.retry import RetryPolicy
+from pyappsflyer.dedup import Deduplicator
+from pyappsflyer.aggregate import Aggregation, Count
+from pyappsflyer.cache import ReportCache
+from pyappsflyer.exceptions import PyAFReportsError, PyAFProcessingError, PyAFCommunicationError,\
+    PyAFValidationError
+
+CSV_CONTENT = ('﻿col1,col2\n'
+               '1,"multi\nline"\n'
+               '2,b\n').encode('utf-8')
+
+# Requests of a report which fails
+ATTEMPTS = []
+
+
+async def export_handler(request: web.Request) -> web.Response:
+    report_name = request.match_info['report']
+    if report_name == 'daily_report':
+        return web.Response(body=b'<!DOCTYPE html>\n<html></html>\n')
+    if report_name == 'geo_by_date_report':
+        ATTEMPTS.append(request.query.get('from'))
+        if request.query.get('from') == '2020-01-01' or len(ATTEMPTS) == 1:
+            return web.Response(status=503, body=b'Try later')
+    if request.query.get('reattr'):
+        return web.Response(body=b'col1\nretargeting\n')
+    return web.Response(body=CSV_CONTENT)
+
+
+def run_with_server(coroutine_function):
+    async def runner():
+        app = web.Application()
+        ATTEMPTS.clear()
+        app.router.add_get('/export/{app}/{report}/v5', export_handler)
+        server_runner = web.AppRunner(app)
+        await server_runner.setup()
+        site = web.TCPSite(server_runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            return await coroutine_function(f'http://127.0.0.1:{port}')
+        finally:
+            await server_runner.cleanup()
+    return asyncio.run(runner())
+
+
+class TestAsyncReport:
+
+    def test_get_report_and_iter_report(self):
+        async def check(api_url):
+            async with AsyncPerformanceReport('TestAppName', api_key='some_api_key', api_url=api_url) as report:
+                records = await report.get_report(api_report_name='geo_report')
+                streamed = [record async for record in report.iter_report(api_report_name='geo_report')]
+            return records, streamed
+
+        records, streamed = run_with_server(check)
+        assert records == [{'col1': '1', 'col2': 'multi\nline'}, {'col1': '2', 'col2': 'b'}]
+        assert streamed == records
+
+    def test_get_reports(self):
+        async def check(api_url):
+            async with AsyncRawDataReport('TestAppName', api_key='some_api_key', api_url=api_url) as report:
+                raw_reports = await report.get_reports(exclude_reports=('in_app_events_report',),
+                                                       max_concurrency=2)
+            async with AsyncPerformanceReport('TestAppName', api_key='some_api_key', api_url=api_url) as report:
+                with pytest.raises(PyAFReportsError) as e:
+                    await report.get_reports()
+            return raw_reports, e.value
+
+        raw_reports, error = run_with_server(check)
+        assert [list(report)[0] for report in raw_reports] == [
+            'installs_report', 'installs_report_retargeting', 'organic_installs_report',
+            'organic_in_app_events_report', 'uninstall_events_report'
+        ]
+        assert raw_reports[1]['installs_report_retargeting'] == [{'col1': 'retargeting'}]
+        assert list(error.errors) == ['daily_report']
+        assert isinstance(error.errors['daily_report'], PyAFProcessingError)
+        assert len(error.reports) == 4
+
+    def test_failed_status_is_retried_and_raised(self):
+        async def check(api_url):
+            retry = RetryPolicy(max_attempts=2, backoff=0)
+            async with AsyncPerformanceReport('TestAppName', api_key='some_api_key', api_url=api_url,
+                                              retry=retry) as report:
+                records = await report.get_report(api_report_name='geo_by_date_report')
+                with pytest.raises(PyAFCommunicationError):
+                    await report.get_report(api_report_name='geo_by_date_report',
+                                            from_date='2020-01-01', to_date='2020-01-01')
+            return records
+
+        assert run_with_server(check) == [{'col1': '1', 'col2': 'multi\nline'}, {'col1': '2', 'col2': 'b'}]
+
+    def test_dedup(self):
+        async def check(api_url):
+            dedup = Deduplicator(key_columns=('col1',), batch_size=1)
+            async with AsyncPerformanceReport('TestAppName', api_key='some_api_key', api_url=api_url) as report:
+                streamed = report.iter_report(api_report_name='geo_report', dedup=dedup)
+                first = [await streamed.__anext__()]
+                await streamed.aclose()
+                records = await report.get_report(api_report_name='geo_report', dedup=dedup)
+                repeated = [record async for record in report.iter_report(api_report_name='geo_report', dedup=dedup)]
+            return first, records, repeated, dedup
+
+        first, records, repeated, dedup = run_with_server(check)
+        assert first == [{'col1': '1', 'col2': 'multi\nline'}]
+        assert records == [{'col1': '2', 'col2': 'b'}]
+        assert repeated == []
+        assert len(dedup.index) == 2
+
+    def test_aggregate_report(self):
+        async def check(api_url):
+            async with AsyncPerformanceReport('TestAppName', api_key='some_api_key', api_url=api_url) as report:
+                return await report.aggregate_report(Aggregation(['col2'], {'rows': Count()}),
+                                                     api_report_name='geo_report')
+
+        aggregation = run_with_server(check)
+        assert aggregation.results() == [{'col2': 'b', 'rows': 1}, {'col2': 'multi\nline', 'rows': 1}]
+
+    def test_sync_only_features_are_rejected(self, tmp_path):
+        with pytest.raises(PyAFValidationError):
+            AsyncRawDataReport('TestAppName', api_key='some_api_key', cache=ReportCache(str(tmp_path)))
+
+        report = AsyncRawDataReport('TestAppName', api_key='some_api_key')
+        with pytest.raises(PyAFValidationError) as e:
+            report.get_windowed_report(api_report_name='installs_report')
+        assert 'RawDataReport' in str(e.value)
+        for method in (report.get_typed_report, report.run_report_pipeline, report.iter_parallel_report,
+                       report.get_parallel_table, report.iter_sync_reports, report.aggregate_cohorts):
+            with pytest.raises(PyAFValidationError):
+                method()
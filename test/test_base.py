@@ -2,9 +2,10 @@ import os
 import re
 import pytest
 
-from pyappsflyer import BaseAppsFlyer, get_random_filename
+from pyappsflyer import BaseAppsFlyer, get_random_filename, create_session
 
 from pyappsflyer.exceptions import PyAFValidationError
+from pyappsflyer.windows import split_date_range, split_window, format_window
 
 from io import StringIO
 
@@ -99,3 +100,32 @@ class TestBase:
         result_gen = baseappclass.do_reports_exclusion(sample_report_names, report_names_to_exclude)
 
         assert len(list(result_gen)) == 3
+
+    def test_session_is_shared(self, baseappclass: BaseAppsFlyer):
+        other = BaseAppsFlyer('OtherTestAppName', api_key='some_api_key')
+        assert baseappclass.session is other.session
+
+        session = create_session(pool_maxsize=2, pool_block=True, keep_alive=False)
+        own = BaseAppsFlyer('OwnSessionAppName', api_key='some_api_key', session=session)
+        adapter = own.session.get_adapter('https://hq.appsflyer.com')
+
+        assert own.session is session
+        assert adapter._pool_maxsize == 2
+        assert adapter._pool_block is True
+        assert own.session.headers['Connection'] == 'close'
+
+    def test_date_range_split(self):
+        windows = split_date_range('2020-01-01', '2020-01-03')
+        assert [format_window(*window) for window in windows] == [
+            ('2020-01-01', '2020-01-01'), ('2020-01-02', '2020-01-02'), ('2020-01-03', '2020-01-03')
+        ]
+
+        windows = split_date_range('2020-01-01 22:00', '2020-01-01 23:29', window='hour')
+        assert [format_window(*window) for window in windows] == [
+            ('2020-01-01 22:00', '2020-01-01 22:59'), ('2020-01-01 23:00', '2020-01-01 23:29')
+        ]
+
+        first, second = split_window(*windows[0])
+        assert format_window(*first) == ('2020-01-01 22:00', '2020-01-01 22:29')
+        assert format_window(*second) == ('2020-01-01 22:30', '2020-01-01 22:59')
+        assert split_window(*split_date_range('2020-01-01 22:00', '2020-01-01 22:00', 'hour')[0]) == []
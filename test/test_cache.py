@@ -0,0 +1,56 @@
+import pytest
+
+from pyappsflyer import PerformanceReport, ReportCache
+
+
+@pytest.fixture
+def report_cache(tmp_path):
+    return ReportCache(str(tmp_path / 'cache'), max_size=10 ** 6)
+
+
+class TestCache:
+
+    def test_closed_days_are_cached(self, monkeypatch, report_cache: ReportCache, csv_response):
+        report = PerformanceReport('TestAppName', api_key='some_api_key', cache=report_cache)
+        requested_urls = []
+
+        def fake_get(url, **kwargs):
+            requested_urls.append(url)
+            return csv_response
+
+        monkeypatch.setattr(report.session, 'get', fake_get)
+
+        first = report.get_report(api_report_name='geo_report', from_date='2020-01-01', to_date='2020-01-02')
+        other_token = PerformanceReport('TestAppName', api_key='other_api_key', cache=report_cache)
+        second = other_token.get_report(api_report_name='geo_report', from_date='2020-01-01', to_date='2020-01-02')
+
+        assert len(requested_urls) == 1
+        assert first == second
+        assert len(first) == 3
+        assert report_cache.stats()['hits'] == 1
+        assert report_cache.stats()['misses'] == 1
+        assert report_cache.stats()['entries'] == 1
+
+    def test_ttl_and_key(self, report_cache: ReportCache):
+        report = PerformanceReport('TestAppName', api_key='some_api_key')
+        report.api_report_name = 'geo_report'
+        url = report._prepare_url(request_args={'from': '2020-01-01', 'to': '2020-01-02'})
+
+        assert 'api_token' not in report_cache.make_key(url)
+        assert 'TestAppName/geo_report' in report_cache.make_key(url)
+        assert report_cache.get_ttl({'to': '2020-01-02'}) == report_cache.closed_ttl
+        assert report_cache.get_ttl({'to': report.get_default_dates()[1]}) == report_cache.open_ttl
+
+    def test_least_recently_used_are_evicted(self, report_cache: ReportCache):
+        for key in ('first', 'second'):
+            with report_cache.store(key, ttl=100) as writer:
+                list(writer.tee([b'col1,col2\n1', b',2\n']))
+        report_cache.open('first').close()
+
+        report_cache.max_size = report_cache.stats()['size'] - 1
+        report_cache.evict()
+
+        assert report_cache.open('second') is None
+        with report_cache.open('first') as cached:
+            assert cached.read() == b'col1,col2\n1,2\n'
+        assert report_cache.stats()['evictions'] == 1
@@ -0,0 +1,85 @@
+import sqlite3
+import pytest
+
+from conftest import FakeResponse
+from pyappsflyer import RawDataReport
+from pyappsflyer.exceptions import PyAFValidationError
+from pyappsflyer.sinks import DBSink, RAW_DATA_KEY_COLUMNS
+
+RAW_CSV = (b'Event Time,Event Name,Event Revenue,AppsFlyer ID\n'
+           b'2020-01-01 10:00:00,purchase,1.5,id-1\n'
+           b'2020-01-01 11:00:00,open,,id-2\n'
+           b'2020-01-01 12:00:00,level,2,id-3\n')
+
+
+@pytest.fixture
+def raw_data_report(monkeypatch):
+    report = RawDataReport('TestAppName', api_key='some_api_key')
+    monkeypatch.setattr(report.session, 'get', lambda url, **kwargs: FakeResponse(RAW_CSV))
+    return report
+
+
+class TestDBSink:
+
+    def test_table_is_created_from_header(self, tmp_path, raw_data_report: RawDataReport):
+        path = str(tmp_path / 'reports.sqlite')
+        sink = DBSink(path, 'installs', batch_size=2)
+
+        assert sink.write_report(raw_data_report, api_report_name='installs_report') == 3
+        with sqlite3.connect(path) as connection:
+            rows = connection.execute('SELECT appsflyer_id, event_revenue FROM installs').fetchall()
+        assert rows == [('id-1', '1.5'), ('id-2', ''), ('id-3', '2')]
+
+    def test_records_are_upserted_by_keys(self, raw_data_report: RawDataReport):
+        connection = sqlite3.connect(':memory:', check_same_thread=False)
+        sink = DBSink(connection, 'events', key_columns=RAW_DATA_KEY_COLUMNS)
+
+        sink.write_report(raw_data_report, api_report_name='in_app_events_report')
+        raw_data_report.run_report_pipeline(api_report_name='in_app_events_report', sinks=[sink])
+        sink.write([{'Event Time': '2020-01-01 10:00:00', 'Event Name': 'purchase',
+                     'Event Revenue': '3', 'AppsFlyer ID': 'id-1'}])
+
+        assert connection.execute('SELECT COUNT(*) FROM events').fetchone() == (3,)
+        assert connection.execute("SELECT event_revenue FROM events WHERE appsflyer_id = 'id-1'").fetchone() == ('3',)
+
+    def test_broken_report_is_rolled_back(self, raw_data_report: RawDataReport):
+        connection = sqlite3.connect(':memory:', check_same_thread=False)
+        sink = DBSink(connection, 'events', batch_size=1)
+
+        def iter_broken_report():
+            records = raw_data_report.iter_report(api_report_name='installs_report', row_format='record')
+            yield next(records)
+            yield next(records)
+            raise ConnectionError('Connection was reset')
+
+        with pytest.raises(ConnectionError):
+            sink.write(iter_broken_report())
+
+        assert connection.execute('SELECT COUNT(*) FROM events').fetchone() == (0,)
+
+    def test_wrong_names(self, raw_data_report: RawDataReport):
+        with pytest.raises(PyAFValidationError):
+            DBSink(':memory:', 'events; DROP TABLE events')
+        with pytest.raises(PyAFValidationError):
+            DBSink(':memory:', 'events', key_columns=['install_time']).write_report(raw_data_report)
+
+    def test_key_index_is_created_for_existing_table(self, raw_data_report: RawDataReport):
+        connection = sqlite3.connect(':memory:', check_same_thread=False)
+        connection.execute('CREATE TABLE events (event_time TEXT, event_name TEXT, event_revenue TEXT, '
+                           'appsflyer_id TEXT)')
+        sink = DBSink(connection, 'events', key_columns=RAW_DATA_KEY_COLUMNS)
+
+        sink.write_report(raw_data_report, api_report_name='in_app_events_report')
+        sink.write_report(raw_data_report, api_report_name='in_app_events_report')
+
+        assert connection.execute('SELECT COUNT(*) FROM events').fetchone() == (3,)
+
+    def test_existing_duplicates_are_rejected(self, raw_data_report: RawDataReport):
+        connection = sqlite3.connect(':memory:', check_same_thread=False)
+        DBSink(connection, 'events').write_report(raw_data_report, api_report_name='in_app_events_report')
+        DBSink(connection, 'events').write_report(raw_data_report, api_report_name='in_app_events_report')
+
+        with pytest.raises(PyAFValidationError):
+            DBSink(connection, 'events', key_columns=RAW_DATA_KEY_COLUMNS).write_report(
+                raw_data_report, api_report_name='in_app_events_report')
+        assert connection.execute('SELECT COUNT(*) FROM events').fetchone() == (6,)
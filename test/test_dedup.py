@@ -0,0 +1,96 @@
+import pytest
+
+from conftest import FakeResponse
+from pyappsflyer import RawDataReport, Deduplicator, MemoryDedupIndex, SQLiteDedupIndex
+from pyappsflyer import dedup as dedup_module
+from pyappsflyer.exceptions import PyAFValidationError
+
+HEADER = b'AppsFlyer ID,Event Name,Event Time,Is Retargeting,Media Source\n'
+INSTALLS = HEADER + (b'1-a,install,2020-01-01 10:00:00,false,facebook\n'
+                     b'2-b,install,2020-01-01 11:00:00,false,Organic\n')
+RETARGETING = HEADER + (b'1-a,install,2020-01-01 10:00:00,true,facebook\n'
+                        b'2-b,install,2020-01-01 11:00:00,false,Organic\n')
+
+
+class QueueSession:
+
+    def __init__(self, *bodies: bytes):
+        self.bodies = list(bodies)
+
+    def get(self, url, **kwargs):
+        return FakeResponse(self.bodies.pop(0))
+
+
+def make_events(*keys):
+    return [{'AppsFlyer ID': appsflyer_id, 'Event Name': 'af_purchase', 'Event Time': event_time,
+             'Is Retargeting': 'false'}
+            for appsflyer_id, event_time in keys]
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def index(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryDedupIndex()
+    return SQLiteDedupIndex(str(tmp_path / 'state' / 'dedup.sqlite'))
+
+
+class TestDeduplicator:
+
+    def test_streams_are_merged_without_duplicates(self, index):
+        deduplicator = Deduplicator(index, batch_size=2)
+        first = make_events(('1', 't1'), ('2', 't1'), ('1', 't1'))
+        second = make_events(('2', 't1'), ('3', 't2'), ('1', 't2'))
+
+        merged = list(deduplicator.merge(first, second))
+
+        assert [(record['AppsFlyer ID'], record['Event Time']) for record in merged] == \
+            [('1', 't1'), ('2', 't1'), ('3', 't2'), ('1', 't2')]
+        assert (deduplicator.passed, deduplicator.dropped) == (4, 2)
+        assert len(index) == 4
+
+    def test_unread_records_are_not_marked(self, index):
+        deduplicator = Deduplicator(index, batch_size=10)
+        records = deduplicator.iter(make_events(('1', 't1'), ('2', 't1'), ('3', 't1')))
+        assert next(records)['AppsFlyer ID'] == '1'
+        records.close()
+
+        assert len(index) == 1
+        assert [record['AppsFlyer ID'] for record in deduplicator.iter(make_events(('1', 't1'), ('2', 't1')))] \
+            == ['2']
+
+    def test_sqlite_index_is_kept_between_runs(self, tmp_path):
+        path = str(tmp_path / 'dedup.sqlite')
+        with SQLiteDedupIndex(path) as index:
+            assert Deduplicator(index).filter(make_events(('1', 't1'))) == make_events(('1', 't1'))
+        with SQLiteDedupIndex(path) as index:
+            assert Deduplicator(index).filter(make_events(('1', 't1'), ('2', 't1'))) == make_events(('2', 't1'))
+
+    def test_memory_index_merges_fingerprints(self, monkeypatch):
+        monkeypatch.setattr(dedup_module, 'MIN_MERGE_SIZE', 4)
+        index = MemoryDedupIndex()
+        assert index.add([5, 1, 5, 3, 2]) == [True, True, False, True, True]
+        assert list(index._sorted) == [1, 2, 3, 5] and not index._recent
+        assert index.add([4, 3, 0]) == [True, False, True]
+        index.discard([3, 4])
+        assert index.add([3, 4, 1]) == [True, True, False]
+        assert len(index) == 6
+
+    def test_missing_key_column(self):
+        with pytest.raises(PyAFValidationError):
+            Deduplicator(key_columns=('appsflyer_id', 'customer_user_id')).filter(make_events(('1', 't1')))
+
+
+class TestReportDedup:
+
+    def test_report_and_retargeting_twin_are_merged(self):
+        report = RawDataReport('TestAppName', api_key='some_api_key', session=QueueSession(INSTALLS, RETARGETING))
+        deduplicator = Deduplicator()
+
+        installs = report.get_report(api_report_name='installs_report', dedup=deduplicator)
+        retargeting = list(report.iter_report(api_report_name='installs_report', retargeting=True,
+                                              row_format='record', dedup=deduplicator))
+
+        assert [record['AppsFlyer ID'] for record in installs] == ['1-a', '2-b']
+        # The same install attributed by retargeting has another key
+        assert [(record['AppsFlyer ID'], record['Is Retargeting']) for record in retargeting] == [('1-a', 'true')]
+        assert deduplicator.dropped == 1
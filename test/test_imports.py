@@ -0,0 +1,48 @@
+import sys
+import json
+import subprocess
+
+HEAVY_MODULES = ('numpy', 'pyarrow', 'zstandard', 'requests', 'environs', 'aiohttp')
+
+# Modules which report classes import only when their features are used
+FEATURE_MODULES = ('sqlite3', 'furl', 'asyncio', 'pyappsflyer.cache', 'pyappsflyer.sync', 'pyappsflyer.retry',
+                   'pyappsflyer.typed', 'pyappsflyer.dedup', 'pyappsflyer.parallel', 'pyappsflyer.join')
+
+CHECK = '''
+import sys, json, logging
+handlers = list(logging.getLogger().handlers)
+{statement}
+print(json.dumps({{
+    'modules': sorted(name for name in {heavy!r} if name in sys.modules),
+    'logging_changed': logging.getLogger().handlers != handlers,
+}}))
+'''
+
+
+def run_check(statement: str) -> dict:
+    output = subprocess.run([sys.executable, '-c', CHECK.format(statement=statement,
+                                                                heavy=HEAVY_MODULES + FEATURE_MODULES)],
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+class TestImports:
+
+    def test_package_import_is_light(self):
+        result = run_check('import pyappsflyer')
+        assert result == {'modules': [], 'logging_changed': False}
+
+    def test_report_import_defers_optional_packages(self):
+        result = run_check('from pyappsflyer import RawDataReport')
+        assert not set(result['modules']) & {'numpy', 'pyarrow', 'zstandard', 'aiohttp'}
+        assert not set(result['modules']) & set(FEATURE_MODULES)
+        assert not result['logging_changed']
+
+    def test_report_instance_defers_feature_modules(self):
+        result = run_check('from pyappsflyer import PerformanceReport, RawDataReport, TargetingValidationRulesReport\n'
+                           'RawDataReport("TestAppName", api_key="some_api_key")')
+        assert not set(result['modules']) & {'sqlite3', 'furl', 'asyncio', 'pyappsflyer.cache'}
+
+    def test_configure_logging(self):
+        result = run_check('from pyappsflyer import configure_logging; configure_logging()')
+        assert result['logging_changed']
@@ -0,0 +1,43 @@
+import io
+import csv
+import pytest
+
+from pyappsflyer.ingest import iter_csv_lines, find_record_boundary, CSVChunkFeed
+
+CSV_TEXT = ('﻿AppsFlyer ID,User Agent,Event Value,City\r\n'
+            'id-1,"Mozilla/5.0 (Linux; ""Android"")","{""a"":\r\n""b""}",Москва\r\n'
+            'id-2,curl,"multi\nline\nvalue",Zürich\r\n'
+            'id-3,,,\r\n')
+CSV_CONTENT = CSV_TEXT.encode('utf-8')
+EXPECTED = list(csv.reader(io.StringIO(CSV_TEXT[1:], newline='')))
+
+
+def chunked(content: bytes, chunk_size: int):
+    return [content[position:position + chunk_size] for position in range(0, len(content), chunk_size)]
+
+
+class TestIngest:
+
+    @pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 64, 1024])
+    def test_lines_from_chunks(self, chunk_size):
+        lines = iter_csv_lines(chunked(CSV_CONTENT, chunk_size), encoding='utf-8-sig')
+        assert list(csv.reader(lines)) == EXPECTED
+
+    @pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 64, 1024])
+    def test_chunk_feed_gives_only_complete_records(self, chunk_size):
+        feed = CSVChunkFeed('utf-8-sig')
+        reader = csv.reader(feed)
+        rows = []
+
+        for chunk in chunked(CSV_CONTENT, chunk_size):
+            feed.push(chunk)
+            rows.extend(reader)
+        feed.flush()
+        rows.extend(reader)
+
+        assert rows == EXPECTED
+
+    def test_record_boundary(self):
+        assert find_record_boundary('a,b\n1,"x\ny') == 3
+        assert find_record_boundary('a,"b\n') == -1
+        assert find_record_boundary('a,b\n1,"x\ny"\n2,') == 11
@@ -0,0 +1,101 @@
+import os
+import pytest
+
+from conftest import FakeResponse
+from pyappsflyer import RawDataReport, StreamingJoin
+from pyappsflyer.exceptions import PyAFValidationError
+
+INSTALLS_CSV = (b'AppsFlyer ID,Install Time,Media Source,Campaign,Country Code\n'
+                b'1-a,2020-01-01 10:00:00,facebook,summer,US\n'
+                b'2-b,2020-01-01 12:00:00,Organic,,DE\n'
+                b'3-c,2020-01-02 09:00:00,facebook,summer,US\n')
+EVENTS_CSV = (b'Event Time,Event Name,Event Revenue USD,AppsFlyer ID,Install Time,Media Source\n'
+              b'2020-01-01 11:00:00,af_purchase,1.5,1-a,2020-01-01 10:00:00,facebook\n'
+              b'2020-01-03 11:00:00,af_purchase,2,1-a,2020-01-01 10:00:00,facebook\n'
+              b'2020-01-03 11:00:00,af_purchase,3,3-c,2020-01-02 09:00:00,facebook\n'
+              b'2020-01-03 12:00:00,af_purchase,5,4-d,2019-12-01 09:00:00,facebook\n'
+              b'2019-12-31 23:00:00,af_purchase,7,2-b,2020-01-01 12:00:00,Organic\n')
+
+
+def make_installs(number: int) -> list:
+    return [{'AppsFlyer ID': f'user-{index}', 'Install Time': '2020-01-01 10:00:00',
+             'Media Source': 'facebook', 'Campaign': f'campaign-{index % 3}', 'Country Code': 'US'}
+            for index in range(number)]
+
+
+def make_events(number: int) -> list:
+    return [{'AppsFlyer ID': f'user-{index % 150}', 'Event Time': '2020-01-02 10:00:00',
+             'Event Name': 'af_purchase', 'Event Revenue USD': str(index)}
+            for index in range(number)]
+
+
+class ReportSession:
+
+    def __init__(self):
+        self.urls = []
+
+    def get(self, url, **kwargs):
+        self.urls.append(url)
+        return FakeResponse(INSTALLS_CSV if '/installs_report/' in url else EVENTS_CSV)
+
+
+class TestStreamingJoin:
+
+    def test_events_are_joined_in_memory(self):
+        join = StreamingJoin(build_columns=('install_time', 'campaign'), probe_columns=('event_name',))
+        join.build(make_installs(100) + [{'AppsFlyer ID': 'user-0', 'Install Time': 'later',
+                                          'Campaign': 'other', 'Media Source': '', 'Country Code': ''}])
+
+        joined = list(join.probe(make_events(300)))
+
+        assert len(joined) == 200 and join.unmatched == 100
+        assert joined[0].to_dict() == {'appsflyer_id': 'user-0', 'install_time': '2020-01-01 10:00:00',
+                                       'campaign': 'campaign-0', 'event_name': 'af_purchase'}
+        assert not join.spilled
+
+    def test_spilled_join_gives_the_same_records(self, tmp_path):
+        expected = sorted(StreamingJoin().build(make_installs(100)).probe(make_events(300)))
+
+        with StreamingJoin(memory_limit=2000, partitions=4, spool_dir=str(tmp_path)) as join:
+            join.build(make_installs(60))
+            assert join.spilled
+            join.build(make_installs(100))
+            assert sorted(join.probe(make_events(300))) == expected
+            # Partitions of installs are kept for the next probe
+            assert sorted(join.probe(make_events(300))) == expected
+            assert (join.matched, join.unmatched) == (400, 200)
+        assert os.listdir(str(tmp_path)) == []
+
+    def test_columns_must_differ(self):
+        with pytest.raises(PyAFValidationError):
+            StreamingJoin(build_columns=('media_source',), probe_columns=('media_source',))
+
+
+class TestCohorts:
+
+    def test_cohorts_are_aggregated(self):
+        session = ReportSession()
+        report = RawDataReport('TestAppName', api_key='some_api_key', session=session)
+
+        aggregation = report.aggregate_cohorts('2020-01-01', '2020-01-02', days=7)
+
+        assert aggregation.results() == [
+            {'cohort': '2020-01-01', 'media_source': 'facebook', 'day': 0, 'events': 1, 'revenue': 1.5, 'users': 1},
+            {'cohort': '2020-01-01', 'media_source': 'facebook', 'day': 2, 'events': 1, 'revenue': 2.0, 'users': 1},
+            {'cohort': '2020-01-02', 'media_source': 'facebook', 'day': 1, 'events': 1, 'revenue': 3.0, 'users': 1},
+        ]
+        assert '/installs_report/' in session.urls[0] and 'to=2020-01-02' in session.urls[0]
+        assert '/in_app_events_report/' in session.urls[1] and 'to=2020-01-09' in session.urls[1]
+
+    def test_events_after_cohort_days_are_dropped(self):
+        session = ReportSession()
+        report = RawDataReport('TestAppName', api_key='some_api_key', session=session)
+
+        aggregation = report.aggregate_cohorts('2020-01-01', '2020-01-02', days=1)
+
+        # Events of the first cohort on day 2 are received for the second one and dropped
+        assert aggregation.results() == [
+            {'cohort': '2020-01-01', 'media_source': 'facebook', 'day': 0, 'events': 1, 'revenue': 1.5, 'users': 1},
+            {'cohort': '2020-01-02', 'media_source': 'facebook', 'day': 1, 'events': 1, 'revenue': 3.0, 'users': 1},
+        ]
+        assert 'to=2020-01-03' in session.urls[1]
@@ -0,0 +1,83 @@
+import logging
+import requests
+
+from conftest import FakeResponse
+from pyappsflyer import PerformanceReport, ReportCache
+from pyappsflyer.metrics import MetricsRegistry, hide_api_token
+from pyappsflyer.retry import RetryPolicy
+
+CSV = b'col1,col2\n1,a\n2,b\n3,c\n'
+
+
+class FakeSession:
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+
+    def get(self, url, **kwargs):
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def create_report(session, registry, **kwargs) -> PerformanceReport:
+    return PerformanceReport('TestAppName', api_key='some_api_key', session=session, instrumentation=registry,
+                             retry=RetryPolicy(sleep=lambda delay: None), **kwargs)
+
+
+class TestMetrics:
+
+    def test_request_is_measured(self, caplog):
+        registry = MetricsRegistry()
+        report = create_report(FakeSession(requests.ConnectionError('Connection refused'), FakeResponse(CSV)),
+                               registry)
+
+        with caplog.at_level(logging.DEBUG):
+            assert len(report.get_report(api_report_name='geo_report')) == 3
+
+        labels = {'app': 'TestAppName', 'report': 'geo_report'}
+        assert registry.get('appsflyer_requests_total', status='ok', cache='off', **labels) == 1
+        assert registry.get('appsflyer_retries_total', **labels) == 1
+        assert registry.get('appsflyer_parsed_rows_total', **labels) == 3
+        assert registry.get('appsflyer_received_bytes_total', **labels) == len(CSV)
+        assert registry.get('appsflyer_request_duration_seconds', **labels) == 1
+        assert registry.get('appsflyer_time_to_first_byte_seconds', **labels) == 1
+        assert 'some_api_key' not in caplog.text
+        assert 'api_token=***' in caplog.text
+
+    def test_errors_and_cache_hits(self, tmp_path):
+        registry = MetricsRegistry()
+        session = FakeSession(FakeResponse(b'', 404), FakeResponse(CSV))
+        report = create_report(session, registry, cache=ReportCache(str(tmp_path)))
+        dates = {'api_report_name': 'geo_report', 'from_date': '2020-01-01', 'to_date': '2020-01-01'}
+
+        try:
+            report.get_report(**dates)
+        except Exception:
+            pass
+        report.get_report(**dates)
+        report.get_report(**dates)
+
+        assert registry.get('appsflyer_requests_total', status='error') == 1
+        assert registry.get('appsflyer_requests_total', status='ok', cache='miss') == 1
+        assert registry.get('appsflyer_requests_total', status='ok', cache='hit') == 1
+        assert registry.get('appsflyer_parsed_rows_total') == 6
+
+    def test_prometheus_format(self):
+        registry = MetricsRegistry(buckets=(1, 10))
+        report = create_report(FakeSession(FakeResponse(CSV)), registry)
+        list(report.iter_report(api_report_name='geo_report'))
+
+        text = registry.to_prometheus()
+
+        assert '# TYPE appsflyer_request_duration_seconds histogram' in text
+        assert ('appsflyer_requests_total{app="TestAppName",report="geo_report",status="ok",cache="off"} 1'
+                in text)
+        assert 'appsflyer_parsed_rows_total{app="TestAppName",report="geo_report"} 3' in text
+        assert 'appsflyer_request_duration_seconds_bucket{app="TestAppName",report="geo_report",le="+Inf"} 1' in text
+        assert 'appsflyer_request_duration_seconds_count{app="TestAppName",report="geo_report"} 1' in text
+
+    def test_hide_api_token(self):
+        assert hide_api_token('https://hq.appsflyer.com/export/app/geo_report/v5?api_token=secret&from=2020') \
+               == 'https://hq.appsflyer.com/export/app/geo_report/v5?api_token=***&from=2020'
@@ -0,0 +1,109 @@
+import time
+import threading
+import pytest
+
+from collections import Counter
+
+from conftest import FakeResponse
+from pyappsflyer import RawDataReport, PerformanceReport
+from pyappsflyer.exceptions import PyAFReportsError
+from pyappsflyer.orchestrator import ReportOrchestrator, TokenBucket
+
+CSV = b'Event Time,AppsFlyer ID\n2020-01-01 10:00:00,id-1\n2020-01-01 11:00:00,id-2\n'
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeSession:
+    """
+    Session which counts downloads running at once.
+    """
+
+    def __init__(self, delay: float = 0.01, broken_apps=()):
+        self.delay = delay
+        self.broken_apps = broken_apps
+        self.lock = threading.Lock()
+        self.running = Counter()
+        self.max_running = Counter()
+        self.urls = []
+
+    def get(self, url, **kwargs):
+        application_name = url.split('/export/')[1].split('/')[0]
+        with self.lock:
+            self.urls.append(url)
+            for key in (application_name, 'all'):
+                self.running[key] += 1
+                self.max_running[key] = max(self.max_running[key], self.running[key])
+        time.sleep(self.delay)
+        with self.lock:
+            for key in (application_name, 'all'):
+                self.running[key] -= 1
+        if application_name in self.broken_apps:
+            raise ConnectionError('Connection was reset')
+        return FakeResponse(CSV)
+
+
+class TestOrchestrator:
+
+    def test_token_bucket(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, capacity=2, clock=clock)
+
+        bucket.take()
+        bucket.take()
+        assert bucket.get_delay() == pytest.approx(0.5)
+        clock.now = 0.5
+        assert bucket.get_delay() == 0
+        bucket.take()
+        clock.now = 100
+        assert bucket.get_delay() == 0
+        bucket.take(2)
+        assert bucket.get_delay() == pytest.approx(0.5)
+
+    def test_concurrency_limits(self):
+        session = FakeSession()
+        orchestrator = ReportOrchestrator(api_key='some_api_key', max_workers=4, app_concurrency=2,
+                                          account_rate=0, app_rate=0, session=session)
+        orchestrator.add_apps([f'app{number}' for number in range(4)], [RawDataReport, PerformanceReport],
+                              from_date='2020-01-01', to_date='2020-01-01')
+        progress = []
+
+        tasks = orchestrator.run(progress=lambda task, finished, total: progress.append((finished, total)))
+
+        reports_number = len(list(RawDataReport('app')._get_report_calls())) + 5
+        assert len(tasks) == 4 * reports_number
+        assert all(task.status == 'done' and len(task.result) == 2 for task in tasks)
+        assert progress[-1] == (len(tasks), len(tasks))
+        assert session.max_running['all'] <= 4
+        assert max(session.max_running[f'app{number}'] for number in range(4)) <= 2
+        # Applications take turns instead of going one after another
+        assert len({url.split('/export/')[1].split('/')[0] for url in session.urls[:4]}) > 1
+
+    def test_rate_limit(self):
+        session = FakeSession(delay=0)
+        orchestrator = ReportOrchestrator(api_key='some_api_key', account_rate=600, app_rate=0, session=session)
+        orchestrator.add('app', PerformanceReport, report_names=['partners_report'] * 13)
+
+        started = time.monotonic()
+        orchestrator.run()
+
+        # 10 requests are allowed at once, the others are made with 10 requests per second
+        assert time.monotonic() - started >= 0.25
+
+    def test_failed_reports_are_raised_together(self):
+        session = FakeSession(broken_apps=('broken',))
+        orchestrator = ReportOrchestrator(api_key='some_api_key', session=session, account_rate=0, app_rate=0)
+        orchestrator.add_apps(['app', 'broken'], [PerformanceReport])
+
+        with pytest.raises(PyAFReportsError) as err:
+            orchestrator.run()
+
+        assert len(err.value.reports) == 5
+        assert set(err.value.errors) == {f'broken/{name}' for name in PerformanceReport('app').report_names}
@@ -0,0 +1,70 @@
+import os
+import pytest
+
+from conftest import FakeResponse
+from pyappsflyer import RawDataReport
+from pyappsflyer.parallel import spool, split_file
+
+RAW_CSV = ('﻿AppsFlyer ID,Event Name,Event Value,Event Revenue\n'
+           + ''.join(f'id-{number},purchase,"{{""items"":\n{number}}}",{number}.5\n' for number in range(40))
+           ).encode('utf-8')
+
+
+@pytest.fixture
+def raw_data_report(monkeypatch):
+    report = RawDataReport('TestAppName', api_key='some_api_key')
+    monkeypatch.setattr(report.session, 'get', lambda url, **kwargs: FakeResponse(RAW_CSV))
+    return report
+
+
+class TestParallel:
+
+    def test_file_is_split_by_records(self, tmp_path):
+        path = spool([RAW_CSV[:10], RAW_CSV[10:]], directory=str(tmp_path))
+        header, ranges = split_file(path, chunk_size=50)
+
+        assert header == ['AppsFlyer ID', 'Event Name', 'Event Value', 'Event Revenue']
+        assert len(ranges) > 5
+        with open(path, 'rb') as file:
+            content = file.read()
+        for start, end in ranges:
+            assert content[start:end].startswith(b'id-')
+            assert content[start:end].endswith(b'.5\n')
+        os.remove(path)
+
+    def test_parallel_report_keeps_order(self, raw_data_report: RawDataReport):
+        expected = raw_data_report.get_report(api_report_name='in_app_events_report', row_format='record')
+        records = list(raw_data_report.iter_parallel_report(api_report_name='in_app_events_report',
+                                                            row_format='record', max_workers=2, chunk_size=100))
+
+        assert records == expected
+        assert records[3]['Event Value'] == '{"items":\n3}'
+
+    def test_parallel_table(self, raw_data_report: RawDataReport):
+        pytest.importorskip('pyarrow')
+        table = raw_data_report.get_parallel_table(api_report_name='in_app_events_report',
+                                                   columns=('appsflyer_id', 'event_revenue'),
+                                                   max_workers=2, chunk_size=100)
+
+        assert table.num_rows == 40
+        assert table.column_names == ['appsflyer_id', 'event_revenue']
+        assert table.column('event_revenue').to_pylist()[:2] == [0.5, 1.5]
+
+    def test_error_page_is_not_cached(self, tmp_path):
+        from pyappsflyer import ReportCache
+        from pyappsflyer.exceptions import PyAFProcessingError
+
+        cache = ReportCache(str(tmp_path / 'cache'))
+        report = RawDataReport('TestAppName', api_key='some_api_key', cache=cache)
+        answers = [FakeResponse(b'<!DOCTYPE html>\n<html><body>Limit reached</body></html>\n'),
+                   FakeResponse(RAW_CSV)]
+        report.session = type('Session', (), {'get': lambda self, url, **kwargs: answers.pop(0)})()
+
+        with pytest.raises(PyAFProcessingError):
+            list(report.iter_parallel_report(api_report_name='in_app_events_report',
+                                             from_date='2020-01-01', to_date='2020-01-01', max_workers=1))
+        assert cache.stats()['entries'] == 0
+
+        records = report.get_report(api_report_name='in_app_events_report',
+                                    from_date='2020-01-01', to_date='2020-01-01')
+        assert len(records) == 40 and not answers
@@ -0,0 +1,94 @@
+import os
+import time
+import pytest
+
+from conftest import FakeResponse
+from pyappsflyer import RawDataReport
+from pyappsflyer.exceptions import PyAFProcessingError
+from pyappsflyer.pipeline import ReportPipeline, PipelineSink, CallbackSink
+
+RAW_CSV = ('﻿AppsFlyer ID,Event Name,Event Value\n'
+           + ''.join(f'id-{number},purchase,"{{""items"":\n{number}}}"\n' for number in range(100))
+           ).encode('utf-8')
+
+
+class SlowSink(PipelineSink):
+
+    def __init__(self):
+        self.records = []
+        self.error = None
+
+    def write_batch(self, records):
+        time.sleep(0.001)
+        self.records.extend(records)
+
+    def close(self, error=None):
+        self.error = error
+
+
+class FailingSink(SlowSink):
+
+    def write_batch(self, records):
+        raise ValueError('Sink is broken')
+
+
+@pytest.fixture
+def raw_data_report(monkeypatch, tmp_path):
+    monkeypatch.setattr('pyappsflyer.base.get_random_filename',
+                        lambda **kwargs: str(tmp_path / 'copies' / 'report.csv'))
+    report = RawDataReport('TestAppName', api_key='some_api_key')
+    monkeypatch.setattr(report.session, 'get', lambda url, **kwargs: FakeResponse(RAW_CSV))
+    return report
+
+
+class TestPipeline:
+
+    def test_queues_are_bounded(self):
+        sink = SlowSink()
+        pipeline = ReportPipeline([sink], queue_size=2, batch_size=10)
+
+        def parse(chunks):
+            for chunk in chunks:
+                yield from chunk
+
+        chunks = ([number] * 5 for number in range(100))
+        assert pipeline.run(chunks, parse) == 500
+        assert sink.records == [number for number in range(100) for _ in range(5)]
+        assert sink.error is None
+
+    def test_report_is_passed_to_all_sinks(self, raw_data_report: RawDataReport, tmp_path):
+        batches = []
+        sink = SlowSink()
+
+        records_number = raw_data_report.run_report_pipeline(api_report_name='in_app_events_report',
+                                                             sinks=[sink, CallbackSink(batches.append)],
+                                                             row_format='record', batch_size=7,
+                                                             copy_to_csv=True)
+
+        assert records_number == 100
+        assert sink.records == raw_data_report.get_report(api_report_name='in_app_events_report',
+                                                          row_format='record')
+        assert [len(batch) for batch in batches[:2]] == [7, 7]
+        assert os.listdir(tmp_path / 'copies') == ['report.csv']
+
+    def test_sink_error_stops_pipeline(self, raw_data_report: RawDataReport, tmp_path):
+        sink = SlowSink()
+
+        with pytest.raises(PyAFProcessingError) as err:
+            raw_data_report.run_report_pipeline(api_report_name='in_app_events_report',
+                                                sinks=[sink, FailingSink()], batch_size=5,
+                                                queue_size=1, copy_to_json=True)
+
+        assert isinstance(err.value.__cause__, ValueError)
+        assert isinstance(sink.error, ValueError)
+        assert os.listdir(tmp_path / 'copies') == []
+
+    def test_failed_request_leaves_no_copies(self, raw_data_report: RawDataReport, monkeypatch, tmp_path):
+        raw_data_report.retry.max_attempts = 1
+        monkeypatch.setattr(raw_data_report.session, 'get', lambda url, **kwargs: FakeResponse(b'', 500))
+
+        with pytest.raises(PyAFProcessingError):
+            raw_data_report.run_report_pipeline(api_report_name='in_app_events_report', sinks=[SlowSink()],
+                                                copy_to_csv=True, copy_to_json=True)
+
+        assert not os.path.exists(tmp_path / 'copies') or os.listdir(tmp_path / 'copies') == []
@@ -0,0 +1,58 @@
+import pickle
+import pytest
+
+from conftest import FakeResponse
+from pyappsflyer import PerformanceReport
+from pyappsflyer.records import Record, make_record_class
+from pyappsflyer.exceptions import PyAFProcessingError
+
+
+class TestRecords:
+
+    def test_record_access(self):
+        record_class = make_record_class(('Media Source', 'Installs', 'Total Revenue'))
+        record = record_class.from_row(['facebook', '10'])
+
+        assert isinstance(record, Record)
+        assert record_class is make_record_class(('Media Source', 'Installs', 'Total Revenue'))
+        assert record['Installs'] == '10'
+        assert record[0] == 'facebook'
+        assert record['Total Revenue'] is None
+        assert record.get('unknown', 'default') == 'default'
+        assert dict(record) == record.to_dict() == {'Media Source': 'facebook', 'Installs': '10',
+                                                    'Total Revenue': None}
+        assert pickle.loads(pickle.dumps(record)) == record
+        assert not hasattr(record, '__dict__')
+
+    def test_report_with_records(self, monkeypatch, csv_response):
+        report = PerformanceReport('TestAppName', api_key='some_api_key')
+        monkeypatch.setattr(report.session, 'get', lambda url, **kwargs: csv_response)
+
+        records = report.get_report(api_report_name='geo_report', row_format='record')
+        assert [record['col2'] for record in records] == ['a', 'b', 'c']
+        assert type(records[0]) is type(records[2])
+        assert records[0].fields == ('col1', 'col2', 'col3')
+
+        html_response = FakeResponse(b'<!DOCTYPE html>\n<html>\n</html>\n')
+        monkeypatch.setattr(report.session, 'get', lambda url, **kwargs: html_response)
+        with pytest.raises(PyAFProcessingError):
+            list(report.iter_report(api_report_name='geo_report', row_format='record'))
+
+    def test_columns_projection(self, monkeypatch):
+        report = PerformanceReport('TestAppName', api_key='some_api_key')
+        response = FakeResponse(b'AppsFlyer ID,Event Time,Event Name,Event Revenue\n'
+                                b'id-1,2020-01-01 10:00:00,purchase,1.5\n'
+                                b'id-2,2020-01-01 11:00:00,open\n')
+        monkeypatch.setattr(report.session, 'get', lambda url, **kwargs: response)
+
+        records = report.get_report(api_report_name='geo_report',
+                                    columns=('appsflyer_id', 'Event Revenue'))
+        assert records == [{'appsflyer_id': 'id-1', 'Event Revenue': '1.5'},
+                           {'appsflyer_id': 'id-2', 'Event Revenue': None}]
+
+        records = report.get_report(api_report_name='geo_report', columns=('event_time',), row_format='record')
+        assert [record['event_time'] for record in records] == ['2020-01-01 10:00:00', '2020-01-01 11:00:00']
+
+        with pytest.raises(PyAFProcessingError) as e:
+            list(report.iter_report(api_report_name='geo_report', columns=('unknown_column',)))
+        assert 'unknown_column' in str(e.value.__cause__)
@@ -1,5 +1,7 @@
+import time
 import pytest
 
+from pyappsflyer.exceptions import PyAFReportsError
 from pyappsflyer import PerformanceReport, RawDataReport, TargetingValidationRulesReport
 
 
@@ -56,4 +58,82 @@ class TestReport:
         assert targeting_validation_rules_report.api_action == 'export'
 
         assert len(targeting_validation_rules_report.additional_fields) == 11
-        assert len(targeting_validation_rules_report.report_names) == 2
\ No newline at end of file
+        assert len(targeting_validation_rules_report.report_names) == 2
+
+    def test_iter_report_streams_records(self, monkeypatch, performance_report: PerformanceReport, csv_response):
+        requested_urls = []
+
+        def fake_get(url, **kwargs):
+            requested_urls.append(url)
+            return csv_response
+
+        monkeypatch.setattr(performance_report.session, 'get', fake_get)
+
+        records = performance_report.iter_report(api_report_name='geo_report',
+                                                 from_date='2020-01-01', to_date='2020-01-02')
+        assert not requested_urls
+
+        assert next(records) == {'col1': '1', 'col2': 'a', 'col3': 'x'}
+        assert [record['col1'] for record in records] == ['2', '3']
+        assert '/export/TestAppName/geo_report/v5' in requested_urls[0]
+
+    def test_raw_data_report_calls(self, raw_data_report: RawDataReport):
+        calls = list(raw_data_report._get_report_calls(exclude_reports=('organic_installs_report',),
+                                                       exclude_retargeting_reports=('in_app_events_report',)))
+        names = [name for name, _ in calls]
+
+        assert names == ['installs_report', 'installs_report_retargeting', 'in_app_events_report',
+                         'organic_in_app_events_report', 'uninstall_events_report']
+        assert calls[1][1] == {'api_report_name': 'installs_report', 'retargeting': True}
+        assert calls[-1][1]['different_additional_fields'] is True
+
+    def test_get_reports_concurrently(self, monkeypatch, performance_report: PerformanceReport):
+        def fake_get_report(api_report_name=None, **kwargs):
+            if api_report_name == 'daily_report':
+                raise ValueError('broken report')
+            # First reports finish last, order of results must be kept anyway
+            time.sleep(0.05 * (5 - performance_report.report_names.index(api_report_name)))
+            return [{'report': api_report_name}]
+
+        monkeypatch.setattr(performance_report, '_get_report', fake_get_report)
+
+        result = performance_report.get_reports(exclude_reports=('daily_report',), max_workers=4)
+        assert [list(report) for report in result] == [['partners_report'], ['partners_by_date_report'],
+                                                        ['geo_report'], ['geo_by_date_report']]
+        assert result[0]['partners_report'] == [{'report': 'partners_report'}]
+
+        with pytest.raises(PyAFReportsError) as e:
+            performance_report.get_reports(max_workers=4)
+        assert list(e.value.errors) == ['daily_report']
+        assert len(e.value.reports) == 4
+
+    def test_windowed_report(self, monkeypatch, raw_data_report: RawDataReport):
+        requested = []
+
+        def fake_iter_report(api_report_name=None, from_date=None, to_date=None, **kwargs):
+            requested.append((from_date, to_date))
+            # The second day has too many events for one request
+            if from_date == '2020-01-02':
+                return iter([{'event_time': from_date}] * 3)
+            return iter([{'event_time': from_date}])
+
+        monkeypatch.setattr(raw_data_report, '_iter_report', fake_iter_report)
+
+        records = raw_data_report.get_windowed_report(api_report_name='installs_report',
+                                                      from_date='2020-01-01', to_date='2020-01-03',
+                                                      max_workers=2, rows_limit=3)
+
+        assert [record['event_time'] for record in records] == [
+            '2020-01-01', '2020-01-02 00:00', '2020-01-02 12:00', '2020-01-03'
+        ]
+        assert ('2020-01-02 00:00', '2020-01-02 11:59') in requested
+
+    def test_additional_fields_selection(self, raw_data_report: RawDataReport):
+        call = raw_data_report._prepare_report_call(api_report_name='installs_report',
+                                                    from_date='2020-01-01', to_date='2020-01-02',
+                                                    columns=('AppsFlyer ID', 'Device Category', 'amazon_aid'))
+        assert call['request_args']['additional_fields'] == 'device_category,amazon_aid'
+        assert call['columns'] == ('AppsFlyer ID', 'Device Category', 'amazon_aid')
+
+        call = raw_data_report._prepare_report_call(api_report_name='installs_report', columns=('Event Time',))
+        assert 'additional_fields' not in call['request_args']
@@ -0,0 +1,118 @@
+import time
+import threading
+import pytest
+import requests
+
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+
+from conftest import FakeResponse
+from pyappsflyer import PerformanceReport
+from pyappsflyer.retry import RetryPolicy, parse_retry_after
+from pyappsflyer.exceptions import PyAFCommunicationError, PyAFUnknownError
+
+CSV = b'col1,col2\n1,a\n2,b\n'
+
+
+class HeadersResponse(FakeResponse):
+
+    def __init__(self, content: bytes, status_code: int = 200, headers: dict = None):
+        super().__init__(content, status_code)
+        self.headers = headers or {}
+
+
+class BrokenResponse(FakeResponse):
+
+    def iter_content(self, chunk_size: int = 1, *args, **kwargs):
+        yield self.content[:12]
+        raise requests.exceptions.ChunkedEncodingError('Connection broken')
+
+
+class FakeSession:
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def get(self, url, **kwargs):
+        self.calls.append(kwargs)
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def create_report(session, **kwargs) -> PerformanceReport:
+    sleeps = []
+    retry = RetryPolicy(sleep=sleeps.append, **kwargs)
+    report = PerformanceReport('TestAppName', api_key='some_api_key', session=session, retry=retry)
+    report.retry.sleeps = sleeps
+    return report
+
+
+class TestRetry:
+
+    def test_retry_after_is_honored(self):
+        session = FakeSession(HeadersResponse(b'', 429, {'Retry-After': '7'}),
+                              requests.ConnectionError('Connection refused'),
+                              HeadersResponse(CSV))
+        report = create_report(session, backoff=1, max_backoff=60)
+
+        assert len(report.get_report(api_report_name='geo_report')) == 2
+        assert report.retry.sleeps[0] == 7
+        assert 0 <= report.retry.sleeps[1] <= 2
+        assert session.calls[0]['timeout'] == report.retry.timeout
+
+    def test_failures_are_raised(self):
+        report = create_report(FakeSession(HeadersResponse(b'Not found', 404)))
+
+        with pytest.raises(PyAFUnknownError) as err:
+            report.get_report(api_report_name='geo_report')
+
+        assert isinstance(err.value.__cause__.__cause__, PyAFCommunicationError)
+        assert report.retry.sleeps == []
+
+    def test_retries_are_limited(self):
+        report = create_report(FakeSession(*[HeadersResponse(b'', 503)] * 3), max_attempts=3)
+
+        with pytest.raises(PyAFUnknownError):
+            report.get_report(api_report_name='geo_report')
+        assert len(report.retry.sleeps) == 2
+
+    def test_broken_stream_is_received_again(self):
+        report = create_report(FakeSession(BrokenResponse(CSV), HeadersResponse(CSV)))
+
+        assert report.get_report(api_report_name='geo_report') == [{'col1': '1', 'col2': 'a'},
+                                                                   {'col1': '2', 'col2': 'b'}]
+        assert len(report.retry.sleeps) == 1
+
+    def test_hedged_request(self):
+        released = threading.Event()
+
+        class SlowSession(FakeSession):
+            def get(self, url, **kwargs):
+                if not self.calls:
+                    self.calls.append(kwargs)
+                    released.wait(2)
+                    return HeadersResponse(CSV)
+                self.calls.append(kwargs)
+                return HeadersResponse(b'col1,col2\n3,c\n')
+
+        session = SlowSession()
+        report = create_report(session, hedge_delay=0.05)
+
+        started = time.monotonic()
+        records = report.get_report(api_report_name='geo_report')
+        released.set()
+
+        assert records == [{'col1': '3', 'col2': 'c'}]
+        assert time.monotonic() - started < 1
+        assert len(session.calls) == 2
+
+    def test_parse_retry_after(self):
+        later = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+
+        assert parse_retry_after('120') == 120
+        assert 25 < parse_retry_after(later) <= 30
+        assert parse_retry_after('soon') is None
+        assert parse_retry_after(None) is None
@@ -0,0 +1,97 @@
+import threading
+import pytest
+
+from concurrent.futures import ThreadPoolExecutor
+
+from conftest import FakeResponse
+from pyappsflyer import PerformanceReport, SingleFlight
+from pyappsflyer.exceptions import PyAFUnknownError
+
+CSV = b'col1,col2\n1,a\n2,b\n'
+
+
+class BlockingSession:
+    """
+    Session which answers only when all callers have asked.
+    """
+
+    def __init__(self, callers: int, status_code: int = 200):
+        self.barrier = threading.Barrier(callers, timeout=0.5)
+        self.status_code = status_code
+        self.urls = []
+
+    def get(self, url, **kwargs):
+        self.urls.append(url)
+        try:
+            self.barrier.wait()
+        except threading.BrokenBarrierError:
+            pass
+        return FakeResponse(CSV, self.status_code)
+
+
+def create_reports(session, single_flight, tokens):
+    return [PerformanceReport('TestAppName', api_key=token, session=session, single_flight=single_flight)
+            for token in tokens]
+
+
+class TestSingleFlight:
+
+    def test_identical_reports_are_received_once(self):
+        session = BlockingSession(callers=2)
+        reports = create_reports(session, SingleFlight(), ['some_api_key'] * 4)
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(lambda report: report.get_report(api_report_name='geo_report',
+                                                                         from_date='2020-01-01',
+                                                                         to_date='2020-01-01'),
+                                        reports))
+
+        assert len(session.urls) == 1
+        assert all(result == [{'col1': '1', 'col2': 'a'}, {'col1': '2', 'col2': 'b'}] for result in results)
+        assert len({id(result) for result in results}) == 4
+
+        # Records of one caller could be changed without touching the others
+        results[0][0]['col1'] = 'changed'
+        assert all(result[0]['col1'] == '1' for result in results[1:])
+
+    def test_compact_records_are_shared(self):
+        session = BlockingSession(callers=2)
+        reports = create_reports(session, SingleFlight(), ['some_api_key'] * 2)
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            first, second = executor.map(lambda report: report.get_report(api_report_name='geo_report',
+                                                                          row_format='record'),
+                                         reports)
+
+        assert len(session.urls) == 1
+        assert first == second and first is not second
+        assert first[0] is second[0]
+
+    def test_different_reports_and_tokens_are_not_joined(self):
+        session = BlockingSession(callers=3)
+        single_flight = SingleFlight()
+        first, second = create_reports(session, single_flight, ['some_api_key', 'other_api_key'])
+        calls = [
+            lambda: first.get_report(api_report_name='geo_report'),
+            lambda: first.get_report(api_report_name='geo_report', row_format='record'),
+            lambda: second.get_report(api_report_name='geo_report'),
+        ]
+
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            list(executor.map(lambda call: call(), calls))
+
+        assert len(session.urls) == 3
+        assert single_flight.in_flight == 0
+
+    def test_error_is_shared(self):
+        session = BlockingSession(callers=2, status_code=404)
+        reports = create_reports(session, SingleFlight(), ['some_api_key'] * 3)
+
+        def get_report(report):
+            with pytest.raises(PyAFUnknownError):
+                report.get_report(api_report_name='geo_report')
+
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            list(executor.map(get_report, reports))
+
+        assert len(session.urls) == 1
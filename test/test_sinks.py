@@ -0,0 +1,70 @@
+import os
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+
+import pyarrow.dataset as ds
+
+from conftest import FakeResponse
+from pyappsflyer import RawDataReport
+from pyappsflyer.sinks import ColumnarSink
+
+RAW_CSV = (b'Event Time,Event Name,Event Revenue,AppsFlyer ID\n'
+           b'2020-01-01 10:00:00,purchase,1.5,id-1\n'
+           b'2020-01-01 11:00:00,open,,id-2\n'
+           b'2020-01-01 12:00:00,level,2,id-3\n')
+
+SECOND_DAY_CSV = (b'Event Time,Event Name,Event Revenue,AppsFlyer ID\n'
+                  b'2020-01-02 09:00:00,purchase,3,id-4\n')
+
+
+@pytest.fixture
+def raw_data_report(monkeypatch):
+    report = RawDataReport('TestAppName', api_key='some_api_key')
+    monkeypatch.setattr(report.session, 'get', lambda url, **kwargs: FakeResponse(RAW_CSV))
+    return report
+
+
+class TestColumnarSink:
+
+    @pytest.mark.parametrize('file_format', ['parquet', 'arrow'])
+    def test_report_is_written_into_partition(self, tmp_path, raw_data_report: RawDataReport, file_format):
+        sink = ColumnarSink(str(tmp_path), file_format=file_format, row_group_size=2)
+
+        [path] = sink.write_report(raw_data_report, api_report_name='in_app_events_report',
+                                   from_date='2020-01-01', to_date='2020-01-01', retargeting=True)
+
+        assert path == os.path.join(str(tmp_path), 'app=TestAppName', 'report=in_app_events_report_retargeting',
+                                    'date=2020-01-01',
+                                    f'in_app_events_report_retargeting_2020-01-01_2020-01-01.{file_format}')
+        assert os.listdir(os.path.dirname(path)) == [os.path.basename(path)]
+
+        dataset = ds.dataset(str(tmp_path), format='parquet' if file_format == 'parquet' else 'ipc',
+                             partitioning='hive')
+        table = dataset.to_table(columns=['Event Name', 'Event Revenue'],
+                                 filter=ds.field('report') == 'in_app_events_report_retargeting')
+
+        assert table.num_rows == 3
+        assert table.column('Event Revenue').to_pylist() == [1.5, None, 2.0]
+        assert table.column('Event Name').to_pylist() == ['purchase', 'open', 'level']
+        assert pa.types.is_dictionary(table.schema.field('Event Name').type)
+
+    def test_days_are_written_into_their_partitions(self, tmp_path, monkeypatch):
+        report = RawDataReport('TestAppName', api_key='some_api_key')
+        monkeypatch.setattr(report.session, 'get', lambda url, **kwargs: FakeResponse(
+            SECOND_DAY_CSV if 'from=2020-01-02' in str(url) else RAW_CSV))
+        sink = ColumnarSink(str(tmp_path))
+
+        paths = sink.write_report(report, api_report_name='in_app_events_report',
+                                  from_date='2020-01-01', to_date='2020-01-02')
+
+        folder = os.path.join(str(tmp_path), 'app=TestAppName', 'report=in_app_events_report')
+        assert paths == [os.path.join(folder, 'date=2020-01-01', 'in_app_events_report_2020-01-01_2020-01-01.parquet'),
+                         os.path.join(folder, 'date=2020-01-02', 'in_app_events_report_2020-01-02_2020-01-02.parquet')]
+
+        table = ds.dataset(str(tmp_path), format='parquet', partitioning='hive').to_table(
+            columns=['Event Time', 'date'])
+        dates = {(str(time)[:10], str(day)) for time, day in zip(table.column('Event Time').to_pylist(),
+                                                                  table.column('date').to_pylist())}
+        assert table.num_rows == 4
+        assert dates == {('2020-01-01', '2020-01-01'), ('2020-01-02', '2020-01-02')}
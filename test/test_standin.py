@@ -0,0 +1,56 @@
+import pytest
+
+from benchmarks.server import StandInServer, StandInConfig, SyntheticReport, make_header
+from pyappsflyer import RawDataReport, PerformanceReport
+from pyappsflyer.retry import RetryPolicy
+from pyappsflyer.exceptions import PyAFUnknownError
+
+
+@pytest.fixture
+def server():
+    with StandInServer(config=StandInConfig(rows=1500, columns=30, chunk_size=1000)) as server:
+        yield server
+
+
+def create_report(report_class, server, **kwargs):
+    return report_class('TestAppName', api_key='some_api_key', api_url=server.url,
+                        retry=RetryPolicy(sleep=lambda delay: None, **kwargs))
+
+
+class TestStandInServer:
+
+    @pytest.mark.parametrize('gzip, chunked', [(False, True), (False, False), (True, True)])
+    def test_raw_data_report(self, server, gzip, chunked):
+        server.config.gzip = gzip
+        server.config.chunked = chunked
+        report = create_report(RawDataReport, server)
+
+        records = report.get_report(api_report_name='in_app_events_report', row_format='record')
+
+        assert len(records) == 1500
+        assert list(records[0].fields) == make_header('in_app_events_report', 30)
+        assert records[1]['Event Value'] == '{"af_revenue":"1.99","af_content_id":"1"\n}'
+        assert records[1024]['AppsFlyer ID'] == records[0]['AppsFlyer ID']
+
+    def test_performance_report(self, server):
+        server.config.columns = None
+        report = create_report(PerformanceReport, server)
+
+        records = report.get_report(api_report_name='geo_report')
+
+        assert len(records) == 1500
+        assert records[0]['af_purchase (Sales in USD)'] == '0.00'
+
+    def test_failures(self, server):
+        server.config.fail_statuses = [503, 429]
+        server.config.error_every = 4
+        report = create_report(RawDataReport, server)
+
+        assert len(report.get_report()) == 1500
+        with pytest.raises(PyAFUnknownError):
+            report.get_report()
+        assert server.requests_number == 4
+
+    def test_size(self):
+        report = SyntheticReport('installs_report', rows=2100, columns=10)
+        assert report.size == sum(map(len, report.iter_chunks(4096)))
@@ -0,0 +1,41 @@
+from datetime import datetime as dt
+
+from pyappsflyer import RawDataReport, WatermarkStore
+
+
+class TestSync:
+
+    def test_sync_moves_watermarks(self, monkeypatch, tmp_path):
+        report = RawDataReport('TestAppName', api_key='some_api_key')
+        watermarks = WatermarkStore(str(tmp_path / 'state' / 'watermarks.sqlite'))
+        requested = []
+
+        def fake_iter_report(api_report_name=None, from_date=None, to_date=None, retargeting=False, **kwargs):
+            requested.append((api_report_name, retargeting, from_date, to_date))
+            return iter([{'event_time': from_date}])
+
+        monkeypatch.setattr(report, '_iter_report', fake_iter_report)
+        today = dt.now().strftime('%Y-%m-%d')
+        watermarks.set('TestAppName', 'installs_report', False, '2020-01-10')
+
+        synced = report.iter_sync_reports(watermarks,
+                                          exclude_reports=('in_app_events_report', 'organic_installs_report',
+                                                           'organic_in_app_events_report', 'uninstall_events_report'),
+                                          lookback_days=3, start_date='2020-01-01')
+        name, records = next(synced)
+        assert name == 'installs_report'
+        assert requested[-1] == ('installs_report', False, '2020-01-07', today)
+        # Watermark is moved only when the report is read
+        assert watermarks.get('TestAppName', 'installs_report') == '2020-01-10'
+        assert list(records) == [{'event_time': '2020-01-07'}]
+        assert watermarks.get('TestAppName', 'installs_report') == today
+
+        name, records = next(synced)
+        assert name == 'installs_report_retargeting'
+        assert requested[-1] == ('installs_report', True, '2020-01-01', today)
+        list(records)
+        assert watermarks.get('TestAppName', 'installs_report', retargeting=True) == today
+        assert watermarks.get('TestAppName', 'installs_report', retargeting=False) == today
+
+        watermarks.reset('TestAppName')
+        assert watermarks.get('TestAppName', 'installs_report') is None
@@ -0,0 +1,82 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pa = pytest.importorskip('pyarrow')
+
+from conftest import FakeResponse
+from pyappsflyer import RawDataReport
+from pyappsflyer.typed import decode_records, RAW_DATA_SCHEMA
+from pyappsflyer.records import make_record_class
+
+RAW_CSV = (b'Event Time,Event Name,Event Revenue,Is Retargeting,AppsFlyer ID\n'
+           b'2020-01-01 10:00:00,purchase,1.5,true,id-1\n'
+           b'2020-01-01 11:00:00,open,,false,id-2\n'
+           b',purchase,2,,id-3\n')
+
+
+class TestTyped:
+
+    def test_arrow_output(self, monkeypatch):
+        report = RawDataReport('TestAppName', api_key='some_api_key')
+        monkeypatch.setattr(report.session, 'get', lambda url, **kwargs: FakeResponse(RAW_CSV))
+
+        table = report.get_typed_report(api_report_name='in_app_events_report', batch_size=2)
+
+        assert table.num_rows == 3
+        assert table.schema.field('Event Time').type == pa.timestamp('ms')
+        assert table.schema.field('Event Revenue').type == pa.float64()
+        assert table.schema.field('Is Retargeting').type == pa.bool_()
+        assert pa.types.is_dictionary(table.schema.field('Event Name').type)
+        assert table.schema.field('AppsFlyer ID').type == pa.string()
+        assert table.column('Event Revenue').to_pylist() == [1.5, None, 2.0]
+        assert table.column('Event Name').to_pylist() == ['purchase', 'open', 'purchase']
+
+    def test_numpy_output(self):
+        record_class = make_record_class(('Event Time', 'Event Name', 'Event Revenue', 'Installs'))
+        records = [record_class.from_row(row) for row in (
+            ['2020-01-01 10:00:00', 'purchase', '1.5', '1'],
+            ['2020-01-01 11:00:00', 'open', '', ''],
+            ['', 'purchase', '2', '10'],
+        )]
+
+        columns = decode_records(records, dict(RAW_DATA_SCHEMA, Installs='int'), output='numpy', batch_size=2)
+
+        assert np.isnan(columns['Event Revenue'][1])
+        assert np.nansum(columns['Event Revenue']) == 3.5
+        assert columns['Installs'].sum() == 11
+        assert columns['Installs'].mask.tolist() == [False, True, False]
+        assert np.isnat(columns['Event Time'][2])
+        assert columns['Event Name'].dtype == np.int32
+        assert columns.decode('Event Name').tolist() == ['purchase', 'open', 'purchase']
+
+    def test_arrow_malformed_values_become_null(self):
+        record_class = make_record_class(('Event Time', 'Installs'))
+        records = [record_class.from_row(row) for row in (
+            ['2020-01-01 10:00:00', '1.5'],
+            ['not a time', 'many'],
+            ['2020-01-02', 'nan'],
+            ['', '3'],
+        )]
+
+        table = decode_records(records, dict(RAW_DATA_SCHEMA, Installs='int'), output='arrow')
+
+        assert table.schema.field('Installs').type == pa.int64()
+        assert table.column('Installs').to_pylist() == [1, None, None, 3]
+        assert table.schema.field('Event Time').type == pa.timestamp('ms')
+        assert [str(value) if value else value for value in table.column('Event Time').to_pylist()] == [
+            '2020-01-01 10:00:00', None, '2020-01-02 00:00:00', None]
+
+    def test_numpy_malformed_values_are_masked(self):
+        record_class = make_record_class(('Event Time', 'Installs'))
+        records = [record_class.from_row(row) for row in (
+            ['2020-01-01 10:00:00', '1.5'],
+            ['not a time', 'many'],
+            ['2020-01-02', 'inf'],
+            ['', '3'],
+        )]
+
+        columns = decode_records(records, dict(RAW_DATA_SCHEMA, Installs='int'), output='numpy')
+
+        assert columns['Installs'].tolist() == [1, None, None, 3]
+        assert [str(value) for value in columns['Event Time']] == [
+            '2020-01-01T10:00:00.000', 'NaT', '2020-01-02T00:00:00.000', 'NaT']
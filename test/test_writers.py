@@ -0,0 +1,37 @@
+import os
+import csv
+import gzip
+import json
+
+from pyappsflyer import PerformanceReport
+from pyappsflyer.writers import open_record_writer
+
+
+class TestWriters:
+
+    def test_copies_are_written_while_reading(self, monkeypatch, tmp_path, csv_response):
+        report = PerformanceReport('TestAppName', api_key='some_api_key')
+        monkeypatch.setattr(report.session, 'get', lambda url, **kwargs: csv_response)
+        monkeypatch.setattr('pyappsflyer.base.get_random_filename',
+                            lambda **kwargs: str(tmp_path / 'copies' / 'report.csv'))
+
+        records = report.get_report(api_report_name='geo_report', copy_to_csv=True,
+                                    copy_to_json=True, copy_compression='gzip')
+
+        with gzip.open(tmp_path / 'copies' / 'report.csv.gz', 'rt', newline='') as file:
+            assert list(csv.DictReader(file)) == records
+        with gzip.open(tmp_path / 'copies' / 'report.ndjson.gz', 'rt') as file:
+            assert [json.loads(line) for line in file] == records
+        assert sorted(os.listdir(tmp_path / 'copies')) == ['report.csv.gz', 'report.ndjson.gz']
+
+    def test_unfinished_copy_is_removed(self, tmp_path):
+        filename = str(tmp_path / 'report.csv')
+
+        try:
+            with open_record_writer(filename) as writer:
+                writer.write({'col1': '1', 'col2': 'a'})
+                raise ValueError('stream was broken')
+        except ValueError:
+            pass
+
+        assert os.listdir(tmp_path) == []